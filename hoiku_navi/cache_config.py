@@ -0,0 +1,51 @@
+"""
+環境変数からキャッシュ（CACHES）の設定を組み立てる
+
+CACHE_BACKEND に応じて次のバックエンドを使う。
+
+- locmem: プロセス内メモリ（既定。開発用。プロセス間で共有されないため、
+  複数ワーカーで動かすとデータ更新によるキャッシュの無効化が他のワーカーに伝わらない）
+- file: ファイル（CACHE_LOCATION のディレクトリ。1台のサーバーで複数ワーカーを動かす場合）
+- redis: Redis 互換のサーバー（CACHE_LOCATION は redis://host:6379/0 の形式。カンマ区切りで複数指定可）
+- fakeredis: fakeredis によるプロセス内の Redis（redis バックエンドの動作確認用）
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+BACKENDS = ['locmem', 'file', 'redis', 'fakeredis']
+
+DEFAULT_REDIS_URL = 'redis://127.0.0.1:6379/0'
+
+
+def build_caches(backend, location='', timeout=300, key_prefix='', base_dir=None):
+    """settings.CACHES に設定する dict"""
+    if backend not in BACKENDS:
+        raise ImproperlyConfigured(f"CACHE_BACKEND は {', '.join(BACKENDS)} のいずれかを指定してください: {backend}")
+
+    default = {'TIMEOUT': timeout, 'KEY_PREFIX': key_prefix}
+    if backend == 'locmem':
+        default.update(
+            BACKEND='django.core.cache.backends.locmem.LocMemCache',
+            LOCATION=location or 'hoikunavi',
+            OPTIONS={'MAX_ENTRIES': 10000},
+        )
+    elif backend == 'file':
+        default.update(
+            BACKEND='django.core.cache.backends.filebased.FileBasedCache',
+            LOCATION=location or str(base_dir / 'tmp' / 'cache'),
+            OPTIONS={'MAX_ENTRIES': 50000},
+        )
+    else:
+        # キャッシュサーバーが止まっていてもリクエストが長く待たされないようにする
+        options = {'socket_connect_timeout': 1, 'socket_timeout': 1}
+        if backend == 'fakeredis':
+            try:
+                from fakeredis import FakeConnection
+            except ImportError:
+                raise ImproperlyConfigured('CACHE_BACKEND=fakeredis には fakeredis のインストールが必要です')
+            options = {'connection_class': FakeConnection}
+        default.update(
+            BACKEND='django.core.cache.backends.redis.RedisCache',
+            LOCATION=location or DEFAULT_REDIS_URL,
+            OPTIONS=options,
+        )
+    return {'default': default}
@@ -0,0 +1,39 @@
+"""
+環境変数からデータベース（DATABASES）の設定を組み立てる
+
+DATABASE_POOL_MODE:
+
+- session: ワーカーごとに接続を保持して使い回す（既定。DBへ直接、またはセッションモードのプーラー経由）
+- transaction: pgbouncer / Supabase の接続プーラー（トランザクションモード）経由で接続する。
+  接続はリクエストごとに返却し（CONN_MAX_AGE=0）、トランザクションをまたいで使えない
+  サーバー側カーソルを使わない。DBへの同時接続数はワーカー数ではなくプーラーの設定で決まる。
+
+DATABASE_REPLICA_URL を指定すると読み取り専用の 'replica' を追加する（振り分けは nursery.routers）。
+"""
+import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
+
+POOL_MODES = ['session', 'transaction']
+
+
+def _database(url, pool_mode, conn_max_age):
+    if pool_mode == 'transaction':
+        database = dj_database_url.parse(url, conn_max_age=0)
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+    else:
+        database = dj_database_url.parse(url, conn_max_age=conn_max_age, conn_health_checks=True)
+    return database
+
+
+def build_databases(url, replica_url='', pool_mode='session', conn_max_age=600):
+    """settings.DATABASES に設定する dict"""
+    if pool_mode not in POOL_MODES:
+        raise ImproperlyConfigured(f"DATABASE_POOL_MODE は {', '.join(POOL_MODES)} のいずれかを指定してください: {pool_mode}")
+
+    databases = {'default': _database(url, pool_mode, conn_max_age)}
+    if replica_url:
+        replica = _database(replica_url, pool_mode, conn_max_age)
+        # テストでは別のDBを作らず default を読む
+        replica['TEST'] = {'MIRROR': 'default'}
+        databases['replica'] = replica
+    return databases
@@ -13,7 +13,9 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import os
 from decouple import config
-import dj_database_url
+
+from .cache_config import build_caches
+from .db_config import build_databases
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -51,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'nursery.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -58,6 +61,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'nursery.middleware.ReplicaRoutingMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -85,13 +89,43 @@ WSGI_APPLICATION = 'hoiku_navi.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': dj_database_url.parse(
-        config('SUPABASE_DATABASE_URL'),
-        conn_max_age=600,
-        conn_health_checks=True,
-    )
-}
+# DATABASE_POOL_MODE: session / transaction（詳細は hoiku_navi/db_config.py）
+
+DATABASES = build_databases(
+    config('SUPABASE_DATABASE_URL'),
+    replica_url=config('DATABASE_REPLICA_URL', default=''),
+    pool_mode=config('DATABASE_POOL_MODE', default='session'),
+    conn_max_age=config('CONN_MAX_AGE', default=600, cast=int),
+)
+
+# 読み取り専用のレプリカがあれば、一覧・詳細・地図の表示はレプリカから読む
+DATABASE_ROUTERS = ['nursery.routers.ReplicaRouter'] if 'replica' in DATABASES else []
+REPLICA_READ_VIEWS = [
+    'nursery:nursery_list',
+    'nursery:nursery_detail',
+    'nursery:schedule_list',
+    'nursery:impression_list',
+    'nursery:map_view',
+    'nursery:map_tile',
+    'nursery:nursery_compare',
+]
+# 更新（POST など）の後、この秒数はレプリカの遅延で古いデータが見えないよう常に default から読む
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=15, cast=int)
+
+
+# Cache
+# CACHE_BACKEND: locmem / file / redis / fakeredis（詳細は hoiku_navi/cache_config.py）
+
+CACHES = build_caches(
+    config('CACHE_BACKEND', default='locmem'),
+    location=config('CACHE_LOCATION', default=''),
+    timeout=config('CACHE_TIMEOUT', default=300, cast=int),
+    key_prefix=config('CACHE_KEY_PREFIX', default=''),
+    base_dir=BASE_DIR,
+)
+
+# セッションはキャッシュから読み、DBにも書く（キャッシュが消えてもログアウトしない）
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
 
 
 # Password validation
@@ -148,6 +182,70 @@ CRISPY_TEMPLATE_PACK = 'bootstrap5'
 
 # Google Maps API
 GOOGLE_MAPS_API_KEY = config('GOOGLE_MAPS_API_KEY', default='')
+# 位置情報取得に使うジオコーダ（テスト・開発時は nursery.geocoding.FakeGeocoder に差し替え可能）
+GEOCODER_CLASS = config('GEOCODER_CLASS', default='nursery.geocoding.GoogleMapsGeocoder')
+# ジオコーディング結果のキャッシュ（正規化住所 → 緯度経度）
+GEOCODE_CACHE_ENABLED = config('GEOCODE_CACHE_ENABLED', default=True, cast=bool)
+GEOCODE_CACHE_TTL_DAYS = config('GEOCODE_CACHE_TTL_DAYS', default=90, cast=int)
+GEOCODE_CACHE_MEMORY_SIZE = config('GEOCODE_CACHE_MEMORY_SIZE', default=1024, cast=int)
+
+# 自宅からの所要時間の見積もり（直線距離 × 迂回係数 ÷ 分速）
+TRAVEL_DETOUR_FACTOR = config('TRAVEL_DETOUR_FACTOR', default=1.3, cast=float)
+TRAVEL_METERS_PER_MINUTE = config('TRAVEL_METERS_PER_MINUTE', default=80, cast=float)
+# 続けて見学する場合に、前の見学の終了から次の見学までに最低限空ける時間（分）
+SCHEDULE_MIN_TRAVEL_BUFFER = config('SCHEDULE_MIN_TRAVEL_BUFFER', default=15, cast=int)
+
+# ホーム画面の表示内容をキャッシュする秒数（データ更新時はシグナルで無効化）
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=60, cast=int)
+
+# 保育園詳細ページの描画済み断片のキャッシュ時間（秒）。データ更新時はバージョンが上がり作り直される
+NURSERY_DETAIL_CACHE_TIMEOUT = config('NURSERY_DETAIL_CACHE_TIMEOUT', default=60 * 60, cast=int)
+
+# 一覧画面のページ分割（'offset': ページ番号 / 'keyset': カーソル方式。件数はキャッシュする）
+LIST_PAGINATION = config('LIST_PAGINATION', default='offset')
+LIST_COUNT_CACHE_TIMEOUT = config('LIST_COUNT_CACHE_TIMEOUT', default=300, cast=int)
+
+# 地図のタイル（GeoJSON）のキャッシュ時間（秒）。データ更新時はバージョンが上がり作り直される
+MAP_TILE_CACHE_TIMEOUT = config('MAP_TILE_CACHE_TIMEOUT', default=60 * 60, cast=int)
+
+# 保育園ランキング（特徴量の行列と重みごとの並び順のキャッシュ時間、表示する件数）
+RANKING_CACHE_TIMEOUT = config('RANKING_CACHE_TIMEOUT', default=60 * 60, cast=int)
+RANKING_DISPLAY_LIMIT = config('RANKING_DISPLAY_LIMIT', default=100, cast=int)
+
+# 見学感想の写真の分割アップロード（nursery.uploads）
+PHOTO_UPLOAD_MAX_BYTES = config('PHOTO_UPLOAD_MAX_BYTES', default=20 * 1024 * 1024, cast=int)
+PHOTO_UPLOAD_MAX_PIXELS = config('PHOTO_UPLOAD_MAX_PIXELS', default=50_000_000, cast=int)
+PHOTO_UPLOAD_CHUNK_SIZE = config('PHOTO_UPLOAD_CHUNK_SIZE', default=1024 * 1024, cast=int)
+PHOTO_UPLOAD_TEMP_DIR = config('PHOTO_UPLOAD_TEMP_DIR', default=str(BASE_DIR / 'tmp' / 'uploads'))
+# 完了しないまま放置されたアップロードを削除するまでの時間
+PHOTO_UPLOAD_EXPIRE_HOURS = config('PHOTO_UPLOAD_EXPIRE_HOURS', default=24, cast=int)
+
+# パフォーマンス計測（nursery.middleware.PerformanceMiddleware）
+PERF_METRICS_ENABLED = config('PERF_METRICS_ENABLED', default=True, cast=bool)
+PERF_SERVER_TIMING = config('PERF_SERVER_TIMING', default=DEBUG, cast=bool)
+# プロセスごとの集計の書き出し先（例: /var/tmp/hoikunavi-perf）。空なら書き出さない
+PERF_REPORT_DIR = config('PERF_REPORT_DIR', default='')
+PERF_SNAPSHOT_INTERVAL = config('PERF_SNAPSHOT_INTERVAL', default=30, cast=int)
+# この秒数以上更新されていないプロセスの書き出し結果は、終了したものとして集計時に削除する
+PERF_SNAPSHOT_MAX_AGE = config('PERF_SNAPSHOT_MAX_AGE', default=24 * 60 * 60, cast=int)
+# ビューごとのSQL発行回数の上限（セッション・認証のクエリを含む）
+PERF_QUERY_BUDGETS = {
+    'nursery:nursery_list': 4,
+    'nursery:nursery_detail': 5,
+    'nursery:schedule_list': 4,
+    'nursery:impression_list': 4,
+    'nursery:map_view': 3,
+    'nursery:map_tile': 3,
+    'nursery:ranking': 4,
+    'nursery:nursery_compare': 6,
+}
+# 予算超過を例外にする（テストでは hoiku_navi.test_runner が有効にする）
+PERF_ENFORCE_BUDGETS = config('PERF_ENFORCE_BUDGETS', default=False, cast=bool)
+
+TEST_RUNNER = 'hoiku_navi.test_runner.TestRunner'
+
+# JSON API のトークンの有効期間（秒）
+API_TOKEN_MAX_AGE = config('API_TOKEN_MAX_AGE', default=30 * 24 * 60 * 60, cast=int)
 
 # ログイン設定
 LOGIN_URL = 'nursery:login'
@@ -0,0 +1,14 @@
+"""
+テストランナー
+
+通常の DiscoverRunner に加えて、ビューのSQL発行回数が PERF_QUERY_BUDGETS を
+超えたら例外にする（PERF_ENFORCE_BUDGETS）。
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.PERF_ENFORCE_BUDGETS = True
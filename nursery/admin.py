@@ -1,15 +1,18 @@
 from django.contrib import admin
-from .models import Nursery, VisitSchedule, VisitImpression
+from .models import (
+    Nursery, VisitSchedule, VisitImpression, BackgroundJob, GeocodeCache, HomeLocation, PhotoUpload, RankingWeights,
+)
+from .distances import home_moved, schedule_recompute
 
 
 @admin.register(Nursery)
 class NurseryAdmin(admin.ModelAdmin):
-    list_display = ['facility_number', 'name', 'nursery_type', 'address', 'phone_number']
-    list_filter = ['nursery_type', 'saturday_available', 'has_contact_app', 'has_parking', 'has_lunch']
+    list_display = ['facility_number', 'name', 'nursery_type', 'address', 'phone_number', 'owner']
+    list_filter = ['owner', 'nursery_type', 'saturday_available', 'has_contact_app', 'has_parking', 'has_lunch', 'geocode_status']
     search_fields = ['name', 'facility_number', 'address']
     fieldsets = (
         ('基本情報', {
-            'fields': ('facility_number', 'name', 'nursery_type', 'address', 'phone_number')
+            'fields': ('owner', 'facility_number', 'name', 'nursery_type', 'address', 'phone_number')
         }),
         ('保育時間', {
             'fields': ('opening_time', 'closing_time', 'saturday_available')
@@ -24,18 +27,26 @@ class NurseryAdmin(admin.ModelAdmin):
             'fields': ('has_school_bus', 'has_parking', 'has_lunch', 'has_allergy_support')
         }),
         ('位置情報', {
-            'fields': ('latitude', 'longitude', 'distance_from_home', 'travel_time')
+            'fields': ('latitude', 'longitude', 'geocode_status', 'distance_from_home', 'travel_time')
         }),
         ('その他', {
             'fields': ('notes',)
         }),
     )
+    
+    def save_model(self, request, obj, form, change):
+        moved = {'latitude', 'longitude'} & set(form.changed_data)
+        if moved:
+            obj.distance_stale = True
+        super().save_model(request, obj, form, change)
+        if moved and obj.owner_id is not None:
+            schedule_recompute([obj.owner_id])
 
 
 @admin.register(VisitSchedule)
 class VisitScheduleAdmin(admin.ModelAdmin):
-    list_display = ['nursery', 'visit_date', 'visit_time', 'status', 'contact_person']
-    list_filter = ['status', 'visit_date']
+    list_display = ['nursery', 'visit_date', 'visit_time', 'status', 'contact_person', 'owner']
+    list_filter = ['owner', 'status', 'visit_date']
     search_fields = ['nursery__name', 'contact_person']
     date_hierarchy = 'visit_date'
     ordering = ['-visit_date', 'visit_time']
@@ -43,12 +54,12 @@ class VisitScheduleAdmin(admin.ModelAdmin):
 
 @admin.register(VisitImpression)
 class VisitImpressionAdmin(admin.ModelAdmin):
-    list_display = ['nursery', 'overall_rating', 'application_intention', 'priority_rank', 'created_at']
-    list_filter = ['overall_rating', 'application_intention']
+    list_display = ['nursery', 'overall_rating', 'application_intention', 'priority_rank', 'created_at', 'owner']
+    list_filter = ['owner', 'overall_rating', 'application_intention']
     search_fields = ['nursery__name']
     fieldsets = (
         ('基本情報', {
-            'fields': ('nursery', 'visit_schedule')
+            'fields': ('owner', 'nursery', 'visit_schedule')
         }),
         ('評価', {
             'fields': ('overall_rating', 'facility_rating', 'staff_rating', 'education_rating', 'access_rating')
@@ -63,3 +74,43 @@ class VisitImpressionAdmin(admin.ModelAdmin):
             'fields': ('photo1', 'photo2', 'photo3')
         }),
     )
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'status', 'attempts', 'run_after', 'updated_at']
+    list_filter = ['kind', 'status']
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(GeocodeCache)
+class GeocodeCacheAdmin(admin.ModelAdmin):
+    list_display = ['normalized_address', 'latitude', 'longitude', 'hit_count', 'expires_at']
+    search_fields = ['normalized_address']
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(HomeLocation)
+class HomeLocationAdmin(admin.ModelAdmin):
+    list_display = ['user', 'address', 'latitude', 'longitude', 'updated_at']
+    search_fields = ['user__username', 'address']
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if {'latitude', 'longitude'} & set(form.changed_data):
+            home_moved(obj)
+
+
+@admin.register(RankingWeights)
+class RankingWeightsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'overall', 'facility', 'staff', 'education', 'access',
+                    'monthly_fee', 'priority', 'distance', 'updated_at']
+    search_fields = ['user__username']
+
+
+@admin.register(PhotoUpload)
+class PhotoUploadAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'status', 'received', 'total_size', 'updated_at']
+    list_filter = ['status']
+    search_fields = ['filename', 'user__username']
+    readonly_fields = ['created_at', 'updated_at']
@@ -0,0 +1,77 @@
+"""
+Nursery に保存している見学・感想の集計値の更新
+
+一覧や並べ替えのたびに JOIN と GROUP BY をしないよう、集計値は保育園の列に
+持たせておき、見学スケジュール・感想が保存・削除されたときに対象の保育園だけ
+更新する。更新は1つの UPDATE 文（相関サブクエリ）で行うので、同時に保存されても
+常に実際の行から計算した値になる。
+"""
+from django.db.models import Avg, Count, FloatField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+RATING_AXES = ['facility_rating', 'staff_rating', 'education_rating', 'access_rating']
+AGGREGATE_FIELDS = [
+    'visit_count', 'impression_count', 'rating_sum', 'rating_avg',
+    *[f'{axis}_avg' for axis in RATING_AXES],
+]
+
+
+def _subquery(model, aggregate, output_field):
+    return Subquery(
+        model.objects.filter(nursery=OuterRef('pk'))
+        .order_by()
+        .values('nursery')
+        .annotate(value=aggregate)
+        .values('value'),
+        output_field=output_field,
+    )
+
+
+def aggregate_expressions(schedule_model, impression_model):
+    """各集計列の値を計算する式（マイグレーションからも使えるようモデルを引数で受け取る）"""
+    expressions = {
+        'visit_count': Coalesce(_subquery(schedule_model, Count('pk'), IntegerField()), Value(0)),
+        'impression_count': Coalesce(_subquery(impression_model, Count('pk'), IntegerField()), Value(0)),
+        'rating_sum': Coalesce(_subquery(impression_model, Sum('overall_rating'), IntegerField()), Value(0)),
+        'rating_avg': _subquery(impression_model, Avg('overall_rating'), FloatField()),
+    }
+    for axis in RATING_AXES:
+        expressions[f'{axis}_avg'] = _subquery(impression_model, Avg(axis), FloatField())
+    return expressions
+
+
+def refresh_aggregates(nursery_ids=None):
+    """指定した保育園（省略時は全件）の集計値を更新し、更新件数を返す"""
+    from .models import Nursery, VisitImpression, VisitSchedule
+
+    queryset = Nursery.objects.all()
+    if nursery_ids is not None:
+        nursery_ids = [pk for pk in nursery_ids if pk is not None]
+        if not nursery_ids:
+            return 0
+        queryset = queryset.filter(pk__in=nursery_ids)
+    return queryset.update(**aggregate_expressions(VisitSchedule, VisitImpression))
+
+
+def find_drift(batch_size=2000):
+    """保存値と実際の集計値が食い違っている保育園の (pk, 列名, 保存値, 実際の値) を返す"""
+    from .models import Nursery, VisitImpression, VisitSchedule
+
+    expressions = aggregate_expressions(VisitSchedule, VisitImpression)
+    annotations = {f'actual_{name}': expression for name, expression in expressions.items()}
+    drift = []
+    rows = (
+        Nursery.objects.order_by('pk')
+        .annotate(**annotations)
+        .values('pk', *AGGREGATE_FIELDS, *annotations)
+    )
+    for row in rows.iterator(chunk_size=batch_size):
+        for name in AGGREGATE_FIELDS:
+            stored, actual = row[name], row[f'actual_{name}']
+            if stored is None or actual is None:
+                differs = stored is not actual
+            else:
+                differs = abs(stored - actual) > 1e-9
+            if differs:
+                drift.append((row['pk'], name, stored, actual))
+    return drift
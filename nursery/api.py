@@ -0,0 +1,377 @@
+"""
+保育園・見学スケジュール・見学感想の JSON API
+
+    GET    /api/<resource>/             一覧（カーソル方式のページ分割）
+    POST   /api/<resource>/             登録
+    GET    /api/<resource>/<id>/        1件取得
+    PUT    /api/<resource>/<id>/        更新（全項目）
+    PATCH  /api/<resource>/<id>/        更新（送った項目のみ）
+    DELETE /api/<resource>/<id>/        削除
+
+resource は nurseries / schedules / impressions。一覧は ``?cursor=`` で続きを取得し、
+``?fields=id,name`` で必要な項目だけを返す（SELECT する列も絞る）。
+応答には ETag を付け、If-None-Match が一致すれば 304 を返す。一覧の ETag は
+ユーザーのデータのバージョン（caching.data_version）とURLから作るので、304 の判定に
+一覧のクエリは発行しない。更新・削除で If-Match を送ると、他の端末で先に更新されていた
+場合は 412 を返す。登録・更新の入力は画面と同じ ModelForm で検証する。
+
+認証は画面と同じセッションか、トークン（``Authorization: Bearer <token>``）。
+トークンは ``POST /api/token/`` にユーザー名とパスワードを送って取得する
+（API_TOKEN_MAX_AGE 秒で期限切れ、パスワードを変更すると使えなくなる）。
+トークンで認証したリクエストには CSRF トークンは不要で、セッションで認証した
+登録・更新・削除には画面と同じく CSRF トークンが必要。
+読み書きできるのはログイン中のユーザーが所有するデータだけ。
+"""
+import hashlib
+import json
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.forms.models import model_to_dict
+from django.http import Http404, HttpResponse, JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.middleware.http import ConditionalGetMiddleware
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import decorator_from_middleware
+from django.utils.http import quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .caching import data_version
+from .forms import NurseryForm, VisitImpressionForm, VisitScheduleForm
+from .geocoding import queue_geocoding
+from .models import Nursery, VisitImpression, VisitSchedule
+from .pagination import CursorPaginator, InvalidCursor
+from .search import search_nurseries
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+conditional_get = decorator_from_middleware(ConditionalGetMiddleware)
+
+
+@dataclass
+class Resource:
+    model: type
+    form_class: type
+    fields: list
+    # インデックスのある並び順（最後は一意な列）
+    ordering: list
+    # クエリパラメータ名 → 絞り込みの条件
+    filters: dict = field(default_factory=dict)
+
+    def form(self, data, user, instance=None):
+        return self.form_class(data=data, instance=instance, user=user)
+
+    def queryset(self, user):
+        return self.model.objects.filter(owner=user)
+
+
+RESOURCES = {
+    'nurseries': Resource(
+        model=Nursery,
+        form_class=NurseryForm,
+        fields=[
+            'id', 'facility_number', 'name', 'nursery_type', 'address', 'phone_number',
+            'opening_time', 'closing_time', 'saturday_available',
+            'capacity', 'age_from_months', 'age_to_years',
+            'has_contact_app', 'contact_app_name',
+            'has_school_bus', 'has_parking', 'has_lunch', 'has_allergy_support',
+            'notes', 'latitude', 'longitude', 'geocode_status',
+            'distance_from_home', 'travel_time',
+            'visit_count', 'impression_count', 'rating_avg',
+            'facility_rating_avg', 'staff_rating_avg', 'education_rating_avg', 'access_rating_avg',
+            'created_at', 'updated_at',
+        ],
+        ordering=['name', 'id'],
+        filters={'type': 'nursery_type'},
+    ),
+    'schedules': Resource(
+        model=VisitSchedule,
+        form_class=VisitScheduleForm,
+        fields=[
+            'id', 'nursery', 'visit_date', 'visit_time', 'status',
+            'contact_person', 'notes', 'created_at', 'updated_at',
+        ],
+        ordering=['visit_date', 'visit_time', 'id'],
+        filters={
+            'status': 'status',
+            'nursery': 'nursery_id',
+            'date_from': 'visit_date__gte',
+            'date_to': 'visit_date__lte',
+        },
+    ),
+    'impressions': Resource(
+        model=VisitImpression,
+        form_class=VisitImpressionForm,
+        fields=[
+            'id', 'nursery', 'visit_schedule',
+            'overall_rating', 'facility_rating', 'staff_rating', 'education_rating', 'access_rating',
+            'good_points', 'concern_points', 'staff_impression', 'children_atmosphere',
+            'estimated_monthly_fee', 'application_intention', 'priority_rank',
+            'created_at', 'updated_at',
+        ],
+        ordering=['-created_at', 'id'],
+        filters={
+            'nursery': 'nursery_id',
+            'rating': 'overall_rating',
+            'application': 'application_intention',
+        },
+    ),
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.errors = errors
+
+
+def _error(message, status, errors=None):
+    payload = {'error': message}
+    if errors is not None:
+        payload['errors'] = errors
+    return JsonResponse(payload, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def _token_signer(user):
+    # パスワードを変更すると以前のトークンは使えなくなる
+    return signing.TimestampSigner(salt=f'nursery.api_token:{user.password}')
+
+
+def api_token(user):
+    """API のトークン"""
+    return _token_signer(user).sign(str(user.pk))
+
+
+def user_from_api_token(token):
+    """トークンに対応するユーザー（不正・期限切れなら None）"""
+    from django.contrib.auth.models import User
+
+    pk, _, _ = token.partition(':')
+    user = User.objects.filter(pk=pk, is_active=True).first() if pk.isdigit() else None
+    if user is None:
+        return None
+    try:
+        _token_signer(user).unsign(token, max_age=settings.API_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return user
+
+
+def _bearer_token(request):
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' else None
+
+
+def _csrf_failed(request):
+    """セッションで認証したリクエストの CSRF トークンを確認する（不正なら True）"""
+    check = CsrfViewMiddleware(lambda request: None)
+    check.process_request(request)
+    return check.process_view(request, None, (), {}) is not None
+
+
+def api_view(view):
+    """リソース名の解決・認証・エラー応答をまとめて行う"""
+    @csrf_exempt
+    def wrapper(request, resource, *args, **kwargs):
+        token = _bearer_token(request)
+        if token is not None:
+            user = user_from_api_token(token)
+            if user is None:
+                return _error('トークンが不正か期限切れです', 401)
+            request.user = user
+        elif not request.user.is_authenticated:
+            return _error('ログインが必要です', 401)
+        elif _csrf_failed(request):
+            return _error('CSRFトークンが不正です', 403)
+        spec = RESOURCES.get(resource)
+        if spec is None:
+            return _error('リソースが見つかりません', 404)
+        try:
+            return view(request, spec, *args, **kwargs)
+        except ApiError as e:
+            return _error(str(e), e.status, e.errors)
+        except Http404:
+            return _error('見つかりません', 404)
+    wrapper.__name__ = view.__name__
+    wrapper.__doc__ = view.__doc__
+    return wrapper
+
+
+def _requested_fields(request, spec):
+    """?fields= で指定された項目（省略時はすべて）"""
+    value = request.GET.get('fields')
+    if not value:
+        return list(spec.fields)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in spec.fields]
+    if unknown:
+        raise ApiError(f"不明な項目です: {', '.join(unknown)}")
+    return fields
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('limit は整数で指定してください')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _filter(request, spec, queryset):
+    for param, lookup in spec.filters.items():
+        value = request.GET.get(param)
+        if value in (None, ''):
+            continue
+        if lookup == 'application_intention':
+            value = value.lower() in ('1', 'true', 'yes')
+        try:
+            queryset = queryset.filter(**{lookup: value})
+        except (ValueError, ValidationError):
+            raise ApiError(f'{param} の値が不正です')
+    if spec.model is Nursery and request.GET.get('q'):
+        queryset = search_nurseries(queryset, request.GET['q'])
+    return queryset
+
+
+def _page_url(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def _serialize(spec, instance, fields=None):
+    """一覧（values()）と同じ形の dict（外部キーは id）"""
+    return {
+        name: getattr(instance, spec.model._meta.get_field(name).attname)
+        for name in fields or spec.fields
+    }
+
+
+def _etag(data):
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+    return quote_etag(hashlib.md5(body).hexdigest())
+
+
+def _parse_body(request):
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ApiError('JSON の形式が不正です')
+    if not isinstance(payload, dict):
+        raise ApiError('JSON オブジェクトを送ってください')
+    return payload
+
+
+def _save(request, spec, data, instance=None):
+    form = spec.form(data, request.user, instance=instance)
+    if not form.is_valid():
+        raise ApiError('入力内容に誤りがあります', 400, form.errors.get_json_data())
+    created = instance is None
+    instance = form.save()
+    # 画面から登録した場合と同じく、住所が変われば位置情報の取得を予約する
+    if spec.model is Nursery and (created or 'address' in form.changed_data):
+        queue_geocoding(instance)
+    return instance
+
+
+def _item_response(spec, instance, fields=None, status=200):
+    """ETag は項目の指定にかかわらず全項目の内容から作る（If-Match と比較するため）"""
+    response = _json(_serialize(spec, instance, fields), status=status)
+    response['ETag'] = _etag(_serialize(spec, instance))
+    return response
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+def token(request):
+    """ユーザー名・パスワードからトークンを発行する（画面を使わない端末向け）"""
+    try:
+        payload = _parse_body(request)
+    except ApiError as e:
+        return _error(str(e), e.status)
+    user = authenticate(request, username=payload.get('username'), password=payload.get('password'))
+    if user is None:
+        return _error('ユーザー名またはパスワードが違います', 401)
+    return _json({'token': api_token(user), 'expires_in': settings.API_TOKEN_MAX_AGE})
+
+
+def _collection_etag(request):
+    """一覧の ETag（データが変わるとバージョンが上がるので、クエリを発行せずに判定できる）"""
+    key = f'{request.user.pk}:{data_version(request.user.pk)}:{request.get_full_path()}'
+    return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+
+@api_view
+@require_http_methods(['GET', 'HEAD', 'POST'])
+def collection(request, spec):
+    """一覧・登録"""
+    if request.method == 'POST':
+        instance = _save(request, spec, _parse_body(request))
+        return _item_response(spec, instance, status=201)
+
+    etag = _collection_etag(request)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return response
+
+    fields = _requested_fields(request, spec)
+    # 並び順の列はカーソルを作るために必ず読む
+    ordering_fields = [name.lstrip('-') for name in spec.ordering]
+    columns = list(dict.fromkeys(fields + ordering_fields))
+    queryset = _filter(request, spec, spec.queryset(request.user)).values(*columns)
+
+    paginator = CursorPaginator(queryset, spec.ordering, page_size=_limit(request))
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise ApiError('cursor が不正です')
+    response = _json({
+        'results': [{name: row[name] for name in fields} for row in page],
+        'next': _page_url(request, page.next_cursor),
+        'previous': _page_url(request, page.previous_cursor),
+    })
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@api_view
+@conditional_get
+@require_http_methods(['GET', 'HEAD', 'PUT', 'PATCH', 'DELETE'])
+def item(request, spec, pk):
+    """1件の取得・更新・削除"""
+    instance = get_object_or_404(spec.queryset(request.user), pk=pk)
+    if request.method in ('GET', 'HEAD'):
+        return _item_response(spec, instance, _requested_fields(request, spec))
+
+    # If-Match が現在の内容と一致しなければ 412（他の端末での更新を上書きしない）
+    precondition = get_conditional_response(request, etag=_etag(_serialize(spec, instance)))
+    if precondition is not None and precondition.status_code == 412:
+        return _error('他の端末で更新されています。取得し直してください。', 412)
+
+    if request.method == 'DELETE':
+        instance.delete()
+        return HttpResponse(status=204)
+
+    payload = _parse_body(request)
+    if request.method == 'PATCH':
+        form_fields = spec.form_class._meta.fields
+        data = {**model_to_dict(instance, fields=form_fields), **payload}
+    else:
+        data = payload
+    instance = _save(request, spec, data, instance=instance)
+    return _item_response(spec, instance)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class NurseryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'nursery'
+
+    def ready(self):
+        # ジョブの処理関数とシグナルを登録する
+        from . import distances, geocoding, images, signals  # noqa: F401
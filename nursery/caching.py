@@ -0,0 +1,45 @@
+"""
+キャッシュのバージョン管理
+
+キャッシュキーにバージョン番号を含めておき、元データが変わったら番号を
+上げることで古いキャッシュをまとめて無効化する（古いエントリはTTLで消える）。
+
+ユーザーごとの「データのバージョン」（data_version）は、そのユーザーの保育園・
+見学スケジュール・感想が変わると bump_data_version で上がる。ホーム画面、一覧の件数、
+地図のタイル、ランキングの特徴量のキャッシュキーはこのバージョンを含む。
+"""
+from django.core.cache import cache
+
+VERSION_TIMEOUT = 60 * 60 * 24 * 30
+DATA_VERSION_NAME = 'data'
+
+
+def _version_key(name):
+    return f'hoikunavi:version:{name}'
+
+
+def get_version(name):
+    version = cache.get(_version_key(name))
+    if version is None:
+        cache.add(_version_key(name), 1, VERSION_TIMEOUT)
+        version = cache.get(_version_key(name), 1)
+    return version
+
+
+def bump_version(name):
+    try:
+        return cache.incr(_version_key(name))
+    except ValueError:
+        # まだバージョンが保存されていない（または期限切れ）
+        cache.set(_version_key(name), 2, VERSION_TIMEOUT)
+        return 2
+
+
+def data_version(owner_id):
+    """ユーザーのデータのバージョン（そのユーザーの保育園・見学データが変わると上がる）"""
+    return get_version(f'{DATA_VERSION_NAME}:{owner_id}')
+
+
+def bump_data_version(owner_id):
+    """ユーザーのデータに依存するキャッシュ（ホーム画面・一覧の件数・地図のタイル・ランキング）をまとめて無効にする"""
+    bump_version(f'{DATA_VERSION_NAME}:{owner_id}')
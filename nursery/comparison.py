@@ -0,0 +1,180 @@
+"""
+保育園の比較表
+
+選んだ保育園（最大 MAX_NURSERIES 件）を並べ、施設の情報と見学感想の集計値を比べる。
+比べる件数にかかわらずクエリの回数は一定で、
+
+1. 保育園（所有者で絞り込み）
+2. 見学スケジュール（保育園ごとに新しい順の SCHEDULES_PER_NURSERY 件。Prefetch）
+3. 見学感想（保育園ごとに新しい順の IMPRESSIONS_PER_NURSERY 件。Prefetch）
+4. 見学感想の集計（評価の項目ごとの平均・費用・申込意向・優先順位を保育園ごとに GROUP BY）
+
+の4回だけ読む。
+"""
+from dataclasses import dataclass, field
+
+from django.db.models import Avg, Count, Min, Prefetch, Q
+
+from .models import Nursery, VisitImpression, VisitSchedule
+
+MAX_NURSERIES = 10
+SCHEDULES_PER_NURSERY = 3
+IMPRESSIONS_PER_NURSERY = 2
+
+RATING_AXES = [
+    ('overall', '総合評価', 'overall_rating'),
+    ('facility', '施設・設備', 'facility_rating'),
+    ('staff', 'スタッフ・先生', 'staff_rating'),
+    ('education', '教育方針', 'education_rating'),
+    ('access', 'アクセス', 'access_rating'),
+]
+
+
+def parse_ids(values):
+    """?ids=1&ids=2 や ?ids=1,2 を保育園のIDのリストにする（重複・不正な値は除き、順序は保つ）"""
+    ids = []
+    for value in values:
+        for part in value.split(','):
+            part = part.strip()
+            if part.isdigit() and int(part) not in ids:
+                ids.append(int(part))
+    return ids
+
+
+def comparison_queryset(owner, ids):
+    """比較する保育園（最近の見学スケジュール・感想を Prefetch で付ける）"""
+    return Nursery.objects.filter(owner=owner, pk__in=ids).prefetch_related(
+        Prefetch(
+            'visit_schedules',
+            queryset=VisitSchedule.objects.order_by('-visit_date', '-visit_time')[:SCHEDULES_PER_NURSERY],
+            to_attr='recent_schedules',
+        ),
+        Prefetch(
+            'impressions',
+            queryset=VisitImpression.objects.order_by('-created_at')[:IMPRESSIONS_PER_NURSERY],
+            to_attr='recent_impressions',
+        ),
+    )
+
+
+def stats_queryset(owner, ids):
+    """保育園ごとの見学感想の集計（1回の GROUP BY）"""
+    return (
+        VisitImpression.objects.filter(owner=owner, nursery_id__in=ids)
+        .order_by()
+        .values('nursery')
+        .annotate(
+            count=Count('pk'),
+            **{key: Avg(field) for key, _, field in RATING_AXES},
+            fee_avg=Avg('estimated_monthly_fee'),
+            applying=Count('pk', filter=Q(application_intention=True)),
+            best_priority=Min('priority_rank'),
+        )
+    )
+
+
+def impression_stats(owner, ids):
+    return {row['nursery']: row for row in stats_queryset(owner, ids)}
+
+
+@dataclass
+class Row:
+    label: str
+    cells: list
+    # 最も良い値の列（数値で比べる行のみ）
+    best: set = field(default_factory=set)
+
+
+def _best(values, higher_is_better=True):
+    present = [value for value in values if value is not None]
+    if len(present) < 2:
+        return set()
+    target = max(present) if higher_is_better else min(present)
+    return {index for index, value in enumerate(values) if value == target}
+
+
+def _hours(nursery):
+    if nursery.opening_time and nursery.closing_time:
+        return f'{nursery.opening_time:%H:%M}〜{nursery.closing_time:%H:%M}'
+    return None
+
+
+def _ages(nursery):
+    if nursery.age_from_months is None and nursery.age_to_years is None:
+        return None
+    start = f'{nursery.age_from_months}ヶ月' if nursery.age_from_months is not None else ''
+    end = f'{nursery.age_to_years}歳' if nursery.age_to_years is not None else ''
+    return f'{start}〜{end}'
+
+
+def _flag(value):
+    return '○' if value else '×'
+
+
+@dataclass
+class Comparison:
+    nurseries: list
+    stats: dict
+    # 見つからなかった・上限を超えたため外したID
+    missing_ids: list = field(default_factory=list)
+    truncated: bool = False
+
+    def _stat(self, nursery, key):
+        return self.stats.get(nursery.pk, {}).get(key)
+
+    @property
+    def facility_rows(self):
+        nurseries = self.nurseries
+        distances = [nursery.distance_from_home for nursery in nurseries]
+        capacities = [nursery.capacity for nursery in nurseries]
+        return [
+            Row('施設タイプ', [nursery.nursery_type for nursery in nurseries]),
+            Row('住所', [nursery.address for nursery in nurseries]),
+            Row('保育時間', [_hours(nursery) for nursery in nurseries]),
+            Row('土曜保育', [_flag(nursery.saturday_available) for nursery in nurseries]),
+            Row('定員', [f'{value}名' if value is not None else None for value in capacities],
+                _best(capacities)),
+            Row('対象年齢', [_ages(nursery) for nursery in nurseries]),
+            Row('給食', [_flag(nursery.has_lunch) for nursery in nurseries]),
+            Row('アレルギー対応', [_flag(nursery.has_allergy_support) for nursery in nurseries]),
+            Row('連絡アプリ', [nursery.contact_app_name or _flag(nursery.has_contact_app) for nursery in nurseries]),
+            Row('送迎バス', [_flag(nursery.has_school_bus) for nursery in nurseries]),
+            Row('駐車場', [_flag(nursery.has_parking) for nursery in nurseries]),
+            Row('自宅からの距離',
+                [f'{nursery.distance_from_home:.1f}km（徒歩{nursery.travel_time}分）'
+                 if nursery.distance_from_home is not None else None for nursery in nurseries],
+                _best(distances, higher_is_better=False)),
+        ]
+
+    @property
+    def rating_rows(self):
+        rows = [Row('感想の数', [self._stat(nursery, 'count') or 0 for nursery in self.nurseries])]
+        for key, label, _ in RATING_AXES:
+            values = [self._stat(nursery, key) for nursery in self.nurseries]
+            rows.append(Row(label, [f'{value:.1f}' if value is not None else None for value in values],
+                            _best(values)))
+        fees = [self._stat(nursery, 'fee_avg') for nursery in self.nurseries]
+        priorities = [self._stat(nursery, 'best_priority') for nursery in self.nurseries]
+        rows += [
+            Row('想定月額費用（平均）', [f'{value:,.0f}円' if value is not None else None for value in fees],
+                _best(fees, higher_is_better=False)),
+            Row('申込意向', ['あり' if self._stat(nursery, 'applying') else None for nursery in self.nurseries]),
+            Row('優先順位', [f'{value}位' if value is not None else None for value in priorities],
+                _best(priorities, higher_is_better=False)),
+        ]
+        return rows
+
+
+def build_comparison(owner, ids):
+    """ids の順に並べた比較表"""
+    truncated = len(ids) > MAX_NURSERIES
+    ids = ids[:MAX_NURSERIES]
+    found = {nursery.pk: nursery for nursery in comparison_queryset(owner, ids)}
+    nurseries = [found[pk] for pk in ids if pk in found]
+    stats = impression_stats(owner, list(found)) if found else {}
+    return Comparison(
+        nurseries=nurseries,
+        stats=stats,
+        missing_ids=[pk for pk in ids if pk not in found],
+        truncated=truncated,
+    )
@@ -0,0 +1,153 @@
+"""
+見学スケジュールの重なり・無理のある予定の検出
+
+見学は見学時刻から VISIT_DURATION（カレンダー登録と同じ1時間）かかるものとし、
+ステータスが「予定」で見学時刻のある見学について次を調べる。
+
+- 時間の重複: 他の見学と時間が重なる
+- 移動時間の不足: 前の見学が終わってから、移動時間（直線距離からの見積もり。
+  SCHEDULE_MIN_TRAVEL_BUFFER 分以上）のうちに始まる
+- 開園時間外: 保育園の開園時間〜閉園時間に収まらない
+
+見学はユーザー・見学日・見学時刻の部分インデックス（schedule_owner_upcoming_idx）で
+期間を指定して読み、見学時刻の順に1回なめて調べる（日付をまたぐ見学は考えない）。
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+
+from .distances import travel_minutes
+from .geo import haversine_km
+from .models import VisitSchedule
+from .utils import VISIT_DURATION
+
+OVERLAP = '時間の重複'
+TRAVEL = '移動時間の不足'
+OUTSIDE_HOURS = '開園時間外'
+
+
+@dataclass
+class Conflict:
+    kind: str
+    schedule: VisitSchedule
+    # 重なる・直前の見学（開園時間外では None）
+    other: VisitSchedule = None
+    # 重なっている・足りない時間（分）
+    minutes: int = 0
+    # other が schedule より後の見学か（登録しようとしている見学の側から報告する場合）
+    other_is_later: bool = False
+
+    @property
+    def message(self):
+        nursery = self.schedule.nursery
+        if self.kind == OVERLAP:
+            return (f'{self.other.nursery.name}（{self.other.visit_time:%H:%M}〜）の見学と'
+                    f'{self.minutes}分重なっています')
+        if self.kind == TRAVEL:
+            other = f'{self.other.nursery.name}（{self.other.visit_time:%H:%M}〜）の見学'
+            if self.other_is_later:
+                return f'{other}までの移動の時間が約{self.minutes}分足りません'
+            return f'{other}の後、移動の時間が約{self.minutes}分足りません'
+        opening = f'{nursery.opening_time:%H:%M}' if nursery.opening_time else ''
+        closing = f'{nursery.closing_time:%H:%M}' if nursery.closing_time else ''
+        return f'{nursery.name}の開園時間（{opening}〜{closing}）外です'
+
+
+def _start(schedule):
+    return datetime.combine(schedule.visit_date, schedule.visit_time)
+
+
+def _minutes_between(earlier, later):
+    return int((later - earlier).total_seconds() // 60)
+
+
+def travel_buffer(nursery, other):
+    """nursery から other への移動に見込む時間（分）"""
+    minimum = settings.SCHEDULE_MIN_TRAVEL_BUFFER
+    if None in (nursery.latitude, nursery.longitude, other.latitude, other.longitude) or nursery.pk == other.pk:
+        return minimum
+    km = haversine_km(float(nursery.latitude), float(nursery.longitude),
+                      float(other.latitude), float(other.longitude))
+    return max(minimum, int(travel_minutes(km)))
+
+
+def hours_conflict(schedule):
+    """開園時間に収まらない見学なら Conflict"""
+    nursery = schedule.nursery
+    start = schedule.visit_time
+    end = (_start(schedule) + VISIT_DURATION).time()
+    too_early = nursery.opening_time is not None and start < nursery.opening_time
+    # 日付をまたぐ場合（end < start）も閉園後として扱う
+    too_late = nursery.closing_time is not None and (end > nursery.closing_time or end < start)
+    if too_early or too_late:
+        return Conflict(OUTSIDE_HOURS, schedule)
+    return None
+
+
+def detect_conflicts(schedules):
+    """
+    見学日・見学時刻の順に並んだ見学の Conflict のリスト
+
+    2件の見学の問題は後の見学の側に1回だけ報告する。
+    """
+    conflicts = []
+    # まだ終わっていない見学（終了時刻, 見学）
+    active = []
+    previous = None
+    for schedule in schedules:
+        start = _start(schedule)
+        active = [(end, other) for end, other in active if end > start]
+        for end, other in active:
+            conflicts.append(Conflict(OVERLAP, schedule, other, _minutes_between(start, end)))
+
+        if previous is not None and previous.visit_date == schedule.visit_date:
+            previous_end = _start(previous) + VISIT_DURATION
+            if previous_end <= start:
+                gap = _minutes_between(previous_end, start)
+                needed = travel_buffer(previous.nursery, schedule.nursery)
+                if gap < needed:
+                    conflicts.append(Conflict(TRAVEL, schedule, previous, needed - gap))
+
+        conflict = hours_conflict(schedule)
+        if conflict is not None:
+            conflicts.append(conflict)
+        active.append((start + VISIT_DURATION, schedule))
+        previous = schedule
+    return conflicts
+
+
+def scheduled_visits(owner, date_from, date_to=None):
+    """期間内の予定の見学（見学時刻のあるもの）を見学日・見学時刻の順に"""
+    queryset = VisitSchedule.objects.filter(
+        owner=owner, status='予定', visit_date__gte=date_from, visit_time__isnull=False,
+    )
+    if date_to is not None:
+        queryset = queryset.filter(visit_date__lte=date_to)
+    return queryset.select_related('nursery').order_by('visit_date', 'visit_time', 'id')
+
+
+def conflicts_for(schedule):
+    """
+    登録・変更しようとしている見学の問題（保存前のインスタンスで調べる）
+
+    同じ日の他の見学だけを読む。
+    """
+    if schedule.status != '予定' or schedule.visit_time is None or schedule.visit_date is None:
+        return []
+    others = scheduled_visits(schedule.owner_id, schedule.visit_date, schedule.visit_date)
+    if schedule.pk is not None:
+        others = others.exclude(pk=schedule.pk)
+    visits = sorted([*others, schedule], key=lambda visit: (visit.visit_time, visit is schedule))
+    conflicts = []
+    for conflict in detect_conflicts(visits):
+        if conflict.schedule is schedule:
+            conflicts.append(conflict)
+        elif conflict.other is schedule:
+            conflicts.append(Conflict(conflict.kind, schedule, conflict.schedule, conflict.minutes, other_is_later=True))
+    return conflicts
+
+
+def calendar_report(owner, date_from, date_to=None):
+    """期間内（date_to を省略すると以降すべて）の予定の見学の問題"""
+    return detect_conflicts(scheduled_visits(owner, date_from, date_to).iterator())
@@ -0,0 +1,73 @@
+"""
+ホーム画面（ダッシュボード）の表示内容
+
+件数は1回のクエリ（スカラーサブクエリ）でまとめて取得し、表示内容全体を
+ユーザーごとに短時間キャッシュする。保育園・見学スケジュール・感想が
+保存・削除されるとシグナルでその所有者のバージョンが上がり、キャッシュは無効になる。
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import IntegerField, Subquery
+from django.utils import timezone
+
+from .caching import data_version
+from .models import Nursery, VisitImpression, VisitSchedule
+
+
+class SubqueryCount(Subquery):
+    """サブクエリの行数（GROUP BY を伴わない COUNT）"""
+    template = '(SELECT COUNT(*) FROM (%(subquery)s) _count)'
+    output_field = IntegerField()
+
+
+def _count(queryset):
+    return SubqueryCount(queryset.order_by().values('pk'))
+
+
+def dashboard_counts(user):
+    """
+    ホーム画面の件数を1回のクエリで取得
+
+    4つの件数をユーザーの行にスカラーサブクエリとして付ける。各サブクエリは
+    所有者から始まるインデックスで数えられるので、表ごとに集計するより往復が少ない。
+    """
+    return User.objects.filter(pk=user.pk).annotate(
+        total_nurseries=_count(Nursery.objects.filter(owner=user)),
+        scheduled_visits=_count(VisitSchedule.objects.filter(owner=user, status='予定')),
+        completed_visits=_count(VisitSchedule.objects.filter(owner=user, status='完了')),
+        total_impressions=_count(VisitImpression.objects.filter(owner=user)),
+    ).values(
+        'total_nurseries', 'scheduled_visits', 'completed_visits', 'total_impressions'
+    ).get()
+
+
+def recent_schedules(user):
+    return VisitSchedule.objects.select_related('nursery').filter(
+        owner=user,
+        status='予定',
+        visit_date__gte=timezone.localdate(),
+    ).order_by('visit_date', 'visit_time')[:5]
+
+
+def top_rated(user):
+    return VisitImpression.objects.select_related('nursery').filter(
+        owner=user,
+    ).order_by('-overall_rating', '-created_at')[:5]
+
+
+def build_dashboard(user):
+    context = dashboard_counts(user)
+    context['recent_schedules'] = list(recent_schedules(user))
+    context['top_rated'] = list(top_rated(user))
+    return context
+
+
+def get_dashboard(user):
+    """キャッシュ済みのホーム画面の内容（なければ作成してキャッシュ）"""
+    key = f'hoikunavi:dashboard:{user.pk}:{data_version(user.pk)}:{timezone.localdate()}'
+    context = cache.get(key)
+    if context is None:
+        context = build_dashboard(user)
+        cache.set(key, context, settings.DASHBOARD_CACHE_TIMEOUT)
+    return context
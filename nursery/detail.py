@@ -0,0 +1,93 @@
+"""
+保育園詳細ページのキャッシュ
+
+詳細ページは編集よりも閲覧がはるかに多いため、
+
+- 基本情報・見学スケジュール・見学感想の各ブロックを描画済みの断片として保育園ごとにキャッシュする
+  （テンプレートの ``{% cache %}``。キーに保育園ごとのバージョンを含める）。
+  バージョンは保育園・見学スケジュール・感想の保存・削除時にシグナルで上がる。
+- 保育園・見学スケジュール・感想の最終更新日時と件数から ETag を作り、
+  変更がなければ 304 を返す（保育園の行を読む1回のクエリだけで判定する）。
+
+距離・位置情報の取得状況は UPDATE 文で書き換えられシグナルが送られないため、
+基本情報のキャッシュキーと ETag には値そのものを含める。
+"""
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, DateTimeField, IntegerField, Max, OuterRef, Subquery
+from django.template.loader import render_to_string
+from django.utils.http import quote_etag
+
+from .caching import bump_version, get_version
+from .models import VisitImpression, VisitSchedule
+
+VERSION_NAME = 'nursery_detail'
+DETAIL_TEMPLATE = 'nursery/nursery_detail.html'
+
+
+def detail_version(nursery_id):
+    return get_version(f'{VERSION_NAME}:{nursery_id}')
+
+
+def invalidate_nursery_detail(nursery_ids):
+    for nursery_id in set(nursery_ids):
+        if nursery_id is not None:
+            bump_version(f'{VERSION_NAME}:{nursery_id}')
+
+
+def _related(model, aggregate, output_field):
+    return Subquery(
+        model.objects.filter(nursery=OuterRef('pk'))
+        .order_by()
+        .values('nursery')
+        .annotate(value=aggregate)
+        .values('value'),
+        output_field=output_field,
+    )
+
+
+def detail_state():
+    """ETag の元になる値（保育園のクエリセットの annotate に渡す）"""
+    return {
+        'schedules_updated': _related(VisitSchedule, Max('updated_at'), DateTimeField()),
+        'schedules_count': _related(VisitSchedule, Count('pk'), IntegerField()),
+        'impressions_updated': _related(VisitImpression, Max('updated_at'), DateTimeField()),
+        'impressions_count': _related(VisitImpression, Count('pk'), IntegerField()),
+    }
+
+
+def detail_etag(nursery):
+    """detail_state() を付けて読み込んだ保育園の ETag"""
+    state = [
+        nursery.pk, nursery.updated_at, nursery.distance_from_home, nursery.travel_time, nursery.geocode_status,
+        nursery.schedules_updated, nursery.schedules_count,
+        nursery.impressions_updated, nursery.impressions_count,
+    ]
+    return quote_etag(hashlib.md5(repr(state).encode()).hexdigest())
+
+
+def nursery_schedules(nursery):
+    # テンプレートで感想の有無を参照するため、感想も同時に取得する
+    return nursery.visit_schedules.select_related('impression').order_by('-visit_date')
+
+
+def nursery_impressions(nursery):
+    return nursery.impressions.all().order_by('-created_at')
+
+
+def detail_context(nursery):
+    """詳細ページのテンプレートに渡す値（保育園そのものを除く）"""
+    # 見学スケジュール・感想は遅延評価なので、キャッシュ済みの断片を使う場合はクエリを発行しない
+    return {
+        'schedules': nursery_schedules(nursery),
+        'impressions': nursery_impressions(nursery),
+        'avg_rating': nursery.rating_avg,
+        'detail_version': detail_version(nursery.pk),
+        'fragment_timeout': settings.NURSERY_DETAIL_CACHE_TIMEOUT,
+    }
+
+
+def warm_detail(nursery):
+    """詳細ページを描画して、各ブロックの断片をキャッシュに入れる（warm_cache 用）"""
+    render_to_string(DETAIL_TEMPLATE, {'nursery': nursery, 'object': nursery, **detail_context(nursery)})
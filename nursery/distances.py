@@ -0,0 +1,143 @@
+"""
+自宅から各保育園までの距離・所要時間の一括計算
+
+距離はその保育園の所有者の自宅からの値。保育園の座標が変わると distance_stale が立ち、
+自宅の位置が変わるとそのユーザーの全件に立つ。再計算ジョブはそのユーザーの
+distance_stale の行だけを主キー順にまとめて読み込み、
+NumPy で距離を計算して CASE 式の UPDATE でまとめて書き戻す。
+"""
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Cast
+
+from .caching import bump_data_version
+from .geo import haversine_km_array
+from .geocoding import get_geocoder
+from .jobs import PermanentJobError, enqueue, job_handler
+from .models import HomeLocation, Nursery
+
+RECOMPUTE_JOB = 'recompute_distances'
+GEOCODE_HOME_JOB = 'geocode_home'
+
+
+def travel_minutes(distances_km):
+    """
+    直線距離から徒歩の所要時間(分)を見積もる
+
+    道のりは直線距離に迂回係数を掛けて近似し、不動産表示と同じ分速80mで換算する。
+    """
+    meters = distances_km * settings.TRAVEL_DETOUR_FACTOR * 1000
+    return np.ceil(meters / settings.TRAVEL_METERS_PER_MINUTE).astype(int)
+
+
+def recompute_distances(home, batch_size=2000):
+    """自宅のユーザーの distance_stale の保育園について距離を再計算し、更新件数を返す"""
+    if not home.has_location:
+        return 0
+    home_lat, home_lng = float(home.latitude), float(home.longitude)
+
+    updated = 0
+    last_pk = 0
+    while True:
+        rows = list(
+            Nursery.objects.filter(owner_id=home.user_id, distance_stale=True, pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'latitude', 'longitude')[:batch_size]
+        )
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+
+        lats = np.array([np.nan if row[1] is None else float(row[1]) for row in rows])
+        lngs = np.array([np.nan if row[2] is None else float(row[2]) for row in rows])
+        located = ~(np.isnan(lats) | np.isnan(lngs))
+
+        distances = np.full(len(rows), np.nan)
+        minutes = np.zeros(len(rows), dtype=int)
+        if located.any():
+            distances[located] = haversine_km_array(home_lat, home_lng, lats[located], lngs[located])
+            minutes[located] = travel_minutes(distances[located])
+
+        results = [
+            (row, round(float(distance), 2) if has_location else None, int(minute) if has_location else None)
+            for row, distance, minute, has_location in zip(rows, distances, minutes, located)
+        ]
+        # 1件あたり CASE 2つ（各2パラメータ）と WHERE の3条件
+        chunk_size = min(500, connection.ops.bulk_batch_size([None] * 7, results))
+        for start in range(0, len(results), chunk_size):
+            updated += _save_distances(home.user_id, results[start:start + chunk_size])
+    if updated:
+        # UPDATE 文ではシグナルが送られないので、距離を使うキャッシュ（ランキングなど）をここで作り直させる
+        bump_data_version(home.user_id)
+    return updated
+
+
+def _save_distances(user_id, results):
+    """
+    (読み込んだ行, 距離, 所要時間) をまとめて書き戻し、更新件数を返す
+
+    読み込んだ後にジオコーディングなどで座標が変わった行は、古い座標で計算した距離で
+    distance_stale を下ろさないよう、読み込んだときと同じ座標の行だけを更新する。
+    """
+    def same_location(pk, lat, lng):
+        return Q(
+            pk=pk,
+            **({'latitude__isnull': True} if lat is None else {'latitude': lat}),
+            **({'longitude__isnull': True} if lng is None else {'longitude': lng}),
+        )
+
+    return Nursery.objects.filter(owner_id=user_id).filter(
+        reduce(or_, (same_location(*row) for row, _, _ in results))
+    ).update(
+        # すべて NULL の CASE は PostgreSQL で text 型になるため、bulk_update と同じく型を付ける
+        distance_from_home=Cast(
+            Case(*[When(pk=row[0], then=Value(distance)) for row, distance, _ in results]),
+            output_field=FloatField(),
+        ),
+        travel_time=Cast(
+            Case(*[When(pk=row[0], then=Value(minute)) for row, _, minute in results]),
+            output_field=IntegerField(),
+        ),
+        distance_stale=False,
+    )
+
+
+def schedule_recompute(user_ids=None):
+    """距離の再計算ジョブを積む（user_ids 省略時は自宅を登録済みの全ユーザー）"""
+    homes = HomeLocation.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    if user_ids is not None:
+        homes = homes.filter(user_id__in=user_ids)
+    for user_id in homes.values_list('user_id', flat=True):
+        enqueue(RECOMPUTE_JOB, {'user_id': user_id}, unique=True)
+
+
+def home_moved(home):
+    """自宅の位置が変わったのでそのユーザーの全件を再計算対象にする"""
+    Nursery.objects.filter(owner_id=home.user_id).update(distance_stale=True)
+    schedule_recompute([home.user_id])
+
+
+@job_handler(RECOMPUTE_JOB)
+def recompute_distances_job(payload):
+    home = HomeLocation.objects.filter(user_id=payload['user_id']).first()
+    if home is not None:
+        recompute_distances(home)
+
+
+@job_handler(GEOCODE_HOME_JOB)
+def geocode_home(payload):
+    home = HomeLocation.objects.filter(user_id=payload['user_id']).first()
+    if home is None or not home.address:
+        return
+    location = get_geocoder().geocode(home.address)
+    if location is None:
+        raise PermanentJobError(f'住所が見つかりません: {home.address}')
+    home.latitude = round(location[0], 6)
+    home.longitude = round(location[1], 6)
+    home.save(update_fields=['latitude', 'longitude', 'updated_at'])
+    home_moved(home)
@@ -0,0 +1,147 @@
+"""
+主要なクエリが想定どおりのインデックスを使っているかを EXPLAIN で確認する
+
+ビューと同じ処理でクエリセットを組み立て、実行計画に期待するインデックス名が
+含まれているかを調べる。テスト（nursery/tests/test_query_plans.py）と
+``python manage.py check_query_plans`` から実行する。
+PostgreSQL ではデータ量が少ないと順次スキャンが選ばれるため、
+確認中は enable_seqscan を無効にして「インデックスを使えるか」を判定する。
+"""
+from dataclasses import dataclass
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.http import HttpRequest, QueryDict
+from django.utils.http import urlencode
+
+
+@dataclass
+class PlanCheck:
+    label: str
+    expected_index: object  # インデックス名、またはどれを使ってもよい名前のタプル
+    queryset: object
+
+    @property
+    def expected_indexes(self):
+        if isinstance(self.expected_index, str):
+            return (self.expected_index,)
+        return tuple(self.expected_index)
+
+
+@dataclass
+class PlanResult:
+    check: PlanCheck
+    plan: str
+
+    @property
+    def ok(self):
+        return any(name in self.plan for name in self.check.expected_indexes)
+
+
+def query_plan(queryset):
+    """クエリセットの実行計画（テキスト）"""
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+def assert_uses_index(queryset, index_name):
+    """実行計画に index_name（どれを使ってもよい名前のタプルも可）が含まれなければ AssertionError"""
+    names = (index_name,) if isinstance(index_name, str) else tuple(index_name)
+    plan = query_plan(queryset)
+    if not any(name in plan for name in names):
+        raise AssertionError(f'インデックス {" / ".join(names)} が使われていません:\n{plan}')
+    return plan
+
+
+# 実行計画を見るだけなので、保存していないユーザーで所有者の条件を作る
+_USER = User(pk=1)
+
+
+def _list_queryset(view_class, params=None):
+    """一覧ビューが実際に発行するクエリセット（最初のページ）"""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.GET = QueryDict(urlencode(params or {}))
+    request.user = _USER
+    view = view_class()
+    view.setup(request)
+    queryset = view.get_queryset()
+    # 件数が多いと LIMIT なしでは並べ替えの方が安くなるため、ページ分割と同じく件数を絞る
+    return queryset[:view.get_paginate_by(queryset)]
+
+
+def _cursor_queryset(model, ordering, values):
+    """カーソル方式で途中のページを読むクエリセット"""
+    from .pagination import CursorPaginator, encode_cursor
+
+    paginator = CursorPaginator(model.objects.filter(owner=_USER), ordering)
+    queryset, _ = paginator.page_queryset(encode_cursor(values))
+    return queryset[:paginator.page_size + 1]
+
+
+def hot_query_checks():
+    """確認対象のクエリと、使われるべきインデックス"""
+    from . import comparison, conflicts, dashboard, tiles, views
+    from .models import Nursery, VisitImpression, VisitSchedule
+
+    nursery = Nursery(pk=1)
+    user = _USER
+    tile = tiles.tile_bounds(12, 3637, 1612)
+    return [
+        # SQLite はパラメータで渡した条件を部分インデックスの条件と照合できないため、
+        # ステータスの複合インデックスでもよいことにする
+        PlanCheck('ホーム: 今後の予定', ('schedule_owner_upcoming_idx', 'schedule_owner_status_idx'),
+                  dashboard.recent_schedules(user)),
+        PlanCheck('ホーム: 高評価の感想', 'impression_owner_rating_idx',
+                  dashboard.top_rated(user)),
+        PlanCheck('見学スケジュール一覧', 'schedule_owner_date_idx',
+                  _list_queryset(views.VisitScheduleListView)),
+        PlanCheck('見学スケジュール一覧（ステータス）', 'schedule_owner_status_idx',
+                  _list_queryset(views.VisitScheduleListView, {'status': '完了'})),
+        PlanCheck('見学感想一覧', 'impression_owner_created_idx',
+                  _list_queryset(views.VisitImpressionListView)),
+        PlanCheck('見学感想一覧（評価）', 'impression_owner_rating_idx',
+                  _list_queryset(views.VisitImpressionListView, {'rating': '5'})),
+        PlanCheck('見学感想一覧（申込意向あり）', 'impression_owner_applying_idx',
+                  _list_queryset(views.VisitImpressionListView, {'application': 'true'})),
+        PlanCheck('保育園一覧', 'nursery_owner_name_idx',
+                  _list_queryset(views.NurseryListView)),
+        PlanCheck('保育園一覧（施設タイプ）', 'nursery_owner_type_name_idx',
+                  _list_queryset(views.NurseryListView, {'type': '認可保育園'})),
+        PlanCheck('保育園一覧（評価順）', 'nursery_owner_rating_idx',
+                  _list_queryset(views.NurseryListView, {'sort': 'rating'})),
+        PlanCheck('保育園一覧（近隣検索）', 'nursery_owner_lat_lng_idx',
+                  _list_queryset(views.NurseryListView, {'near': '35.68,139.76'})),
+        PlanCheck('保育園詳細: 見学スケジュール', 'schedule_nursery_date_idx',
+                  views.nursery_schedules(nursery)),
+        PlanCheck('保育園詳細: 見学感想', 'impression_nursery_created_idx',
+                  views.nursery_impressions(nursery)),
+        PlanCheck('API: 保育園（カーソル）', 'nursery_owner_name_idx',
+                  _cursor_queryset(Nursery, ['name', 'id'], ['ひまわり', 1])),
+        PlanCheck('API: 見学スケジュール（カーソル）', 'schedule_owner_date_idx',
+                  _cursor_queryset(VisitSchedule, ['visit_date', 'visit_time', 'id'], ['2025-04-01', '10:00:00', 1])),
+        PlanCheck('API: 見学感想（カーソル）', 'impression_owner_created_idx',
+                  _cursor_queryset(VisitImpression, ['-created_at', 'id'], ['2025-04-01T00:00:00+00:00', 1])),
+        PlanCheck('保育園一覧（距離順・カーソル）', 'nursery_owner_distance_idx',
+                  _cursor_queryset(Nursery, ['distance_from_home', 'name', 'id'], [1.5, 'ひまわり', 1])),
+        PlanCheck('距離の再計算対象', 'nursery_owner_stale_idx',
+                  Nursery.objects.filter(owner_id=user.pk, distance_stale=True, pk__gt=0).order_by('pk')[:2000]),
+        PlanCheck('予定の重なりの確認', ('schedule_owner_upcoming_idx', 'schedule_owner_status_idx'),
+                  conflicts.scheduled_visits(user, '2025-04-01', '2025-04-30')),
+        PlanCheck('地図のタイル（まとめて表示）', 'nursery_owner_lat_lng_idx',
+                  tiles.cluster_queryset(Nursery.objects.filter(owner=user), tile)),
+        PlanCheck('地図のタイル（保育園）', 'nursery_owner_lat_lng_idx',
+                  tiles.points_queryset(Nursery.objects.filter(owner=user), tile)),
+        # SQLite は統計がないと所有者のインデックスを選ぶため、主キーでなくてもよいことにする
+        PlanCheck('保育園の比較', ('nursery_nursery_pkey', 'PRIMARY KEY', 'nursery_owner_name_idx'),
+                  comparison.comparison_queryset(user, [1, 2, 3])),
+        PlanCheck('保育園の比較: 見学感想の集計', ('impression_nursery_created_idx', 'nursery_visitimpression_nursery_id'),
+                  comparison.stats_queryset(user, [1, 2, 3])),
+    ]
+
+
+def run_checks(checks=None):
+    return [PlanResult(check, query_plan(check.queryset)) for check in (checks or hot_query_checks())]
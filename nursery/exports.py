@@ -0,0 +1,213 @@
+"""
+保育園・見学スケジュール・見学感想のエクスポート（CSV / Excel）
+
+行は ``values_list(...).iterator(chunk_size=...)`` で少しずつ読み出して書き出すので、
+件数が増えてもメモリ使用量はほぼ一定。CSV はそのまま StreamingHttpResponse に流し、
+Excel（xlsx）は openpyxl の書き込み専用モードで一時ファイルに書いてから返す。
+書き出すのは指定したユーザー（所有者）のデータだけ。
+
+保育園のCSVは見出しが取り込み（``import_nurseries``）と同じなので、
+そのまま取り込み直すことができる。
+
+``=`` ``+`` ``-`` ``@`` などで始まる文字列は、開いたときに数式として実行されないよう
+先頭に ``'`` を付けて書き出す（取り込み直すと ``'`` は値の一部として残る）。
+"""
+import csv
+import datetime
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Callable
+
+from django.db.models import Avg, Exists, IntegerField, Min, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .importers import IMPORT_FIELDS
+from .models import RATING_SORT_KEY, Nursery, VisitImpression, VisitSchedule
+
+CHUNK_SIZE = 2000
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+FORMATS = ['csv', 'xlsx']
+# 表計算ソフトが数式として扱う先頭文字
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+@dataclass
+class ExportSpec:
+    name: str
+    title: str
+    # (見出し, values_list に渡す項目名)
+    columns: list
+    # 所有者を受け取り、書き出す行のクエリセットを返す
+    queryset: Callable
+
+    @property
+    def headers(self):
+        return [label for label, _ in self.columns]
+
+    def rows(self, owner, chunk_size=CHUNK_SIZE):
+        """見出しを除いた行（書き出し用に整形済み）"""
+        fields = [field for _, field in self.columns]
+        for row in self.queryset(owner).values_list(*fields).iterator(chunk_size=chunk_size):
+            yield [format_value(value) for value in row]
+
+
+def format_value(value):
+    """表計算ソフトで扱いやすい値にする（真偽値は取り込みと同じ「あり／なし」）"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'あり' if value else 'なし'
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, datetime.time):
+        return value.strftime('%H:%M')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # CSV インジェクション対策（数式ではなく文字列として表示させる）
+        return "'" + value
+    return value
+
+
+def _verbose_name(model, name):
+    return str(model._meta.get_field(name).verbose_name)
+
+
+def _nurseries(owner):
+    return Nursery.objects.filter(owner=owner).order_by('name', 'id')
+
+
+def _schedules(owner):
+    return VisitSchedule.objects.filter(owner=owner).order_by('visit_date', 'visit_time', 'id')
+
+
+def _impressions(owner):
+    return VisitImpression.objects.filter(owner=owner).order_by('-created_at', 'id')
+
+
+def _comparison(owner):
+    """見学・感想のある保育園に、感想から集計した値を付ける"""
+    impressions = VisitImpression.objects.filter(nursery=OuterRef('pk')).order_by().values('nursery')
+    return _nurseries(owner).filter(
+        Q(visit_count__gt=0) | Q(impression_count__gt=0)
+    ).annotate(
+        applying=Exists(impressions.filter(application_intention=True)),
+        best_priority=Subquery(impressions.annotate(value=Min('priority_rank')).values('value'),
+                               output_field=IntegerField()),
+        fee_avg=Subquery(impressions.annotate(value=Avg('estimated_monthly_fee')).values('value')),
+        last_visit=Subquery(
+            VisitSchedule.objects.filter(nursery=OuterRef('pk')).order_by('-visit_date').values('visit_date')[:1]
+        ),
+    ).order_by(RATING_SORT_KEY.desc(), 'name', 'id')
+
+
+EXPORTS = {
+    'nurseries': ExportSpec(
+        name='nurseries',
+        title='保育園',
+        columns=[
+            *[(_verbose_name(Nursery, name), name) for name in IMPORT_FIELDS],
+            ('見学回数', 'visit_count'),
+            ('平均評価', 'rating_avg'),
+        ],
+        queryset=_nurseries,
+    ),
+    'schedules': ExportSpec(
+        name='schedules',
+        title='見学スケジュール',
+        columns=[
+            ('施設番号', 'nursery__facility_number'),
+            ('保育園名', 'nursery__name'),
+            ('見学日', 'visit_date'),
+            ('見学時間', 'visit_time'),
+            ('ステータス', 'status'),
+            ('担当者', 'contact_person'),
+            ('メモ', 'notes'),
+        ],
+        queryset=_schedules,
+    ),
+    'impressions': ExportSpec(
+        name='impressions',
+        title='見学感想',
+        columns=[
+            ('施設番号', 'nursery__facility_number'),
+            ('保育園名', 'nursery__name'),
+            ('見学日', 'visit_schedule__visit_date'),
+            *[(_verbose_name(VisitImpression, name), name) for name in [
+                'overall_rating', 'facility_rating', 'staff_rating', 'education_rating', 'access_rating',
+                'good_points', 'concern_points', 'staff_impression', 'children_atmosphere',
+                'estimated_monthly_fee', 'application_intention', 'priority_rank',
+            ]],
+            ('登録日時', 'created_at'),
+        ],
+        queryset=_impressions,
+    ),
+    'comparison': ExportSpec(
+        name='comparison',
+        title='比較表',
+        columns=[
+            ('施設番号', 'facility_number'),
+            ('保育園名', 'name'),
+            ('施設タイプ', 'nursery_type'),
+            ('住所', 'address'),
+            ('自宅からの距離(km)', 'distance_from_home'),
+            ('所要時間(分)', 'travel_time'),
+            ('見学回数', 'visit_count'),
+            ('最終見学日', 'last_visit'),
+            ('感想数', 'impression_count'),
+            ('総合評価(平均)', 'rating_avg'),
+            ('施設・設備(平均)', 'facility_rating_avg'),
+            ('スタッフ・先生(平均)', 'staff_rating_avg'),
+            ('教育方針(平均)', 'education_rating_avg'),
+            ('アクセス(平均)', 'access_rating_avg'),
+            ('想定月額費用(平均)', 'fee_avg'),
+            ('申込意向', 'applying'),
+            ('優先順位', 'best_priority'),
+            ('保育時間(開始)', 'opening_time'),
+            ('保育時間(終了)', 'closing_time'),
+            ('土曜保育', 'saturday_available'),
+        ],
+        queryset=_comparison,
+    ),
+}
+
+
+class _Echo:
+    """csv.writer の書き込み先（書いた文字列をそのまま返す）"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(spec, owner, chunk_size=CHUNK_SIZE):
+    """CSVを1行ずつ返す（Excel で文字化けしないよう先頭に BOM を付ける）"""
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(spec.headers)
+    for row in spec.rows(owner, chunk_size):
+        yield writer.writerow(row)
+
+
+def write_xlsx(spec, owner, fp, chunk_size=CHUNK_SIZE):
+    """Excel ファイルを fp に書き出し、行数を返す"""
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(spec.title)
+    sheet.append(spec.headers)
+    count = 0
+    for row in spec.rows(owner, chunk_size):
+        # Excel に保存できない制御文字は取り除く
+        sheet.append([ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, str) else value for value in row])
+        count += 1
+    workbook.save(fp)
+    return count
+
+
+def export_filename(spec, fmt):
+    return f'{spec.name}_{timezone.localdate():%Y%m%d}.{fmt}'
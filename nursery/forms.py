@@ -1,8 +1,32 @@
 from django import forms
-from .models import Nursery, VisitSchedule, VisitImpression
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from .conflicts import conflicts_for
+from .models import Nursery, VisitSchedule, VisitImpression, HomeLocation, PhotoUpload, RankingWeights
+from .uploads import attach, detach, finish, validate_photo
 
 
-class NurseryForm(forms.ModelForm):
+class OwnedModelForm(forms.ModelForm):
+    """
+    ログイン中のユーザー（user）のデータとして保存するフォーム
+
+    新規登録時は所有者を user にし、保育園・見学スケジュールの選択肢も user のものに絞る。
+    """
+    OWNED_CHOICE_FIELDS = ['nursery', 'visit_schedule']
+    
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        if user is None:
+            return
+        if self.instance.owner_id is None:
+            self.instance.owner = user
+        for name in self.OWNED_CHOICE_FIELDS:
+            if name in self.fields:
+                self.fields[name].queryset = self.fields[name].queryset.filter(owner=user)
+
+
+class NurseryForm(OwnedModelForm):
     class Meta:
         model = Nursery
         fields = [
@@ -27,9 +51,19 @@ class NurseryForm(forms.ModelForm):
             'age_to_years': forms.NumberInput(attrs={'class': 'form-control'}),
             'contact_app_name': forms.TextInput(attrs={'class': 'form-control'}),
         }
+    
+    def clean_facility_number(self):
+        # 所有者はフォームの項目ではないため、（所有者, 施設番号）の一意制約はここで確認する
+        facility_number = self.cleaned_data['facility_number']
+        duplicates = Nursery.objects.filter(
+            owner_id=self.instance.owner_id, facility_number=facility_number
+        ).exclude(pk=self.instance.pk)
+        if self.instance.owner_id is not None and duplicates.exists():
+            raise forms.ValidationError('この施設番号の保育園はすでに登録されています。')
+        return facility_number
 
 
-class VisitScheduleForm(forms.ModelForm):
+class VisitScheduleForm(OwnedModelForm):
     class Meta:
         model = VisitSchedule
         fields = ['nursery', 'visit_date', 'visit_time', 'status', 'contact_person', 'notes']
@@ -41,9 +75,47 @@ class VisitScheduleForm(forms.ModelForm):
             'status': forms.Select(attrs={'class': 'form-select'}),
             'contact_person': forms.TextInput(attrs={'class': 'form-control'}),
         }
+    
+    allow_conflicts = forms.BooleanField(
+        required=False,
+        label='他の見学と重なる・開園時間外でも保存する',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
+    
+    # これらが変わったときだけ他の見学との重なりを調べる
+    CONFLICT_FIELDS = {'nursery', 'visit_date', 'visit_time', 'status'}
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.conflicts = []
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.user is None or cleaned_data.get('allow_conflicts'):
+            return cleaned_data
+        if self.instance.pk and not self.CONFLICT_FIELDS & set(self.changed_data):
+            return cleaned_data
+        if not all(cleaned_data.get(name) for name in ('nursery', 'visit_date', 'visit_time', 'status')):
+            return cleaned_data
+        
+        candidate = VisitSchedule(
+            pk=self.instance.pk,
+            owner_id=self.instance.owner_id,
+            nursery=cleaned_data['nursery'],
+            visit_date=cleaned_data['visit_date'],
+            visit_time=cleaned_data['visit_time'],
+            status=cleaned_data['status'],
+        )
+        self.conflicts = conflicts_for(candidate)
+        if self.conflicts:
+            raise forms.ValidationError(
+                [conflict.message for conflict in self.conflicts]
+                + ['このまま保存する場合は「他の見学と重なる・開園時間外でも保存する」にチェックしてください。']
+            )
+        return cleaned_data
 
 
-class VisitImpressionForm(forms.ModelForm):
+class VisitImpressionForm(OwnedModelForm):
     class Meta:
         model = VisitImpression
         fields = [
@@ -69,4 +141,74 @@ class VisitImpressionForm(forms.ModelForm):
             'access_rating': forms.Select(attrs={'class': 'form-select'}),
             'estimated_monthly_fee': forms.NumberInput(attrs={'class': 'form-control'}),
             'priority_rank': forms.NumberInput(attrs={'class': 'form-control'}),
-        }
\ No newline at end of file
+        }
+    
+    # 分割アップロード済みの写真（nursery.uploads）のアップロードID
+    photo1_upload = forms.UUIDField(required=False, widget=forms.HiddenInput())
+    photo2_upload = forms.UUIDField(required=False, widget=forms.HiddenInput())
+    photo3_upload = forms.UUIDField(required=False, widget=forms.HiddenInput())
+    
+    PHOTO_FIELDS = ['photo1', 'photo2', 'photo3']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.completed_uploads = {}
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        for field in self.PHOTO_FIELDS:
+            photo = cleaned_data.get(field)
+            if isinstance(photo, UploadedFile):
+                try:
+                    validate_photo(photo)
+                except forms.ValidationError as e:
+                    self.add_error(field, e)
+            
+            upload_id = cleaned_data.get(f'{field}_upload')
+            if not upload_id:
+                continue
+            upload = PhotoUpload.objects.filter(pk=upload_id, user=self.user, status='完了').first()
+            if upload is None:
+                self.add_error(field, '写真のアップロードが完了していません。もう一度選択してください。')
+            else:
+                self.completed_uploads[field] = upload
+        return cleaned_data
+    
+    def save(self, commit=True):
+        # アップロードは見学感想の保存が確定してから削除する（保存に失敗したら写真を戻して再送信できるようにする）
+        attached = []
+        try:
+            with transaction.atomic():
+                for field, upload in self.completed_uploads.items():
+                    attach(upload, self.instance, field)
+                    attached.append((field, upload))
+                instance = super().save(commit)
+                if commit:
+                    uploads = [upload for _, upload in attached]
+                    transaction.on_commit(lambda: [finish(upload) for upload in uploads])
+        except Exception:
+            for field, upload in attached:
+                detach(upload, self.instance, field)
+            raise
+        return instance
+
+
+class HomeLocationForm(forms.ModelForm):
+    class Meta:
+        model = HomeLocation
+        fields = ['address', 'latitude', 'longitude']
+        widgets = {
+            'address': forms.TextInput(attrs={'class': 'form-control'}),
+            'latitude': forms.HiddenInput(),
+            'longitude': forms.HiddenInput(),
+        }
+
+
+class RankingWeightsForm(forms.ModelForm):
+    class Meta:
+        model = RankingWeights
+        fields = [
+            'overall', 'facility', 'staff', 'education', 'access',
+            'monthly_fee', 'priority', 'distance',
+        ]
+        widgets = {name: forms.Select(attrs={'class': 'form-select form-select-sm'}) for name in fields}
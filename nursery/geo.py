@@ -0,0 +1,85 @@
+"""
+緯度経度を使った距離計算
+
+距離はすべて大圏距離（haversine）で、単位はkm。
+SQLite（テスト）と PostgreSQL の両方で動くよう、DB上の計算は
+Django の数学関数だけで組み立てる。
+"""
+import math
+
+import numpy as np
+from django.db.models import F, FloatField
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+# 緯度1度あたりの距離(km)
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """2点間の距離(km)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def haversine_km_array(lat, lng, lats, lngs):
+    """1点から複数地点（NumPy配列）までの距離(km)をまとめて計算"""
+    phi1 = np.radians(lat)
+    phi2 = np.radians(lats)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(lngs - lng)
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def bounding_box(lat, lng, radius_km):
+    """中心から radius_km の円を含む (最小緯度, 最大緯度, 最小経度, 最大経度)"""
+    d_lat = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(lat))
+    d_lng = 180.0 if cos_lat < 1e-6 else min(radius_km / (KM_PER_DEGREE * cos_lat), 180.0)
+    return lat - d_lat, lat + d_lat, lng - d_lng, lng + d_lng
+
+
+def parse_point(text):
+    """'緯度,経度' 形式の文字列を (緯度, 経度) に変換。不正な値なら None"""
+    try:
+        lat, lng = (float(value) for value in text.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+def distance_expression(lat, lng, lat_field='latitude', lng_field='longitude'):
+    """指定地点からの距離(km)を計算するORM式"""
+    phi1 = math.radians(lat)
+    phi2 = Radians(Cast(F(lat_field), FloatField()))
+    d_phi = phi2 - phi1
+    d_lambda = Radians(Cast(F(lng_field), FloatField())) - math.radians(lng)
+    a = (
+        Power(Sin(d_phi / 2), 2)
+        + math.cos(phi1) * Cos(phi2) * Power(Sin(d_lambda / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
+
+
+def within_radius(queryset, lat, lng, radius_km):
+    """
+    半径 radius_km 以内の保育園に絞り込み、近い順に並べる
+
+    まず緯度経度のインデックスで矩形に絞り込んでから、
+    残った行だけ正確な距離を計算する。結果には distance(km) が付く。
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+    return queryset.filter(
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lng, max_lng),
+    ).annotate(
+        distance=distance_expression(lat, lng),
+    ).filter(
+        distance__lte=radius_km,
+    ).order_by('distance', 'name')
@@ -0,0 +1,361 @@
+"""
+住所から緯度経度を取得するジオコーディング処理
+
+リクエスト中に外部APIを呼ばないよう、保育園の登録・住所変更時には
+ジョブをキューに積むだけにし、実際の取得はワーカーで行う。
+取得結果は正規化した住所をキーに GeocodeCache テーブルとプロセス内LRUに
+保存し、同じ住所でAPIを再度呼ばないようにする。
+"""
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .caching import bump_data_version
+from .jobs import OPEN_STATUSES, PermanentJobError, enqueue, job_handler
+from .models import BackgroundJob, GeocodeCache, Nursery
+
+GEOCODE_JOB = 'geocode_nursery'
+
+_KANJI_DIGITS = {
+    '〇': 0, '一': 1, '二': 2, '三': 3, '四': 4,
+    '五': 5, '六': 6, '七': 7, '八': 8, '九': 9,
+}
+_HYPHENS = '‐‑‒–—―−ー〜~'
+
+
+def _kanji_to_int(text):
+    """「二十三」のような漢数字（99まで）を整数に変換"""
+    if '十' not in text:
+        return int(''.join(str(_KANJI_DIGITS[c]) for c in text))
+    tens, _, ones = text.partition('十')
+    return (_KANJI_DIGITS[tens] if tens else 1) * 10 + (_KANJI_DIGITS[ones] if ones else 0)
+
+
+def normalize_address(address):
+    """
+    住所の表記ゆれを吸収したキャッシュキーを返す
+
+    全角・半角、空白、漢数字、「1丁目2番3号」「1-2-3」「1丁目2-3」などの
+    表記をすべて同じ文字列にそろえる。
+    """
+    text = unicodedata.normalize('NFKC', address)
+    text = re.sub(r'\s+', '', text)
+    text = re.sub(
+        r'([〇一二三四五六七八九十]+)(?=丁目|番|号)',
+        lambda m: str(_kanji_to_int(m.group(1))),
+        text,
+    )
+    text = re.sub(rf'(?<=\d)[{_HYPHENS}](?=\d)', '-', text)
+    text = re.sub(r'(\d+)(?:丁目|番地|番|号)', r'\1-', text)
+    text = re.sub(r'-+', '-', text)
+    text = re.sub(r'-(?=\D|$)', '', text)
+    return text[:255]
+
+
+class _LRUCache:
+    """有効期限付きのスレッドセーフなLRU"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= timezone.now():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_memory_cache = _LRUCache(settings.GEOCODE_CACHE_MEMORY_SIZE)
+_stats = {'memory_hits': 0, 'db_hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def cache_stats():
+    """このプロセスでのキャッシュヒット状況を返す"""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+    hits = stats['memory_hits'] + stats['db_hits']
+    stats['hit_rate'] = hits / lookups if lookups else 0.0
+    return stats
+
+
+def persistent_cache_stats():
+    """キャッシュテーブル全体の統計（APIの節約回数など）を返す"""
+    now = timezone.now()
+    entries = GeocodeCache.objects.count()
+    hits = GeocodeCache.objects.aggregate(total=Sum('hit_count'))['total'] or 0
+    return {
+        'entries': entries,
+        'expired': GeocodeCache.objects.filter(expires_at__lte=now).count(),
+        'saved_api_calls': hits,
+        'hit_rate': hits / (hits + entries) if hits + entries else 0.0,
+    }
+
+
+def purge_expired():
+    """有効期限切れのキャッシュを削除し、削除件数を返す"""
+    deleted, _ = GeocodeCache.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def reset_memory_cache():
+    _memory_cache.clear()
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+class GoogleMapsGeocoder:
+    """Google Maps Geocoding APIを使うジオコーダ"""
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key if api_key is not None else settings.GOOGLE_MAPS_API_KEY
+        self._client = None
+
+    @property
+    def enabled(self):
+        return bool(self.api_key)
+
+    def geocode(self, address):
+        """(緯度, 経度) を返す。住所が見つからない場合は None"""
+        if self._client is None:
+            import googlemaps
+            self._client = googlemaps.Client(key=self.api_key)
+        result = self._client.geocode(address)
+        if not result:
+            return None
+        location = result[0]['geometry']['location']
+        return location['lat'], location['lng']
+
+
+class FakeGeocoder:
+    """
+    外部APIを呼ばない偽のジオコーダ（テスト・開発用）
+
+    GEOCODER_CLASS に指定すると、locations に登録した住所（正規化して照合）の
+    座標を返し、それ以外は None を返す。failures を設定するとその回数だけ先に
+    一時的なエラーを出す。ジオコーダは取得のたびに作られるため、状態はクラスに持つ。
+    """
+    locations = {}
+    failures = 0
+    calls = []
+    enabled = True
+
+    @classmethod
+    def reset(cls, locations=None, failures=0):
+        cls.locations = {normalize_address(address): location for address, location in (locations or {}).items()}
+        cls.failures = failures
+        cls.calls = []
+
+    def geocode(self, address):
+        cls = type(self)
+        cls.calls.append(address)
+        if cls.failures > 0:
+            cls.failures -= 1
+            raise ConnectionError('ジオコーディングAPIに接続できません')
+        return cls.locations.get(normalize_address(address))
+
+
+class CachedGeocoder:
+    """プロセス内LRU → GeocodeCacheテーブル → 実際のジオコーダ の順に引くラッパー"""
+
+    def __init__(self, geocoder):
+        self.geocoder = geocoder
+
+    @property
+    def enabled(self):
+        return self.geocoder.enabled
+
+    def lookup(self, address):
+        """キャッシュのみを参照する。見つからなければ None"""
+        key = normalize_address(address)
+        location = _memory_cache.get(key)
+        if location is not None:
+            _count('memory_hits')
+            return location
+
+        entry = GeocodeCache.objects.filter(
+            normalized_address=key, expires_at__gt=timezone.now()
+        ).first()
+        if entry is None:
+            return None
+        GeocodeCache.objects.filter(pk=entry.pk).update(hit_count=F('hit_count') + 1)
+        _count('db_hits')
+        location = (float(entry.latitude), float(entry.longitude))
+        _memory_cache.set(key, location, entry.expires_at)
+        return location
+
+    def geocode(self, address):
+        location = self.lookup(address)
+        if location is not None:
+            return location
+
+        _count('misses')
+        location = self.geocoder.geocode(address)
+        if location is None:
+            return None
+        key = normalize_address(address)
+        expires_at = timezone.now() + timedelta(days=settings.GEOCODE_CACHE_TTL_DAYS)
+        GeocodeCache.objects.update_or_create(
+            normalized_address=key,
+            defaults={
+                'latitude': round(location[0], 6),
+                'longitude': round(location[1], 6),
+                'expires_at': expires_at,
+            },
+        )
+        _memory_cache.set(key, location, expires_at)
+        return location
+
+
+def get_geocoder():
+    """settings.GEOCODER_CLASS で指定されたジオコーダを生成"""
+    geocoder = import_string(settings.GEOCODER_CLASS)()
+    if settings.GEOCODE_CACHE_ENABLED:
+        return CachedGeocoder(geocoder)
+    return geocoder
+
+
+def _save_location(nursery, location):
+    """
+    取得した位置情報を保存する。保存した場合は True
+
+    取得中に住所が変わっていた場合は保存しない（古い住所の位置になるため。
+    新しい住所のジョブは別に積まれている）。
+    """
+    from .distances import schedule_recompute
+
+    lat, lng = location
+    saved = Nursery.objects.filter(pk=nursery.pk, address=nursery.address).update(
+        latitude=round(lat, 6),
+        longitude=round(lng, 6),
+        geocode_status='取得済み',
+        distance_stale=True,
+        updated_at=timezone.now(),
+    )
+    if saved and nursery.owner_id is not None:
+        schedule_recompute([nursery.owner_id])
+        # UPDATE 文ではシグナルが送られないので、位置を使うキャッシュ（ホーム画面・地図のタイル・
+        # ランキングなど）のデータのバージョンをここで上げる
+        bump_data_version(nursery.owner_id)
+    return bool(saved)
+
+
+def _status_changed(owner_ids):
+    # geocode_status も API の応答に含まれるので、UPDATE 文で変えたらデータのバージョンを上げる
+    for owner_id in owner_ids:
+        if owner_id is not None:
+            bump_data_version(owner_id)
+
+
+def _payload(nursery_id, address):
+    # 住所もジョブに含め、住所が変わったら別のジョブとして積む
+    return {'nursery_id': nursery_id, 'address': address}
+
+
+def _open_jobs(nursery_ids):
+    """待機中・実行中の位置情報取得ジョブの (保育園ID, 住所)"""
+    return set(
+        BackgroundJob.objects.filter(
+            kind=GEOCODE_JOB, status__in=OPEN_STATUSES, payload__nursery_id__in=list(nursery_ids),
+        ).values_list('payload__nursery_id', 'payload__address')
+    )
+
+
+def queue_geocoding(nursery):
+    """
+    保育園の位置情報取得をキューに積む。積んだ場合は True
+
+    キャッシュに結果があればその場で反映し、ジョブは積まない。
+    同じ住所のジョブが待機中・実行中なら新しくは積まない。
+    """
+    geocoder = get_geocoder()
+    if not nursery.address or not geocoder.enabled:
+        return False
+    if isinstance(geocoder, CachedGeocoder):
+        location = geocoder.lookup(nursery.address)
+        if location is not None:
+            _save_location(nursery, location)
+            nursery.geocode_status = '取得済み'
+            return False
+    Nursery.objects.filter(pk=nursery.pk).update(geocode_status='処理待ち')
+    nursery.geocode_status = '処理待ち'
+    _status_changed([nursery.owner_id])
+    if (nursery.pk, nursery.address) not in _open_jobs([nursery.pk]):
+        enqueue(GEOCODE_JOB, _payload(nursery.pk, nursery.address))
+    return True
+
+
+def queue_geocoding_bulk(nursery_ids):
+    """
+    一括登録した保育園の位置情報取得をまとめてキューに積み、積んだ件数を返す
+
+    queue_geocoding と同じく、同じ住所のジョブが待機中・実行中の保育園には積まない。
+    """
+    if not nursery_ids or not get_geocoder().enabled:
+        return 0
+    Nursery.objects.filter(pk__in=nursery_ids).update(geocode_status='処理待ち')
+    queued = _open_jobs(nursery_ids)
+    rows = list(Nursery.objects.filter(pk__in=nursery_ids).values_list('pk', 'address', 'owner_id'))
+    _status_changed({owner_id for _, _, owner_id in rows})
+    jobs = BackgroundJob.objects.bulk_create([
+        BackgroundJob(kind=GEOCODE_JOB, payload=_payload(pk, address))
+        for pk, address, _ in rows if (pk, address) not in queued
+    ])
+    return len(jobs)
+
+
+def _mark_failed(payload, error):
+    nurseries = Nursery.objects.filter(pk=payload['nursery_id'])
+    if 'address' in payload:
+        # 住所が変わっていれば、新しい住所のジョブに任せる
+        nurseries = nurseries.filter(address=payload['address'])
+    owner_ids = set(nurseries.values_list('owner_id', flat=True))
+    if nurseries.update(geocode_status='失敗'):
+        _status_changed(owner_ids)
+
+
+@job_handler(GEOCODE_JOB, on_failure=_mark_failed)
+def geocode_nursery(payload):
+    nursery = Nursery.objects.filter(pk=payload['nursery_id']).only('address', 'owner').first()
+    if nursery is None:
+        return
+    if payload.get('address', nursery.address) != nursery.address:
+        # 積んだ後に住所が変わった（新しい住所のジョブが別に積まれている）
+        return
+    location = get_geocoder().geocode(nursery.address)
+    if location is None:
+        raise PermanentJobError(f'住所が見つかりません: {nursery.address}')
+    _save_location(nursery, location)
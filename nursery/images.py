@@ -0,0 +1,132 @@
+"""
+見学感想の写真の縮小版（サムネイル・中サイズ）
+
+スマートフォンの写真をそのまま表示すると一覧・詳細ページが重くなるため、
+写真ごとに WebP / JPEG の縮小版を作って配信する。
+
+- 縮小版は元画像の内容のハッシュを含む名前でストレージに保存するので、
+  写真が差し替えられればURLも変わり、ブラウザには immutable でキャッシュさせられる。
+- 保存時にジョブで作成し、まだ無ければ最初のリクエスト時に作成する。
+- EXIF の向きを反映してから、位置情報などのメタデータを含めずに書き出す。
+"""
+import hashlib
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .detail import invalidate_nursery_detail
+from .jobs import job_handler
+from .models import VisitImpression
+
+PHOTO_FIELDS = ['photo1', 'photo2', 'photo3']
+# サイズ名と長辺の最大ピクセル数
+VARIANT_SIZES = {
+    'thumb': 320,
+    'medium': 1280,
+}
+# 形式名と (Pillow の形式, Content-Type, 拡張子)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'image/webp', 'webp'),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+}
+VARIANT_QUALITY = 82
+VARIANT_DIR = 'photo_variants'
+# 縮小処理を変えたら上げる（ハッシュが変わり、古い縮小版は使われなくなる）
+VARIANT_VERSION = 1
+
+VARIANTS_JOB = 'generate_photo_variants'
+
+
+def source_digest(field_file):
+    """元画像の内容のハッシュ"""
+    digest = hashlib.sha256(f'v{VARIANT_VERSION}:'.encode())
+    with field_file.storage.open(field_file.name, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:24]
+
+
+def variant_name(digest, size, fmt):
+    """縮小版のストレージ上のパス"""
+    extension = VARIANT_FORMATS[fmt][2]
+    return f'{VARIANT_DIR}/{digest[:2]}/{digest}-{size}.{extension}'
+
+
+def render_variant(fp, size, fmt):
+    """元画像を長辺 VARIANT_SIZES[size] px に縮小し、メタデータなしで書き出したバイト列"""
+    image_format = VARIANT_FORMATS[fmt][0]
+    with Image.open(fp) as image:
+        image.draft('RGB', (VARIANT_SIZES[size], VARIANT_SIZES[size]))  # JPEG は縮小して読み込む
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha and image_format == 'WEBP' else 'RGB')
+        image.thumbnail((VARIANT_SIZES[size], VARIANT_SIZES[size]), Image.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, image_format, quality=VARIANT_QUALITY, optimize=True)
+    return output.getvalue()
+
+
+def ensure_variant(field_file, digest, size, fmt):
+    """縮小版が無ければ作成し、ストレージ上のパスを返す"""
+    name = variant_name(digest, size, fmt)
+    if not default_storage.exists(name):
+        with field_file.storage.open(field_file.name, 'rb') as fp:
+            content = render_variant(fp, size, fmt)
+        name = default_storage.save(name, ContentFile(content))
+    return name
+
+
+def photo_digest(impression, field):
+    """保存済みのハッシュ（写真が差し替えられていれば None）"""
+    entry = impression.photo_digests.get(field)
+    field_file = getattr(impression, field)
+    if entry and field_file and entry.get('name') == field_file.name:
+        return entry['digest']
+    return None
+
+
+def refresh_photo_digests(impression):
+    """
+    差し替えられた写真のハッシュを計算し直して保存する
+
+    変更のあった項目名のリストを返す。
+    """
+    digests = {}
+    changed = []
+    for field in PHOTO_FIELDS:
+        field_file = getattr(impression, field)
+        if not field_file:
+            continue
+        digest = photo_digest(impression, field)
+        if digest is None:
+            digest = source_digest(field_file)
+            changed.append(field)
+        digests[field] = {'name': field_file.name, 'digest': digest}
+
+    if digests != impression.photo_digests:
+        impression.photo_digests = digests
+        VisitImpression.objects.filter(pk=impression.pk).update(photo_digests=digests)
+        # 詳細ページのキャッシュ済みの写真のURLを新しいハッシュのものにする
+        invalidate_nursery_detail([impression.nursery_id])
+    return changed
+
+
+def generate_variants(impression, fields=None):
+    """写真のすべてのサイズ・形式の縮小版を作成"""
+    for field in fields or PHOTO_FIELDS:
+        digest = photo_digest(impression, field)
+        if digest is None:
+            continue
+        for size in VARIANT_SIZES:
+            for fmt in VARIANT_FORMATS:
+                ensure_variant(getattr(impression, field), digest, size, fmt)
+
+
+@job_handler(VARIANTS_JOB)
+def generate_variants_job(payload):
+    impression = VisitImpression.objects.filter(pk=payload['impression_id']).first()
+    if impression is not None:
+        generate_variants(impression, payload.get('fields'))
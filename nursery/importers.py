@@ -0,0 +1,235 @@
+"""
+自治体の保育施設一覧（CSV / JSONL）から保育園を一括登録する処理
+
+行はストリームで読み込み、一定件数ごとにまとめて
+``bulk_create(update_conflicts=True)`` で（所有者, 施設番号）をキーにupsertする。
+既存データと差分のない行は書き込まないため、同じファイルを何度取り込んでも
+結果は変わらない。
+"""
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+
+from .caching import bump_data_version
+from .distances import schedule_recompute
+from .geocoding import queue_geocoding_bulk
+from .models import Nursery
+from .search import SEARCH_FIELDS, build_search_bigrams
+
+# 取り込み可能な項目（NurseryForm と同じ項目に位置情報を加えたもの）
+IMPORT_FIELDS = [
+    'facility_number', 'name', 'nursery_type', 'address', 'phone_number',
+    'opening_time', 'closing_time', 'saturday_available',
+    'capacity', 'age_from_months', 'age_to_years',
+    'has_contact_app', 'contact_app_name',
+    'has_school_bus', 'has_parking', 'has_lunch', 'has_allergy_support',
+    'latitude', 'longitude', 'notes',
+]
+
+_TRUE_VALUES = {'あり', '有', '○', '〇', 'はい', 'yes', 'y', 'true', 't', '1'}
+_FALSE_VALUES = {'なし', '無', '×', '-', 'いいえ', 'no', 'n', 'false', 'f', '0', ''}
+
+COORDINATE_FIELDS = ['latitude', 'longitude']
+
+
+def _build_header_map():
+    """項目名（英字）と表示名（日本語）のどちらの見出しでも受け付ける"""
+    header_map = {}
+    for name in IMPORT_FIELDS:
+        header_map[name] = name
+        header_map[str(Nursery._meta.get_field(name).verbose_name)] = name
+    return header_map
+
+
+HEADER_MAP = _build_header_map()
+
+
+@dataclass
+class ImportReport:
+    read: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    invalid: int = 0
+    errors: list = field(default_factory=list)
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+
+@dataclass
+class InvalidLine:
+    """読み込めなかった行（clean_row で他の不正な行と同じくエラーとして記録する）"""
+    message: str
+
+
+def _parse_json_line(line):
+    try:
+        row = json.loads(line)
+    except json.JSONDecodeError as e:
+        return InvalidLine(f'JSONとして読み込めません（{e.colno}文字目: {e.msg}）')
+    if not isinstance(row, dict):
+        return InvalidLine('1行に1つのJSONオブジェクトを書いてください')
+    return row
+
+
+def iter_rows(fp, fmt):
+    """ファイルから (行番号, dict) を1行ずつ返す（読み込めない行は InvalidLine）"""
+    if fmt == 'jsonl':
+        for line_no, line in enumerate(fp, start=1):
+            line = line.strip()
+            if line:
+                yield line_no, _parse_json_line(line)
+    else:
+        reader = csv.DictReader(fp)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def clean_row(row):
+    """
+    1行分の値を Nursery の各フィールドで検証・変換して返す
+
+    phone_regex などモデルに定義されたバリデータもここで適用される。
+    行にない項目の検証（新規登録時の必須項目など）は NurseryImporter が行う。
+    """
+    if isinstance(row, InvalidLine):
+        raise ValidationError({NON_FIELD_ERRORS: [row.message]})
+    data = {}
+    errors = {}
+    for header, value in row.items():
+        name = HEADER_MAP.get((header or '').strip())
+        if name is None:
+            continue
+        model_field = Nursery._meta.get_field(name)
+        if isinstance(value, str):
+            value = value.strip()
+        if model_field.get_internal_type() == 'BooleanField' and isinstance(value, str):
+            lowered = value.lower()
+            if lowered in _TRUE_VALUES:
+                value = True
+            elif lowered in _FALSE_VALUES:
+                value = False
+        elif value == '' and model_field.null:
+            value = None
+        try:
+            data[name] = model_field.clean(value, None)
+        except ValidationError as e:
+            errors[name] = e.messages
+    if 'facility_number' not in data and 'facility_number' not in errors:
+        errors['facility_number'] = ['施設番号は必須です']
+    if errors:
+        raise ValidationError(errors)
+    return data
+
+
+class NurseryImporter:
+    def __init__(self, owner, batch_size=500, geocode=False, dry_run=False, max_errors=20):
+        self.owner = owner
+        self.batch_size = batch_size
+        self.geocode = geocode
+        self.dry_run = dry_run
+        self.max_errors = max_errors
+        self.report = ImportReport()
+
+    def run(self, rows):
+        batch = {}
+        for line_no, row in rows:
+            self.report.read += 1
+            try:
+                data = clean_row(row)
+            except ValidationError as e:
+                self._invalid(line_no, e)
+                continue
+            # 同じバッチ内で施設番号が重複した場合は後の行を優先する
+            batch[data['facility_number']] = (line_no, data)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = {}
+        if batch:
+            self._flush(batch)
+        return self.report
+
+    def _invalid(self, line_no, error):
+        self.report.invalid += 1
+        if len(self.report.errors) < self.max_errors:
+            self.report.errors.append((line_no, error.message_dict))
+
+    def _flush(self, batch):
+        fields = [name for name in IMPORT_FIELDS if any(name in data for _, data in batch.values())]
+        moved_fields = [name for name in COORDINATE_FIELDS if name in fields]
+        # 検索用バイグラムを作り直すため、検索対象の項目は常に既存値を読み込む
+        lookup_fields = list(dict.fromkeys(fields + SEARCH_FIELDS))
+        existing = {
+            values['facility_number']: values
+            for values in Nursery.objects.filter(
+                owner=self.owner, facility_number__in=list(batch)
+            ).values(*lookup_fields, *(['distance_stale'] if moved_fields else []))
+        }
+
+        to_write = []
+        geocode_numbers = []
+        moved = False
+        for number, (line_no, data) in batch.items():
+            current = existing.get(number)
+            if current is None:
+                nursery = Nursery(owner=self.owner, **data)
+                try:
+                    # 新規の行は含まれない項目も含めてモデルの検証を通す（必須項目の漏れなど）
+                    nursery.full_clean(exclude=['owner'], validate_unique=False, validate_constraints=False)
+                except ValidationError as e:
+                    self._invalid(line_no, e)
+                    continue
+                self.report.created += 1
+                moved = moved or nursery.latitude is not None or nursery.longitude is not None
+                if 'latitude' not in data:
+                    geocode_numbers.append(number)
+            elif any(current[name] != value for name, value in data.items()):
+                self.report.updated += 1
+                if data.get('address', current.get('address')) != current.get('address'):
+                    geocode_numbers.append(number)
+                # 行に含まれない項目は既存の値で上書きする（upsert時に消さないため）
+                merged = {**{name: current[name] for name in lookup_fields}, **data}
+                nursery = Nursery(owner=self.owner, **merged)
+                if moved_fields:
+                    # 座標が変わった行だけ自宅からの距離を再計算する
+                    changed = any(current[name] != merged[name] for name in moved_fields)
+                    nursery.distance_stale = current['distance_stale'] or changed
+                    moved = moved or changed
+            else:
+                self.report.unchanged += 1
+                continue
+            nursery.search_bigrams = build_search_bigrams(nursery)
+            to_write.append(nursery)
+
+        if self.dry_run or not to_write:
+            return
+
+        update_fields = [name for name in fields if name != 'facility_number'] + ['updated_at']
+        if set(SEARCH_FIELDS) & set(fields):
+            update_fields.append('search_bigrams')
+        if moved_fields:
+            update_fields.append('distance_stale')
+        Nursery.objects.bulk_create(
+            to_write,
+            update_conflicts=True,
+            unique_fields=['owner', 'facility_number'],
+            update_fields=update_fields,
+        )
+        bump_data_version(self.owner.pk)
+        if moved:
+            schedule_recompute([self.owner.pk])
+        if self.geocode and geocode_numbers:
+            ids = Nursery.objects.filter(
+                owner=self.owner, facility_number__in=geocode_numbers
+            ).values_list('id', flat=True)
+            queue_geocoding_bulk(list(ids))
@@ -0,0 +1,127 @@
+"""
+データベースをキューとして使う簡易バックグラウンドジョブ
+
+ジョブは BackgroundJob テーブルに積まれ、``python manage.py run_jobs`` で
+起動したワーカーが取り出して実行する。失敗したジョブは指数バックオフで
+再試行し、最大試行回数に達したら「失敗」として残す。
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+# 再試行間隔（秒）: BACKOFF_BASE_SECONDS * 2 ** (試行回数 - 1)、上限あり
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 60 * 60
+# 「実行中」のまま放置されたジョブを再取得するまでの時間（ワーカー異常終了対策）
+STALE_RUNNING_SECONDS = 10 * 60
+# まだ終わっていないジョブのステータス
+OPEN_STATUSES = ['待機', '実行中']
+
+_handlers = {}
+
+
+class PermanentJobError(Exception):
+    """再試行しても成功しないエラー（住所が見つからない等）"""
+
+
+def job_handler(kind, on_failure=None):
+    """
+    ジョブの処理関数を登録するデコレータ
+
+    処理関数は payload(dict) を受け取る。on_failure は最終的に失敗したときに
+    (payload, エラーメッセージ) で呼ばれる。
+    """
+    def decorator(func):
+        _handlers[kind] = (func, on_failure)
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, delay=0, max_attempts=5, unique=False):
+    """
+    ジョブをキューに追加
+
+    unique=True の場合、同じ種類・同じパラメータの待機中ジョブがあれば追加しない。
+    """
+    payload = payload or {}
+    if unique:
+        existing = BackgroundJob.objects.filter(
+            kind=kind, payload=payload, status='待機'
+        ).first()
+        if existing:
+            return existing
+    return BackgroundJob.objects.create(
+        kind=kind,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def backoff_seconds(attempts):
+    return min(BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SECONDS)
+
+
+def claim_jobs(limit=10):
+    """実行可能なジョブを取り出して「実行中」にする"""
+    now = timezone.now()
+    stale = now - timedelta(seconds=STALE_RUNNING_SECONDS)
+    with transaction.atomic():
+        jobs = list(
+            BackgroundJob.objects.select_for_update(skip_locked=True).filter(
+                Q(status='待機', run_after__lte=now) |
+                Q(status='実行中', updated_at__lt=stale)
+            ).order_by('run_after', 'id')[:limit]
+        )
+        if jobs:
+            BackgroundJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status='実行中', updated_at=now
+            )
+    return jobs
+
+
+def run_job(job):
+    """ジョブを1件実行し、結果に応じてステータスを更新"""
+    handler = _handlers.get(job.kind)
+    job.attempts += 1
+    if handler is None:
+        job.status = '失敗'
+        job.last_error = f'未登録のジョブ種類です: {job.kind}'
+        job.save(update_fields=['status', 'attempts', 'last_error', 'updated_at'])
+        return False
+
+    func, on_failure = handler
+    try:
+        func(job.payload)
+    except Exception as e:
+        job.last_error = f'{type(e).__name__}: {e}'
+        if isinstance(e, PermanentJobError) or job.attempts >= job.max_attempts:
+            job.status = '失敗'
+            logger.warning('ジョブ %s (%s) が失敗しました: %s', job.pk, job.kind, job.last_error)
+            if on_failure:
+                on_failure(job.payload, job.last_error)
+        else:
+            job.status = '待機'
+            job.run_after = timezone.now() + timedelta(seconds=backoff_seconds(job.attempts))
+        job.save(update_fields=['status', 'attempts', 'last_error', 'run_after', 'updated_at'])
+        return False
+
+    job.status = '完了'
+    job.last_error = ''
+    job.save(update_fields=['status', 'attempts', 'last_error', 'updated_at'])
+    return True
+
+
+def run_pending(limit=10):
+    """実行可能なジョブをまとめて処理し、処理件数を返す"""
+    jobs = claim_jobs(limit)
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
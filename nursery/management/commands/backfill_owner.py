@@ -0,0 +1,31 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from nursery.caching import bump_data_version
+from nursery.distances import schedule_recompute
+from nursery.models import Nursery, VisitImpression, VisitSchedule
+from nursery.ownership import assign_owner
+
+
+class Command(BaseCommand):
+    help = '所有者が未設定の保育園をユーザーに割り当て、見学スケジュール・感想には保育園の所有者を設定します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='所有者が未設定の保育園を割り当てるユーザー名')
+        parser.add_argument('--batch-size', type=int, default=2000, help='1回の UPDATE で更新する件数')
+
+    def handle(self, *args, **options):
+        owner = User.objects.filter(username=options['username']).first()
+        if owner is None:
+            raise CommandError(f"ユーザーが見つかりません: {options['username']}")
+
+        nurseries, schedules, impressions = assign_owner(
+            owner.pk, Nursery, VisitSchedule, VisitImpression, options['batch_size'],
+        )
+
+        if nurseries:
+            schedule_recompute([owner.pk])
+        bump_data_version(owner.pk)
+        self.stdout.write(self.style.SUCCESS(
+            f'保育園 {nurseries}件 / 見学スケジュール {schedules}件 / 見学感想 {impressions}件に所有者を設定しました'
+        ))
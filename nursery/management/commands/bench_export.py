@@ -0,0 +1,79 @@
+import resource
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from nursery.exports import CHUNK_SIZE, EXPORTS, iter_csv, write_xlsx
+from nursery.models import Nursery, VisitImpression, VisitSchedule
+
+
+def _peak_rss_mb():
+    # Linux では KB 単位
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = 'エクスポートの速度（行/秒）と最大メモリ使用量を計測します（データはロールバックされます）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='生成する保育園の件数（スケジュール・感想も同数）')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='DBから一度に読み出す件数')
+        parser.add_argument('--xlsx', action='store_true', help='Excel 形式も計測する')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'DB: {connection.vendor}')
+        with transaction.atomic():
+            # 他のユーザーのデータを含めず、計測用のユーザーの行だけを書き出す
+            owner = User.objects.create(username='bench-export')
+            self._populate(owner, options['rows'])
+            self.stdout.write(f"{options['rows']:,}件で計測します（開始時の最大RSS {_peak_rss_mb():.1f}MB）")
+            self.stdout.write(f"{'内容':<14}{'形式':<6}{'件数':>10}{'秒':>8}{'行/秒':>12}{'最大RSS(MB)':>14}")
+            for spec in EXPORTS.values():
+                self._measure(spec, owner, 'csv', options['chunk_size'])
+                if options['xlsx']:
+                    self._measure(spec, owner, 'xlsx', options['chunk_size'])
+            transaction.set_rollback(True)
+
+    def _measure(self, spec, owner, fmt, chunk_size):
+        started = time.perf_counter()
+        if fmt == 'csv':
+            rows = -1  # 見出し行を除く
+            for _ in iter_csv(spec, owner, chunk_size):
+                rows += 1
+        else:
+            # ビューと同じく一時ファイルに書き出す
+            with tempfile.TemporaryFile() as fp:
+                rows = write_xlsx(spec, owner, fp, chunk_size)
+        elapsed = time.perf_counter() - started
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(f'{spec.name:<14}{fmt:<6}{rows:>10,}{elapsed:>8.2f}{rate:>12,.0f}{_peak_rss_mb():>14.1f}')
+
+    def _populate(self, owner, rows):
+        batch_size = 5000
+        for start in range(0, rows, batch_size):
+            count = min(batch_size, rows - start)
+            nurseries = Nursery.objects.bulk_create([
+                Nursery(
+                    owner=owner,
+                    facility_number=f'BENCH-E{i:06d}',
+                    name=f'ベンチマーク保育園{i}',
+                    nursery_type='認可保育園',
+                    address=f'東京都千代田区{i % 9 + 1}丁目{i % 30 + 1}',
+                    phone_number='03-0000-0000',
+                    visit_count=1,
+                    impression_count=1,
+                    rating_avg=i % 5 + 1,
+                )
+                for i in range(start, start + count)
+            ])
+            VisitSchedule.objects.bulk_create([
+                VisitSchedule(owner=owner, nursery=nursery, visit_date='2026-04-01', status='完了')
+                for nursery in nurseries
+            ])
+            VisitImpression.objects.bulk_create([
+                VisitImpression(owner=owner, nursery=nursery, overall_rating=nursery.rating_avg or 3, good_points='良い')
+                for nursery in nurseries
+            ])
@@ -0,0 +1,51 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from nursery import routing
+from nursery.routing import Stop, plan_route
+
+# 都心の半径数km程度に見学先を散らす
+CENTER = (35.68, 139.70)
+SPREAD = 0.04
+
+
+class Command(BaseCommand):
+    help = '見学の訪問順の計算時間を件数ごとに計測します（ランダムな見学先を生成、DBは使いません）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stops', type=int, nargs='+', default=[5, 8, 15, 30], help='見学先の件数')
+        parser.add_argument('--repeat', type=int, default=20, help='件数ごとの試行回数（毎回別の見学先）')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(f'全順序を調べる上限: {routing.EXACT_MAX_STOPS}件')
+        self.stdout.write(f"{'件数':>6}{'方式':>10}{'平均(ms)':>12}{'最大(ms)':>12}{'移動(分)':>10}")
+        for count in options['stops']:
+            timings = []
+            travel = 0
+            for _ in range(options['repeat']):
+                stops = [self._stop(rng) for _ in range(count)]
+                home = self._point(rng)
+                started = time.perf_counter()
+                plan = plan_route(stops, home)
+                timings.append((time.perf_counter() - started) * 1000)
+                travel += plan.travel_minutes
+            method = '厳密' if count <= routing.EXACT_MAX_STOPS else '2-opt'
+            self.stdout.write(
+                f'{count:>6}{method:>10}{sum(timings) / len(timings):>12.2f}{max(timings):>12.2f}'
+                f"{travel / options['repeat']:>10.0f}"
+            )
+
+    def _point(self, rng):
+        return CENTER[0] + rng.uniform(-SPREAD, SPREAD), CENTER[1] + rng.uniform(-SPREAD, SPREAD)
+
+    def _stop(self, rng):
+        lat, lng = self._point(rng)
+        # 3割は見学時刻の決まった予約、残りは開園時間内ならいつでもよい見学
+        if rng.random() < 0.3:
+            minutes = rng.randrange(9 * 60, 16 * 60 + 1, 30)
+            return Stop(lat, lng, minutes, minutes)
+        return Stop(lat, lng, 7 * 60, 18 * 60)
@@ -0,0 +1,74 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from nursery.models import Nursery
+from nursery.search import build_search_bigrams, search_nurseries, uses_index
+
+WARDS = ['千代田区', '中央区', '港区', '新宿区', '文京区', '台東区', '墨田区', '江東区', '品川区', '目黒区',
+         '大田区', '世田谷区', '渋谷区', '中野区', '杉並区', '豊島区', '北区', '荒川区', '板橋区', '練馬区']
+NAMES = ['ひまわり', 'さくら', 'たんぽぽ', 'すみれ', 'わかば', 'あおぞら', 'こどもの森', 'なかよし', 'つばさ', 'みらい']
+KINDS = ['保育園', 'こども園', '保育室', '幼稚園']
+
+
+class Command(BaseCommand):
+    help = 'キーワード検索の速度を部分一致（従来方式）と比較します（データはロールバックされます）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000, help='生成する保育園の件数')
+        parser.add_argument('--repeat', type=int, default=20, help='各検索語の試行回数')
+
+    def handle(self, *args, **options):
+        queries = ['ひまわり', '世田谷区', 'こどもの森保育園', 'F0012', '渋谷区3丁目']
+        self.stdout.write(f'DB: {connection.vendor} / インデックス検索: {"有効" if uses_index() else "無効（部分一致）"}')
+
+        with transaction.atomic():
+            self._populate(options['rows'])
+            self.stdout.write(f"{options['rows']:,}件で計測します")
+            self.stdout.write(f"{'検索語':<16}{'部分一致(ms)':>14}{'検索インデックス(ms)':>20}{'件数':>8}{'部分一致の件数':>10}")
+            for query in queries:
+                legacy = Nursery.objects.filter(
+                    Q(name__icontains=query) |
+                    Q(address__icontains=query) |
+                    Q(facility_number__icontains=query)
+                )
+                indexed = search_nurseries(Nursery.objects.all(), query)
+                legacy_ms = self._measure(legacy, options['repeat'])
+                indexed_ms = self._measure(indexed, options['repeat'])
+                self.stdout.write(
+                    f'{query:<16}{legacy_ms:>14.2f}{indexed_ms:>20.2f}{indexed.count():>8}{legacy.count():>10}'
+                )
+            transaction.set_rollback(True)
+
+    def _populate(self, rows):
+        random.seed(0)
+        batch = []
+        for i in range(rows):
+            ward = random.choice(WARDS)
+            nursery = Nursery(
+                facility_number=f'BENCH-F{i:06d}',
+                name=f'{random.choice(NAMES)}{random.choice(KINDS)}{ward}{i % 97}',
+                nursery_type='認可保育園',
+                address=f'東京都{ward}{random.randint(1, 9)}丁目{random.randint(1, 30)}-{random.randint(1, 20)}',
+                phone_number='03-0000-0000',
+            )
+            nursery.search_bigrams = build_search_bigrams(nursery)
+            batch.append(nursery)
+            if len(batch) >= 5000:
+                Nursery.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Nursery.objects.bulk_create(batch)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE nursery_nursery')
+
+    def _measure(self, queryset, repeat):
+        list(queryset[:20])
+        started = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset[:20])
+        return (time.perf_counter() - started) * 1000 / repeat
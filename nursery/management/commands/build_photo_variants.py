@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from nursery.images import generate_variants, refresh_photo_digests
+from nursery.models import VisitImpression
+
+
+class Command(BaseCommand):
+    help = '見学感想の写真の縮小版（サムネイル・中サイズ）をまとめて作成します'
+
+    def handle(self, *args, **options):
+        impressions = VisitImpression.objects.exclude(photo1='', photo2='', photo3='')
+        count = 0
+        for impression in impressions.iterator():
+            refresh_photo_digests(impression)
+            generate_variants(impression)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'{count}件の見学感想の写真の縮小版を作成しました'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from nursery.explain import run_checks
+
+
+class Command(BaseCommand):
+    help = '主要なクエリが想定したインデックスを使っているかを EXPLAIN で確認します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plan', action='store_true', help='すべての実行計画を表示する')
+
+    def handle(self, *args, **options):
+        results = run_checks()
+        for result in results:
+            mark = self.style.SUCCESS('OK ') if result.ok else self.style.ERROR('NG ')
+            expected = ' / '.join(result.check.expected_indexes)
+            self.stdout.write(f'{mark} {result.check.label}（{expected}）')
+            if options['verbose_plan'] or not result.ok:
+                for line in result.plan.splitlines():
+                    self.stdout.write(f'      {line}')
+
+        failed = [result for result in results if not result.ok]
+        if failed:
+            raise CommandError(f'{len(failed)}件のクエリが想定したインデックスを使っていません')
+        self.stdout.write(self.style.SUCCESS(f'{len(results)}件すべてのクエリがインデックスを使っています'))
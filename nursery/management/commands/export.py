@@ -0,0 +1,40 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from nursery.exports import CHUNK_SIZE, EXPORTS, FORMATS, iter_csv, write_xlsx
+
+
+class Command(BaseCommand):
+    help = '保育園・見学スケジュール・見学感想・比較表を CSV / Excel に書き出します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORTS), help='書き出す内容（comparison は保育園ごとの比較表）')
+        parser.add_argument('--owner', required=True, help='書き出すデータのユーザー名')
+        parser.add_argument('--format', choices=FORMATS, default='csv', help='ファイル形式')
+        parser.add_argument('--output', '-o', default='-', help="出力先のファイル（'-' で標準出力、csv のみ）")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='DBから一度に読み出す件数')
+
+    def handle(self, *args, **options):
+        spec = EXPORTS[options['kind']]
+        owner = User.objects.filter(username=options['owner']).first()
+        if owner is None:
+            raise CommandError(f"ユーザーが見つかりません: {options['owner']}")
+        output = options['output']
+
+        if options['format'] == 'xlsx':
+            if output == '-':
+                output = f'{spec.name}.xlsx'
+            with open(output, 'wb') as fp:
+                count = write_xlsx(spec, owner, fp, options['chunk_size'])
+            self.stderr.write(self.style.SUCCESS(f'{count}件を {output} に書き出しました'))
+            return
+
+        fp = sys.stdout if output == '-' else open(output, 'w', encoding='utf-8', newline='')
+        try:
+            for line in iter_csv(spec, owner, options['chunk_size']):
+                fp.write(line)
+        finally:
+            if fp is not sys.stdout:
+                fp.close()
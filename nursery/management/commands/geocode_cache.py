@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from nursery import geocoding
+
+
+class Command(BaseCommand):
+    help = 'ジオコーディングキャッシュの統計表示と期限切れエントリの削除を行います'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--purge', action='store_true', help='有効期限切れのエントリを削除する')
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            deleted = geocoding.purge_expired()
+            self.stdout.write(self.style.SUCCESS(f'期限切れのキャッシュを{deleted}件削除しました'))
+
+        stats = geocoding.persistent_cache_stats()
+        self.stdout.write(f"登録件数: {stats['entries']}件（うち期限切れ {stats['expired']}件）")
+        self.stdout.write(f"APIの節約回数: {stats['saved_api_calls']}回")
+        self.stdout.write(f"ヒット率: {stats['hit_rate']:.1%}")
@@ -0,0 +1,59 @@
+import io
+import sys
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.core.management.base import BaseCommand, CommandError
+
+from nursery.importers import NurseryImporter, iter_rows
+
+
+class Command(BaseCommand):
+    help = '自治体の保育施設一覧（CSV / JSONL）をユーザーの保育園として施設番号をキーに一括登録・更新します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="取り込むファイル（'-' で標準入力）")
+        parser.add_argument('--owner', required=True, help='登録先のユーザー名')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='ファイル形式（省略時は拡張子から判定）')
+        parser.add_argument('--encoding', default='utf-8-sig', help='CSVの文字コード（例: cp932）')
+        parser.add_argument('--batch-size', type=int, default=500, help='1回のupsertで書き込む件数')
+        parser.add_argument('--geocode', action='store_true', help='新規・住所変更のあった保育園の位置情報取得をキューに積む')
+        parser.add_argument('--dry-run', action='store_true', help='検証と差分の集計のみ行い、書き込まない')
+
+    def handle(self, *args, **options):
+        owner = User.objects.filter(username=options['owner']).first()
+        if owner is None:
+            raise CommandError(f"ユーザーが見つかりません: {options['owner']}")
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        if path == '-':
+            fp = io.TextIOWrapper(sys.stdin.buffer, encoding=options['encoding'])
+        else:
+            if not Path(path).exists():
+                raise CommandError(f'ファイルが見つかりません: {path}')
+            fp = open(path, encoding=options['encoding'], newline='')
+
+        importer = NurseryImporter(
+            owner,
+            batch_size=options['batch_size'],
+            geocode=options['geocode'],
+            dry_run=options['dry_run'],
+        )
+        with fp:
+            report = importer.run(iter_rows(fp, fmt))
+
+        for line_no, errors in report.errors:
+            for name, messages in errors.items():
+                label = '' if name == NON_FIELD_ERRORS else f' {name}'
+                self.stderr.write(f'{line_no}行目{label}: {" ".join(messages)}')
+        if report.invalid > len(report.errors):
+            self.stderr.write(f'...ほか{report.invalid - len(report.errors)}件のエラー')
+
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}読込 {report.read}件 / 新規 {report.created}件 / 更新 {report.updated}件 / '
+            f'変更なし {report.unchanged}件 / エラー {report.invalid}件'
+        ))
+        self.stdout.write(f'処理時間 {report.elapsed:.2f}秒（{report.rows_per_second:,.0f}行/秒）')
@@ -0,0 +1,51 @@
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from nursery.perf import load_snapshots, percentile
+
+
+class Command(BaseCommand):
+    help = 'ビューごとのSQL回数・処理時間・レスポンスサイズの集計を表示します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', choices=['count', 'time', 'queries'], default='time', help='並び順')
+        parser.add_argument('--reset', action='store_true', help='集計結果を削除する')
+
+    def handle(self, *args, **options):
+        if not settings.PERF_REPORT_DIR:
+            raise CommandError('PERF_REPORT_DIR が設定されていません（集計結果を書き出すディレクトリを指定してください）')
+        if options['reset']:
+            shutil.rmtree(settings.PERF_REPORT_DIR, ignore_errors=True)
+            self.stdout.write(self.style.SUCCESS('集計結果を削除しました'))
+            return
+
+        stats = load_snapshots()
+        if not stats:
+            self.stdout.write('集計結果がありません（PERF_METRICS_ENABLED と PERF_REPORT_DIR を確認してください）')
+            return
+
+        sort_keys = {
+            'count': lambda item: item[1]['count'],
+            'time': lambda item: item[1]['total_ms'],
+            'queries': lambda item: item[1]['queries'] / item[1]['count'],
+        }
+        rows = sorted(stats.items(), key=sort_keys[options['sort']], reverse=True)
+        budgets = settings.PERF_QUERY_BUDGETS
+
+        self.stdout.write(
+            f"{'ビュー':<32}{'件数':>8}{'p50(ms)':>9}{'p95(ms)':>9}{'平均ms':>9}"
+            f"{'SQL平均':>8}{'SQL最大':>8}{'予算':>6}{'SQL ms':>9}{'描画ms':>9}{'平均KB':>9}"
+        )
+        for name, row in rows:
+            count = row['count']
+            budget = budgets.get(name)
+            over = budget is not None and row['max_queries'] > budget
+            line = (
+                f"{name:<32}{count:>8}{percentile(row['buckets'], 0.5):>9}{percentile(row['buckets'], 0.95):>9}"
+                f"{row['total_ms'] / count:>9.1f}{row['queries'] / count:>8.1f}{row['max_queries']:>8}"
+                f"{budget if budget is not None else '-':>6}{row['sql_ms'] / count:>9.1f}"
+                f"{row['template_ms'] / count:>9.1f}{row['response_bytes'] / count / 1024:>9.1f}"
+            )
+            self.stdout.write(self.style.ERROR(line) if over else line)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from nursery.uploads import purge_stale
+
+
+class Command(BaseCommand):
+    help = '完了しないまま放置された写真の分割アップロードと一時ファイルを削除します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, help='最終更新からこの時間を過ぎたものを削除（既定: PHOTO_UPLOAD_EXPIRE_HOURS）')
+
+    def handle(self, *args, **options):
+        deleted = purge_stale(options['hours'])
+        self.stdout.write(self.style.SUCCESS(f'{deleted}件のアップロードを削除しました'))
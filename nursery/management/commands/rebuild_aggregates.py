@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from nursery.aggregates import find_drift, refresh_aggregates
+from nursery.caching import bump_data_version
+from nursery.models import Nursery
+
+
+class Command(BaseCommand):
+    help = '保育園ごとの見学回数・評価の集計値を再計算します（--check で食い違いの検出のみ）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='再計算せず、保存値と実際の集計値の食い違いを報告する')
+
+    def handle(self, *args, **options):
+        drift = find_drift()
+        for pk, name, stored, actual in drift[:50]:
+            self.stdout.write(f'保育園 {pk}: {name} 保存値={stored} 実際={actual}')
+        if len(drift) > 50:
+            self.stdout.write(f'...ほか{len(drift) - 50}件')
+
+        if options['check']:
+            if drift:
+                raise CommandError(f'{len(drift)}件の食い違いがあります')
+            self.stdout.write(self.style.SUCCESS('集計値に食い違いはありません'))
+            return
+
+        updated = refresh_aggregates()
+        # 食い違いを直した保育園の所有者のキャッシュ（API の ETag など）を作り直させる
+        drifted = {pk for pk, _, _, _ in drift}
+        owner_ids = Nursery.objects.filter(pk__in=drifted).exclude(owner=None).values_list('owner_id', flat=True)
+        for owner_id in owner_ids.distinct():
+            bump_data_version(owner_id)
+        self.stdout.write(self.style.SUCCESS(f'{updated}件の保育園の集計値を再計算しました（食い違い {len(drift)}件）'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from nursery.distances import recompute_distances
+from nursery.models import HomeLocation, Nursery
+
+
+class Command(BaseCommand):
+    help = '自宅から各保育園までの距離と所要時間を再計算します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='対象ユーザー名（省略時は自宅を登録済みの全ユーザー）')
+        parser.add_argument('--all', action='store_true', help='座標の変更有無にかかわらず全件を再計算する')
+        parser.add_argument('--batch-size', type=int, default=2000, help='一度に計算する件数')
+
+    def handle(self, *args, **options):
+        homes = HomeLocation.objects.select_related('user').filter(
+            latitude__isnull=False, longitude__isnull=False
+        )
+        if options['user']:
+            homes = homes.filter(user__username=options['user'])
+            if not homes.exists():
+                raise CommandError(f"自宅の位置が登録されていません: {options['user']}")
+
+        for home in homes:
+            if options['all']:
+                Nursery.objects.filter(owner=home.user).update(distance_stale=True)
+            updated = recompute_distances(home, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'{home.user.username}: {updated}件の距離を更新しました'))
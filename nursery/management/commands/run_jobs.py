@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from nursery import geocoding, jobs
+
+
+class Command(BaseCommand):
+    help = 'バックグラウンドジョブ（位置情報取得など）を処理するワーカーを起動します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='実行可能なジョブを処理したら終了する')
+        parser.add_argument('--interval', type=float, default=5.0, help='キューが空のときの待機秒数')
+        parser.add_argument('--batch-size', type=int, default=10, help='一度に取り出すジョブ数')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = jobs.run_pending(limit=options['batch_size'])
+            total += processed
+            if processed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'{total}件のジョブを処理しました'))
+        stats = geocoding.cache_stats()
+        self.stdout.write(
+            f"ジオコーディングキャッシュ: メモリ {stats['memory_hits']} / DB {stats['db_hits']} / "
+            f"ミス {stats['misses']} (ヒット率 {stats['hit_rate']:.1%})"
+        )
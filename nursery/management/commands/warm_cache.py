@@ -0,0 +1,54 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from nursery.dashboard import get_dashboard
+from nursery.detail import warm_detail
+from nursery.models import Nursery, VisitImpression, VisitSchedule
+from nursery.pagination import cached_count
+from nursery.ranking import rank, saved_weights, weights_of
+
+# 一覧の件数のキャッシュキー（KeysetPaginationMixin と同じく「URL名?絞り込み条件」）
+LIST_COUNTS = [
+    ('nursery:nursery_list', Nursery),
+    ('nursery:schedule_list', VisitSchedule),
+    ('nursery:impression_list', VisitImpression),
+]
+
+
+class Command(BaseCommand):
+    help = 'ホーム画面・一覧の件数・ランキング・見学済みの保育園の詳細ページをキャッシュに作成します（デプロイ後やキャッシュ消去後に）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='対象ユーザー名（省略時は全ユーザー）')
+        parser.add_argument('--max-details', type=int, default=200,
+                            help='ユーザーごとに作成する詳細ページの最大数（見学・感想のある保育園から）')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True).order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"ユーザーが見つかりません: {options['user']}")
+
+        started = time.monotonic()
+        for user in users.iterator():
+            get_dashboard(user)
+            for view_name, model in LIST_COUNTS:
+                cached_count(model.objects.filter(owner=user), user, f'{view_name}?')
+            rank(user, weights_of(saved_weights(user)))
+
+            nurseries = (
+                Nursery.objects.filter(owner=user)
+                .filter(Q(visit_count__gt=0) | Q(impression_count__gt=0))
+                .order_by('-updated_at')[:options['max_details']]
+            )
+            details = 0
+            for nursery in nurseries:
+                warm_detail(nursery)
+                details += 1
+            self.stdout.write(f'{user.username}: ホーム画面・一覧の件数・ランキング・詳細ページ {details}件')
+
+        self.stdout.write(self.style.SUCCESS(f'キャッシュを作成しました（{time.monotonic() - started:.1f}秒）'))
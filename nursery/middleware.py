@@ -0,0 +1,91 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .perf import RequestMetrics, check_budget, registry
+from .routers import read_from_replica, reset_replica
+
+# 更新後しばらく default から読むためのCookie
+PRIMARY_COOKIE = 'hoikunavi_primary'
+
+
+class PerformanceMiddleware:
+    """SQL回数・時間、テンプレート描画時間、レスポンスサイズをリクエストごとに計測"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.PERF_METRICS_ENABLED:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        request.perf_metrics = metrics
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            response = self.get_response(request)
+
+        metrics.total_ms = (time.perf_counter() - metrics.started) * 1000
+        if not response.streaming:
+            metrics.response_bytes = len(response.content)
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        registry.record(view_name, metrics)
+
+        if settings.PERF_SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing()
+        check_budget(view_name, metrics.queries)
+        return response
+
+    def process_template_response(self, request, response):
+        metrics = getattr(request, 'perf_metrics', None)
+        if metrics is not None:
+            started = time.perf_counter()
+
+            def record_render_time(rendered):
+                metrics.template_ms += (time.perf_counter() - started) * 1000
+
+            response.add_post_render_callback(record_render_time)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    表示専用のビューの読み取りをレプリカに送る（nursery.routers）
+
+    POST などの更新リクエストの後は REPLICA_STICKY_SECONDS の間Cookieを付け、
+    そのユーザーの読み取りは default に送る（自分の更新がすぐ見えるように）。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            # テンプレートの描画が終わるまではレプリカから読む
+            if request.replica_token is not None:
+                reset_replica(request.replica_token)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and 'replica' in settings.DATABASES:
+            response.set_cookie(
+                PRIMARY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            'replica' in settings.DATABASES
+            and request.method in ('GET', 'HEAD')
+            and request.resolver_match.view_name in settings.REPLICA_READ_VIEWS
+            and PRIMARY_COOKIE not in request.COOKIES
+        ):
+            request.replica_token = read_from_replica()
+        return None
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:37
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nursery', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nursery',
+            name='geocode_status',
+            field=models.CharField(choices=[('未取得', '未取得'), ('処理待ち', '処理待ち'), ('取得済み', '取得済み'), ('失敗', '失敗')], default='未取得', max_length=10, verbose_name='位置情報取得状況'),
+        ),
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50, verbose_name='種類')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='パラメータ')),
+                ('status', models.CharField(choices=[('待機', '待機'), ('実行中', '実行中'), ('完了', '完了'), ('失敗', '失敗')], default='待機', max_length=10, verbose_name='ステータス')),
+                ('attempts', models.IntegerField(default=0, verbose_name='試行回数')),
+                ('max_attempts', models.IntegerField(default=5, verbose_name='最大試行回数')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='実行予定日時')),
+                ('last_error', models.TextField(blank=True, verbose_name='最後のエラー')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'バックグラウンドジョブ',
+                'verbose_name_plural': 'バックグラウンドジョブ',
+                'ordering': ['run_after', 'id'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx')],
+            },
+        ),
+    ]
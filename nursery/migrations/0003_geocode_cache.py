@@ -0,0 +1,31 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nursery', '0002_background_geocoding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_address', models.CharField(max_length=255, unique=True, verbose_name='正規化住所')),
+                ('latitude', models.DecimalField(decimal_places=6, max_digits=9, verbose_name='緯度')),
+                ('longitude', models.DecimalField(decimal_places=6, max_digits=9, verbose_name='経度')),
+                ('hit_count', models.IntegerField(default=0, verbose_name='ヒット回数')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='有効期限')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'ジオコーディングキャッシュ',
+                'verbose_name_plural': 'ジオコーディングキャッシュ',
+                'ordering': ['normalized_address'],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nursery', '0003_geocode_cache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='nursery',
+            index=models.Index(fields=['latitude', 'longitude'], name='nursery_lat_lng_idx'),
+        ),
+    ]
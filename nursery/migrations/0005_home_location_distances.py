@@ -0,0 +1,37 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('nursery', '0004_nursery_location_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nursery',
+            name='distance_stale',
+            field=models.BooleanField(db_index=True, default=True, verbose_name='距離の再計算が必要'),
+        ),
+        migrations.CreateModel(
+            name='HomeLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(blank=True, max_length=255, verbose_name='住所')),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='緯度')),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='経度')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='home_location', to=settings.AUTH_USER_MODEL, verbose_name='ユーザー')),
+            ],
+            options={
+                'verbose_name': '自宅の位置',
+                'verbose_name_plural': '自宅の位置',
+            },
+        ),
+    ]
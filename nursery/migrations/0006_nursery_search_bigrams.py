@@ -0,0 +1,53 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:42
+
+from django.db import migrations, models
+
+from nursery.search import build_search_bigrams
+
+INDEX_NAME = 'nursery_search_bigrams_gin'
+
+
+def populate_search_bigrams(apps, schema_editor):
+    Nursery = apps.get_model('nursery', 'Nursery')
+    batch = []
+    for nursery in Nursery.objects.only('name', 'address', 'facility_number').iterator(chunk_size=2000):
+        nursery.search_bigrams = build_search_bigrams(nursery)
+        batch.append(nursery)
+        if len(batch) >= 2000:
+            Nursery.objects.bulk_update(batch, ['search_bigrams'])
+            batch = []
+    if batch:
+        Nursery.objects.bulk_update(batch, ['search_bigrams'])
+
+
+def create_search_index(apps, schema_editor):
+    # GIN インデックスは PostgreSQL のみ（SQLite では部分一致検索にフォールバック）
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON nursery_nursery '
+        "USING gin (array_to_tsvector(string_to_array(search_bigrams, ' ')))"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nursery', '0005_home_location_distances'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nursery',
+            name='search_bigrams',
+            field=models.TextField(blank=True, editable=False, verbose_name='検索用バイグラム'),
+        ),
+        migrations.RunPython(populate_search_bigrams, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:44
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.comparison
+
+from nursery.aggregates import aggregate_expressions
+
+
+def populate_aggregates(apps, schema_editor):
+    Nursery = apps.get_model('nursery', 'Nursery')
+    VisitSchedule = apps.get_model('nursery', 'VisitSchedule')
+    VisitImpression = apps.get_model('nursery', 'VisitImpression')
+    Nursery.objects.update(**aggregate_expressions(VisitSchedule, VisitImpression))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nursery', '0006_nursery_search_bigrams'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nursery',
+            name='access_rating_avg',
+            field=models.FloatField(blank=True, null=True, verbose_name='アクセスの平均'),
+        ),
+        migrations.AddField(
+            model_name='nursery',
+            name='education_rating_avg',
+            field=models.FloatField(blank=True, null=True, verbose_name='教育方針の平均'),
+        ),
+        migrations.AddField(
+            model_name='nursery',
+            name='facility_rating_avg',
+            field=models.FloatField(blank=True, null=True, verbose_name='施設・設備の平均'),
+        ),
+        migrations.AddField(
+            model_name='nursery',
+            name='impression_count',
+            field=models.IntegerField(default=0, verbose_name='感想数'),
+        ),
+        migrations.AddField(
+            model_name='nursery',
+            name='rating_avg',
+            field=models.FloatField(blank=True, null=True, verbose_name='総合評価の平均'),
+        ),
+        migrations.AddField(
+            model_name='nursery',
+            name='rating_sum',
+            field=models.IntegerField(default=0, verbose_name='総合評価の合計'),
+        ),
+        migrations.AddField(
+            model_name='nursery',
+            name='staff_rating_avg',
+            field=models.FloatField(blank=True, null=True, verbose_name='スタッフ・先生の平均'),
+        ),
+        migrations.AddField(
+            model_name='nursery',
+            name='visit_count',
+            field=models.IntegerField(default=0, verbose_name='見学回数'),
+        ),
+        migrations.AddIndex(
+            model_name='nursery',
+            index=models.Index(models.OrderBy(django.db.models.functions.comparison.Coalesce('rating_avg', django.db.models.expressions.RawSQL('-1.0', ())), descending=True), models.F('name'), name='nursery_rating_avg_idx'),
+        ),
+        migrations.RunPython(populate_aggregates, migrations.RunPython.noop),
+    ]
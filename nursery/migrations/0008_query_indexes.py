@@ -0,0 +1,53 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nursery', '0007_nursery_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='nursery',
+            index=models.Index(fields=['name'], name='nursery_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nursery',
+            index=models.Index(fields=['nursery_type', 'name'], name='nursery_type_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitimpression',
+            index=models.Index(fields=['-created_at'], name='impression_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitimpression',
+            index=models.Index(fields=['overall_rating', 'created_at'], name='impression_rating_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitimpression',
+            index=models.Index(condition=models.Q(('application_intention', True)), fields=['-created_at'], name='impression_applying_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitimpression',
+            index=models.Index(fields=['nursery', '-created_at'], name='impression_nursery_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitschedule',
+            index=models.Index(fields=['status', 'visit_date', 'visit_time'], name='schedule_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitschedule',
+            index=models.Index(fields=['visit_date', 'visit_time'], name='schedule_date_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitschedule',
+            index=models.Index(condition=models.Q(('status', '予定')), fields=['visit_date', 'visit_time'], name='schedule_upcoming_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitschedule',
+            index=models.Index(fields=['nursery', '-visit_date'], name='schedule_nursery_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nursery', '0008_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitimpression',
+            name='photo_digests',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='写真のハッシュ'),
+        ),
+    ]
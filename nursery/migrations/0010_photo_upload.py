@@ -0,0 +1,38 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('nursery', '0009_photo_digests'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='ファイル名')),
+                ('total_size', models.BigIntegerField(verbose_name='ファイルサイズ')),
+                ('received', models.BigIntegerField(default=0, verbose_name='受信済みサイズ')),
+                ('width', models.IntegerField(blank=True, null=True, verbose_name='幅')),
+                ('height', models.IntegerField(blank=True, null=True, verbose_name='高さ')),
+                ('status', models.CharField(choices=[('受信中', '受信中'), ('完了', '完了'), ('失敗', '失敗')], default='受信中', max_length=10, verbose_name='ステータス')),
+                ('error', models.CharField(blank=True, max_length=255, verbose_name='エラー')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photo_uploads', to=settings.AUTH_USER_MODEL, verbose_name='ユーザー')),
+            ],
+            options={
+                'verbose_name': '写真のアップロード',
+                'verbose_name_plural': '写真のアップロード',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
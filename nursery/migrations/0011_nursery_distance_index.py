@@ -0,0 +1,17 @@
+# Generated by Django 4.2.10 on 2026-10-18 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nursery', '0010_photo_upload'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='nursery',
+            index=models.Index(fields=['distance_from_home', 'name'], name='nursery_distance_name_idx'),
+        ),
+    ]
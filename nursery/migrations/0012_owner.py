@@ -0,0 +1,139 @@
+# Generated by Django 4.2.10 on 2026-10-18 10:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.expressions
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('nursery', '0011_nursery_distance_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='nursery',
+            name='nursery_lat_lng_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='nursery',
+            name='nursery_rating_avg_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='nursery',
+            name='nursery_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='nursery',
+            name='nursery_type_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='nursery',
+            name='nursery_distance_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='visitimpression',
+            name='impression_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='visitimpression',
+            name='impression_rating_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='visitimpression',
+            name='impression_applying_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='visitschedule',
+            name='schedule_status_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='visitschedule',
+            name='schedule_date_time_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='visitschedule',
+            name='schedule_upcoming_idx',
+        ),
+        migrations.AddField(
+            model_name='nursery',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='nurseries', to=settings.AUTH_USER_MODEL, verbose_name='所有者'),
+        ),
+        migrations.AddField(
+            model_name='visitimpression',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='visit_impressions', to=settings.AUTH_USER_MODEL, verbose_name='所有者'),
+        ),
+        migrations.AddField(
+            model_name='visitschedule',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='visit_schedules', to=settings.AUTH_USER_MODEL, verbose_name='所有者'),
+        ),
+        migrations.AlterField(
+            model_name='nursery',
+            name='distance_stale',
+            field=models.BooleanField(default=True, verbose_name='距離の再計算が必要'),
+        ),
+        migrations.AlterField(
+            model_name='nursery',
+            name='facility_number',
+            field=models.CharField(max_length=20, verbose_name='施設番号'),
+        ),
+        migrations.AddIndex(
+            model_name='nursery',
+            index=models.Index(fields=['owner', 'latitude', 'longitude'], name='nursery_owner_lat_lng_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nursery',
+            index=models.Index(models.F('owner'), models.OrderBy(django.db.models.functions.comparison.Coalesce('rating_avg', django.db.models.expressions.RawSQL('-1.0', ())), descending=True), models.F('name'), name='nursery_owner_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nursery',
+            index=models.Index(fields=['owner', 'name'], name='nursery_owner_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nursery',
+            index=models.Index(fields=['owner', 'nursery_type', 'name'], name='nursery_owner_type_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nursery',
+            index=models.Index(fields=['owner', 'distance_from_home', 'name'], name='nursery_owner_distance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nursery',
+            index=models.Index(condition=models.Q(('distance_stale', True)), fields=['owner', 'id'], name='nursery_owner_stale_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitimpression',
+            index=models.Index(fields=['owner', '-created_at'], name='impression_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitimpression',
+            index=models.Index(fields=['owner', 'overall_rating', 'created_at'], name='impression_owner_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitimpression',
+            index=models.Index(condition=models.Q(('application_intention', True)), fields=['owner', '-created_at'], name='impression_owner_applying_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitschedule',
+            index=models.Index(fields=['owner', 'status', 'visit_date', 'visit_time'], name='schedule_owner_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitschedule',
+            index=models.Index(fields=['owner', 'visit_date', 'visit_time'], name='schedule_owner_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitschedule',
+            index=models.Index(condition=models.Q(('status', '予定')), fields=['owner', 'visit_date', 'visit_time'], name='schedule_owner_upcoming_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='nursery',
+            constraint=models.UniqueConstraint(fields=('owner', 'facility_number'), name='nursery_owner_facility_number_uniq'),
+        ),
+    ]
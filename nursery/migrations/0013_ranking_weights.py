@@ -0,0 +1,36 @@
+# Generated by Django 4.2.10 on 2026-10-18 10:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('nursery', '0012_owner'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingWeights',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('overall', models.PositiveSmallIntegerField(choices=[(0, '考慮しない'), (1, '少し重視'), (2, 'やや重視'), (3, '重視'), (4, 'かなり重視'), (5, '最も重視')], default=5, verbose_name='総合評価')),
+                ('facility', models.PositiveSmallIntegerField(choices=[(0, '考慮しない'), (1, '少し重視'), (2, 'やや重視'), (3, '重視'), (4, 'かなり重視'), (5, '最も重視')], default=3, verbose_name='施設・設備')),
+                ('staff', models.PositiveSmallIntegerField(choices=[(0, '考慮しない'), (1, '少し重視'), (2, 'やや重視'), (3, '重視'), (4, 'かなり重視'), (5, '最も重視')], default=3, verbose_name='スタッフ・先生')),
+                ('education', models.PositiveSmallIntegerField(choices=[(0, '考慮しない'), (1, '少し重視'), (2, 'やや重視'), (3, '重視'), (4, 'かなり重視'), (5, '最も重視')], default=3, verbose_name='教育方針')),
+                ('access', models.PositiveSmallIntegerField(choices=[(0, '考慮しない'), (1, '少し重視'), (2, 'やや重視'), (3, '重視'), (4, 'かなり重視'), (5, '最も重視')], default=3, verbose_name='アクセス')),
+                ('monthly_fee', models.PositiveSmallIntegerField(choices=[(0, '考慮しない'), (1, '少し重視'), (2, 'やや重視'), (3, '重視'), (4, 'かなり重視'), (5, '最も重視')], default=3, verbose_name='月額費用の安さ')),
+                ('priority', models.PositiveSmallIntegerField(choices=[(0, '考慮しない'), (1, '少し重視'), (2, 'やや重視'), (3, '重視'), (4, 'かなり重視'), (5, '最も重視')], default=2, verbose_name='自分でつけた優先順位')),
+                ('distance', models.PositiveSmallIntegerField(choices=[(0, '考慮しない'), (1, '少し重視'), (2, 'やや重視'), (3, '重視'), (4, 'かなり重視'), (5, '最も重視')], default=3, verbose_name='自宅からの近さ')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ranking_weights', to=settings.AUTH_USER_MODEL, verbose_name='ユーザー')),
+            ],
+            options={
+                'verbose_name': 'ランキングの重み',
+                'verbose_name_plural': 'ランキングの重み',
+            },
+        ),
+    ]
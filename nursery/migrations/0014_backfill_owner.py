@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db import migrations
+
+from nursery.distances import RECOMPUTE_JOB
+from nursery.ownership import assign_owner, has_unowned_rows
+
+
+def assign_existing_rows(apps, schema_editor):
+    """
+    所有者が未設定の既存データを、ユーザーが1人だけならそのユーザーに割り当てる
+
+    複数のユーザーがいる場合はどのユーザーのデータか決められないので、
+    backfill_owner コマンドで割り当て先を指定してもらう。
+    """
+    Nursery = apps.get_model('nursery', 'Nursery')
+    VisitSchedule = apps.get_model('nursery', 'VisitSchedule')
+    VisitImpression = apps.get_model('nursery', 'VisitImpression')
+    if not has_unowned_rows(Nursery, VisitSchedule, VisitImpression):
+        return
+
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True)[:2])
+    if len(user_ids) != 1:
+        print(
+            '\n  所有者が未設定の保育園・見学スケジュール・見学感想があります。'
+            'どのユーザーの画面にも表示されないため、'
+            '`python manage.py backfill_owner username` で所有者を設定してください。'
+        )
+        return
+
+    owner_id = user_ids[0]
+    nurseries, _, _ = assign_owner(owner_id, Nursery, VisitSchedule, VisitImpression)
+    HomeLocation = apps.get_model('nursery', 'HomeLocation')
+    home_located = HomeLocation.objects.filter(
+        user_id=owner_id, latitude__isnull=False, longitude__isnull=False,
+    ).exists()
+    if nurseries and home_located:
+        BackgroundJob = apps.get_model('nursery', 'BackgroundJob')
+        BackgroundJob.objects.create(kind=RECOMPUTE_JOB, payload={'user_id': owner_id})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('nursery', '0013_ranking_weights'),
+    ]
+
+    operations = [
+        migrations.RunPython(assign_existing_rows, migrations.RunPython.noop),
+    ]
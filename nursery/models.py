@@ -1,6 +1,15 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+# 評価順の並べ替えキー。インデックスの式と一致させるため、-1 はパラメータでなくSQLに直接埋め込む
+RATING_SORT_KEY = Coalesce('rating_avg', RawSQL('-1.0', ()))
 
 
 class Nursery(models.Model):
@@ -14,9 +23,25 @@ class Nursery(models.Model):
         ('企業主導型保育', '企業主導型保育'),
     ]
     
+    GEOCODE_STATUS_CHOICES = [
+        ('未取得', '未取得'),
+        ('処理待ち', '処理待ち'),
+        ('取得済み', '取得済み'),
+        ('失敗', '失敗'),
+    ]
+    
+    # 既存データは backfill_owner コマンドで所有者を設定するまで NULL
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='nurseries',
+        null=True,
+        blank=True,
+        db_index=False,  # 所有者から始まる複合インデックスで足りる
+        verbose_name='所有者'
+    )
     facility_number = models.CharField(
         max_length=20,
-        unique=True,
         verbose_name='施設番号'
     )
     name = models.CharField(
@@ -121,6 +146,12 @@ class Nursery(models.Model):
         blank=True,
         verbose_name='経度'
     )
+    geocode_status = models.CharField(
+        max_length=10,
+        choices=GEOCODE_STATUS_CHOICES,
+        default='未取得',
+        verbose_name='位置情報取得状況'
+    )
     
     # 自宅からの距離（自動計算用）
     distance_from_home = models.FloatField(
@@ -133,12 +164,62 @@ class Nursery(models.Model):
         blank=True,
         verbose_name='自宅からの所要時間(分)'
     )
+    distance_stale = models.BooleanField(
+        default=True,
+        verbose_name='距離の再計算が必要'
+    )
     
     notes = models.TextField(
         blank=True,
         verbose_name='備考'
     )
     
+    # 見学・感想の集計値（VisitSchedule / VisitImpression の保存・削除時に更新）
+    visit_count = models.IntegerField(
+        default=0,
+        verbose_name='見学回数'
+    )
+    impression_count = models.IntegerField(
+        default=0,
+        verbose_name='感想数'
+    )
+    rating_sum = models.IntegerField(
+        default=0,
+        verbose_name='総合評価の合計'
+    )
+    rating_avg = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='総合評価の平均'
+    )
+    facility_rating_avg = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='施設・設備の平均'
+    )
+    staff_rating_avg = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='スタッフ・先生の平均'
+    )
+    education_rating_avg = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='教育方針の平均'
+    )
+    access_rating_avg = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='アクセスの平均'
+    )
+    
+    # キーワード検索用（保育園名・住所・施設番号のバイグラム）
+    search_bigrams = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='検索用バイグラム'
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -146,9 +227,42 @@ class Nursery(models.Model):
         verbose_name = '保育園'
         verbose_name_plural = '保育園'
         ordering = ['name']
+        # 画面・APIはすべてユーザーごとに絞り込むため、インデックスは所有者から始める
+        constraints = [
+            # 施設番号はユーザーごとに一意（一括取り込みのupsertのキー）
+            models.UniqueConstraint(fields=['owner', 'facility_number'], name='nursery_owner_facility_number_uniq'),
+        ]
+        indexes = [
+            # 近隣検索の矩形絞り込み用
+            models.Index(fields=['owner', 'latitude', 'longitude'], name='nursery_owner_lat_lng_idx'),
+            # 評価順の並べ替え用（未評価を最後にするため NULL を -1 として並べる）
+            models.Index(
+                models.F('owner'), RATING_SORT_KEY.desc(), models.F('name'),
+                name='nursery_owner_rating_idx'
+            ),
+            # 一覧の既定の並び順・施設タイプでの絞り込み用
+            models.Index(fields=['owner', 'name'], name='nursery_owner_name_idx'),
+            models.Index(fields=['owner', 'nursery_type', 'name'], name='nursery_owner_type_name_idx'),
+            # 自宅からの距離順（一覧のカーソル方式のページ分割）用
+            models.Index(fields=['owner', 'distance_from_home', 'name'], name='nursery_owner_distance_idx'),
+            # 距離の再計算対象
+            models.Index(
+                fields=['owner', 'id'],
+                condition=models.Q(distance_stale=True),
+                name='nursery_owner_stale_idx'
+            ),
+        ]
     
     def __str__(self):
         return f'{self.name} ({self.nursery_type})'
+    
+    def save(self, *args, **kwargs):
+        from .search import build_search_bigrams
+        self.search_bigrams = build_search_bigrams(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'search_bigrams'}
+        super().save(*args, **kwargs)
 
 
 class VisitSchedule(models.Model):
@@ -158,6 +272,15 @@ class VisitSchedule(models.Model):
         ('キャンセル', 'キャンセル'),
     ]
     
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='visit_schedules',
+        null=True,
+        blank=True,
+        db_index=False,  # 所有者から始まる複合インデックスで足りる
+        verbose_name='所有者'
+    )
     nursery = models.ForeignKey(
         Nursery,
         on_delete=models.CASCADE,
@@ -195,6 +318,19 @@ class VisitSchedule(models.Model):
         verbose_name = '見学スケジュール'
         verbose_name_plural = '見学スケジュール'
         ordering = ['visit_date', 'visit_time']
+        indexes = [
+            # 一覧（ステータス絞り込みあり・なし）
+            models.Index(fields=['owner', 'status', 'visit_date', 'visit_time'], name='schedule_owner_status_idx'),
+            models.Index(fields=['owner', 'visit_date', 'visit_time'], name='schedule_owner_date_idx'),
+            # ホーム画面の今後の予定（status='予定' のみの部分インデックス）
+            models.Index(
+                fields=['owner', 'visit_date', 'visit_time'],
+                condition=models.Q(status='予定'),
+                name='schedule_owner_upcoming_idx'
+            ),
+            # 保育園詳細の見学スケジュール
+            models.Index(fields=['nursery', '-visit_date'], name='schedule_nursery_date_idx'),
+        ]
     
     def __str__(self):
         return f'{self.nursery.name} - {self.visit_date}'
@@ -209,6 +345,15 @@ class VisitImpression(models.Model):
         (1, '★'),
     ]
     
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='visit_impressions',
+        null=True,
+        blank=True,
+        db_index=False,  # 所有者から始まる複合インデックスで足りる
+        verbose_name='所有者'
+    )
     nursery = models.ForeignKey(
         Nursery,
         on_delete=models.CASCADE,
@@ -303,6 +448,13 @@ class VisitImpression(models.Model):
         blank=True,
         verbose_name='写真3'
     )
+    # 写真ごとの {'name': ファイル名, 'digest': 内容のハッシュ}（縮小版のURLに使う）
+    photo_digests = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='写真のハッシュ'
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -311,6 +463,289 @@ class VisitImpression(models.Model):
         verbose_name = '見学感想'
         verbose_name_plural = '見学感想'
         ordering = ['-created_at']
+        indexes = [
+            # 一覧の既定の並び順
+            models.Index(fields=['owner', '-created_at'], name='impression_owner_created_idx'),
+            # 評価での絞り込み・ホーム画面の高評価（逆順スキャンで両方に使える）
+            models.Index(fields=['owner', 'overall_rating', 'created_at'], name='impression_owner_rating_idx'),
+            # 申込意向ありの絞り込み（application_intention=True のみの部分インデックス）
+            models.Index(
+                fields=['owner', '-created_at'],
+                condition=models.Q(application_intention=True),
+                name='impression_owner_applying_idx'
+            ),
+            # 保育園詳細の見学感想
+            models.Index(fields=['nursery', '-created_at'], name='impression_nursery_created_idx'),
+        ]
     
     def __str__(self):
         return f'{self.nursery.name} - 評価: {self.overall_rating}'
+
+
+class HomeLocation(models.Model):
+    """距離計算の基準にする自宅の位置"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='home_location',
+        verbose_name='ユーザー'
+    )
+    address = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='住所'
+    )
+    latitude = models.DecimalField(
+        max_digits=9,
+        decimal_places=6,
+        null=True,
+        blank=True,
+        verbose_name='緯度'
+    )
+    longitude = models.DecimalField(
+        max_digits=9,
+        decimal_places=6,
+        null=True,
+        blank=True,
+        verbose_name='経度'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = '自宅の位置'
+        verbose_name_plural = '自宅の位置'
+    
+    def __str__(self):
+        return f'{self.user.username}の自宅'
+    
+    @property
+    def has_location(self):
+        return self.latitude is not None and self.longitude is not None
+
+
+class RankingWeights(models.Model):
+    """保育園のランキングで各項目をどれだけ重視するか（0は使わない）"""
+    WEIGHT_CHOICES = [
+        (0, '考慮しない'),
+        (1, '少し重視'),
+        (2, 'やや重視'),
+        (3, '重視'),
+        (4, 'かなり重視'),
+        (5, '最も重視'),
+    ]
+    
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='ranking_weights',
+        verbose_name='ユーザー'
+    )
+    overall = models.PositiveSmallIntegerField(
+        choices=WEIGHT_CHOICES,
+        default=5,
+        verbose_name='総合評価'
+    )
+    facility = models.PositiveSmallIntegerField(
+        choices=WEIGHT_CHOICES,
+        default=3,
+        verbose_name='施設・設備'
+    )
+    staff = models.PositiveSmallIntegerField(
+        choices=WEIGHT_CHOICES,
+        default=3,
+        verbose_name='スタッフ・先生'
+    )
+    education = models.PositiveSmallIntegerField(
+        choices=WEIGHT_CHOICES,
+        default=3,
+        verbose_name='教育方針'
+    )
+    access = models.PositiveSmallIntegerField(
+        choices=WEIGHT_CHOICES,
+        default=3,
+        verbose_name='アクセス'
+    )
+    monthly_fee = models.PositiveSmallIntegerField(
+        choices=WEIGHT_CHOICES,
+        default=3,
+        verbose_name='月額費用の安さ'
+    )
+    priority = models.PositiveSmallIntegerField(
+        choices=WEIGHT_CHOICES,
+        default=2,
+        verbose_name='自分でつけた優先順位'
+    )
+    distance = models.PositiveSmallIntegerField(
+        choices=WEIGHT_CHOICES,
+        default=3,
+        verbose_name='自宅からの近さ'
+    )
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'ランキングの重み'
+        verbose_name_plural = 'ランキングの重み'
+    
+    def __str__(self):
+        return f'{self.user.username}のランキングの重み'
+
+
+class BackgroundJob(models.Model):
+    """データベースをキューとして使うバックグラウンドジョブ"""
+    STATUS_CHOICES = [
+        ('待機', '待機'),
+        ('実行中', '実行中'),
+        ('完了', '完了'),
+        ('失敗', '失敗'),
+    ]
+    
+    kind = models.CharField(
+        max_length=50,
+        verbose_name='種類'
+    )
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='パラメータ'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='待機',
+        verbose_name='ステータス'
+    )
+    attempts = models.IntegerField(
+        default=0,
+        verbose_name='試行回数'
+    )
+    max_attempts = models.IntegerField(
+        default=5,
+        verbose_name='最大試行回数'
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='実行予定日時'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='最後のエラー'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'バックグラウンドジョブ'
+        verbose_name_plural = 'バックグラウンドジョブ'
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.kind} ({self.status})'
+
+
+class GeocodeCache(models.Model):
+    """正規化した住所をキーにしたジオコーディング結果のキャッシュ"""
+    normalized_address = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='正規化住所'
+    )
+    latitude = models.DecimalField(
+        max_digits=9,
+        decimal_places=6,
+        verbose_name='緯度'
+    )
+    longitude = models.DecimalField(
+        max_digits=9,
+        decimal_places=6,
+        verbose_name='経度'
+    )
+    hit_count = models.IntegerField(
+        default=0,
+        verbose_name='ヒット回数'
+    )
+    expires_at = models.DateTimeField(
+        db_index=True,
+        verbose_name='有効期限'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'ジオコーディングキャッシュ'
+        verbose_name_plural = 'ジオコーディングキャッシュ'
+        ordering = ['normalized_address']
+    
+    def __str__(self):
+        return self.normalized_address
+
+
+class PhotoUpload(models.Model):
+    """分割アップロード中・アップロード済みの写真"""
+    STATUS_CHOICES = [
+        ('受信中', '受信中'),
+        ('完了', '完了'),
+        ('失敗', '失敗'),
+    ]
+    
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='photo_uploads',
+        verbose_name='ユーザー'
+    )
+    filename = models.CharField(
+        max_length=255,
+        verbose_name='ファイル名'
+    )
+    total_size = models.BigIntegerField(
+        verbose_name='ファイルサイズ'
+    )
+    received = models.BigIntegerField(
+        default=0,
+        verbose_name='受信済みサイズ'
+    )
+    width = models.IntegerField(
+        null=True,
+        blank=True,
+        verbose_name='幅'
+    )
+    height = models.IntegerField(
+        null=True,
+        blank=True,
+        verbose_name='高さ'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='受信中',
+        verbose_name='ステータス'
+    )
+    error = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='エラー'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    class Meta:
+        verbose_name = '写真のアップロード'
+        verbose_name_plural = '写真のアップロード'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f'{self.filename} ({self.received}/{self.total_size})'
@@ -0,0 +1,47 @@
+"""
+所有者が未設定のデータの割り当て
+
+ユーザーごとのデータになる前（0012_owner より前）から使っている保育園・見学スケジュール・
+見学感想は所有者が空のままで、どのユーザーの画面にも表示されない。
+backfill_owner コマンドと 0014_backfill_owner マイグレーションの両方から使えるよう、
+モデルを引数で受け取る。
+"""
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+
+def _backfill(queryset, batch_size, **values):
+    """所有者が未設定の行を主キー順に batch_size 件ずつ更新し、更新件数を返す"""
+    updated = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            pks = list(
+                queryset.filter(owner__isnull=True, pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                return updated
+            last_pk = pks[-1]
+            updated += queryset.model.objects.filter(pk__in=pks).update(**values)
+
+
+def has_unowned_rows(nursery_model, schedule_model, impression_model):
+    return any(
+        model.objects.filter(owner__isnull=True).exists()
+        for model in (nursery_model, schedule_model, impression_model)
+    )
+
+
+def assign_owner(owner_id, nursery_model, schedule_model, impression_model, batch_size=2000):
+    """
+    所有者が未設定の保育園を owner_id のユーザーに割り当て、見学スケジュール・感想には
+    保育園の所有者を設定する。（保育園, 見学スケジュール, 見学感想）の更新件数を返す。
+    """
+    # 距離は割り当て先のユーザーの自宅から計算し直す
+    nurseries = _backfill(nursery_model.objects.all(), batch_size, owner_id=owner_id, distance_stale=True)
+    nursery_owner = Subquery(nursery_model.objects.filter(pk=OuterRef('nursery_id')).values('owner')[:1])
+    schedules = _backfill(schedule_model.objects.all(), batch_size, owner=nursery_owner)
+    impressions = _backfill(impression_model.objects.all(), batch_size, owner=nursery_owner)
+    return nurseries, schedules, impressions
@@ -0,0 +1,255 @@
+"""
+キーセット（カーソル）方式のページ分割
+
+OFFSET 方式は深いページほど読み飛ばす行が増え、件数表示のために COUNT(*) も必要になる。
+ここでは並び順の列の値（最後に表示した行の値）をカーソルとしてURLに載せ、
+``WHERE (並び順の列) > (カーソルの値) ORDER BY ... LIMIT n`` で次のページを読むので、
+何ページ目でも1ページ分の行しか読まない。
+
+並び順にはインデックスのある列を使い、最後は主キーなどの一意な列にすること。
+NULL はどちらの向きでも PostgreSQL の既定と同じく「最も大きい値」として扱う。
+"""
+import base64
+import binascii
+import hashlib
+import json
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.http import Http404
+
+from .caching import data_version
+
+
+class InvalidCursor(Exception):
+    """カーソルの形式が不正"""
+
+
+def _parse_ordering(ordering):
+    return [(name[1:], True) if name.startswith('-') else (name, False) for name in ordering]
+
+
+def encode_cursor(values, direction='next'):
+    data = {'v': values, 'd': direction}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """カーソル文字列を (値のリスト, 'next' / 'prev') に戻す"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, direction = data['v'], data['d']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or direction not in ('next', 'prev'):
+        raise InvalidCursor(cursor)
+    return values, direction
+
+
+@dataclass
+class CursorPage:
+    object_list: list
+    next_cursor: str = None
+    previous_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorPaginator:
+    """
+    キーセット方式のページ分割
+
+    ordering は ``['name', 'id']`` や ``['-created_at', 'id']`` のような列名のリスト。
+    queryset が values() の場合も、モデルのインスタンスの場合も使える。
+    """
+
+    def __init__(self, queryset, ordering, page_size=20):
+        self.queryset = queryset
+        self.ordering = _parse_ordering(ordering)
+        self.page_size = page_size
+        self.model = queryset.model
+
+    def _field(self, name):
+        return self.model._meta.get_field(name)
+
+    def _order_by(self, reverse=False):
+        expressions = []
+        for name, descending in self.ordering:
+            descending = descending != reverse
+            nullable = self._field(name).null
+            if descending:
+                expressions.append(F(name).desc(nulls_first=True) if nullable else F(name).desc())
+            else:
+                expressions.append(F(name).asc(nulls_last=True) if nullable else F(name).asc())
+        return expressions
+
+    def _after(self, name, descending, value):
+        """並び順で value より後ろにある行の条件（NULL は最大値）"""
+        nullable = self._field(name).null
+        if value is None:
+            # NULL より大きい値はない / NULL より小さい値はすべての非NULL
+            return Q(**{f'{name}__isnull': False}) if descending else Q(pk__in=[])
+        if descending:
+            return Q(**{f'{name}__lt': value})
+        condition = Q(**{f'{name}__gt': value})
+        if nullable:
+            condition |= Q(**{f'{name}__isnull': True})
+        return condition
+
+    def _equal(self, name, value):
+        if value is None:
+            return Q(**{f'{name}__isnull': True})
+        return Q(**{name: value})
+
+    def _keyset_filter(self, values, reverse=False):
+        """(列1, 列2, ...) > (値1, 値2, ...) を OR に展開した条件"""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, descending), value in zip(self.ordering, values):
+            condition |= equal & self._after(name, descending != reverse, value)
+            equal &= self._equal(name, value)
+        # 先頭の列の範囲を別に付けて、インデックスの範囲検索を使えるようにする
+        name, descending = self.ordering[0]
+        if values[0] is not None and not self._field(name).null:
+            bound = 'lte' if descending != reverse else 'gte'
+            condition &= Q(**{f'{name}__{bound}': values[0]})
+        return condition
+
+    def _values_of(self, row):
+        values = []
+        for name, _ in self.ordering:
+            field = self._field(name)
+            value = row[field.attname] if isinstance(row, dict) else getattr(row, field.attname)
+            values.append(_to_json(value))
+        return values
+
+    def _from_cursor(self, values):
+        if len(values) != len(self.ordering):
+            raise InvalidCursor(values)
+        parsed = []
+        for (name, _), value in zip(self.ordering, values):
+            try:
+                parsed.append(None if value is None else self._field(name).to_python(value))
+            except Exception:
+                raise InvalidCursor(values)
+        return parsed
+
+    def page_queryset(self, cursor=None):
+        """カーソルの位置から並べたクエリセットと、読む向き（'next' / 'prev'）"""
+        direction = 'next'
+        queryset = self.queryset
+        if cursor:
+            values, direction = decode_cursor(cursor)
+            values = self._from_cursor(values)
+            queryset = queryset.filter(self._keyset_filter(values, reverse=direction == 'prev'))
+        return queryset.order_by(*self._order_by(reverse=direction == 'prev')), direction
+
+    def page(self, cursor=None):
+        """カーソル（省略時は先頭）から1ページ分を取得"""
+        queryset, direction = self.page_queryset(cursor)
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if direction == 'prev':
+            rows.reverse()
+
+        if not rows:
+            return CursorPage([])
+        has_next = has_more if direction == 'next' else True
+        has_previous = bool(cursor) if direction == 'next' else has_more
+        return CursorPage(
+            rows,
+            next_cursor=encode_cursor(self._values_of(rows[-1]), 'next') if has_next else None,
+            previous_cursor=encode_cursor(self._values_of(rows[0]), 'prev') if has_previous else None,
+        )
+
+
+def cached_count(queryset, user, key):
+    """
+    ユーザーの一覧の件数をキャッシュして返す
+
+    キーにユーザーのデータのバージョン（caching.data_version）を含めるので、データが更新されると作り直される。
+    """
+    digest = hashlib.md5(key.encode()).hexdigest()
+    cache_key = f'hoikunavi:list_count:{user.pk}:{data_version(user.pk)}:{digest}'
+    count = cache.get(cache_key)
+    if count is None:
+        count = queryset.count()
+        cache.set(cache_key, count, settings.LIST_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class KeysetPaginationMixin:
+    """
+    ListView のページ分割をカーソル方式にする（settings.LIST_PAGINATION = 'keyset' のとき）
+
+    get_keyset_ordering() が None を返す並び順（計算値での並べ替えなど）は従来のページ分割のまま。
+    テンプレートには cursor_page・next_page_url・previous_page_url・total_count を渡す。
+    """
+    keyset_ordering = None
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        ordering = self.get_keyset_ordering()
+        if settings.LIST_PAGINATION != 'keyset' or not ordering:
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = CursorPaginator(queryset, ordering, page_size)
+        try:
+            self.cursor_page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('ページが見つかりません')
+        self.cursor_queryset = queryset
+        return None, None, self.cursor_page.object_list, False
+
+    def _page_url(self, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params['cursor'] = cursor
+        params.pop('page', None)
+        return f'?{params.urlencode()}'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = getattr(self, 'cursor_page', None)
+        if page is not None:
+            params = self.request.GET.copy()
+            params.pop('cursor', None)
+            params.pop('page', None)
+            context.update(
+                cursor_page=page,
+                next_page_url=self._page_url(page.next_cursor),
+                previous_page_url=self._page_url(page.previous_cursor),
+                total_count=cached_count(
+                    self.cursor_queryset,
+                    self.request.user,
+                    f'{self.request.resolver_match.view_name}?{params.urlencode()}',
+                ),
+            )
+        return context
+
+
+def _to_json(value):
+    if value is None or isinstance(value, (int, float, str, bool)):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
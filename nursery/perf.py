@@ -0,0 +1,184 @@
+"""
+リクエストごとのパフォーマンス計測
+
+PerformanceMiddleware がSQLの回数・時間、テンプレートの描画時間、
+レスポンスサイズを計測し、Server-Timing ヘッダに出力する。
+計測値はビューごとにプロセス内のヒストグラムへ集計し、PERF_REPORT_DIR を設定した場合は
+一定間隔でそこにプロセスごとのJSONとして書き出す（``manage.py perfreport`` で集計表示。
+しばらく更新されていないプロセスのファイルは集計時に削除する）。
+PERF_QUERY_BUDGETS に設定したクエリ数を超えたビューは警告し、
+PERF_ENFORCE_BUDGETS が有効（テスト実行時）なら例外にする。
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# レスポンス時間(ms)のヒストグラムの境界
+LATENCY_BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+class QueryBudgetExceeded(Exception):
+    """ビューのSQL発行回数が予算を超えた"""
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.total_ms = 0.0
+        self.response_bytes = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper から呼ばれる
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_ms += (time.perf_counter() - started) * 1000
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.sql_ms:.1f};desc="SQL {self.queries} queries"',
+            f'tpl;dur={self.template_ms:.1f};desc="Template"',
+            f'total;dur={self.total_ms:.1f};desc="Total"',
+        ])
+
+
+class _ViewStats:
+    def __init__(self):
+        self.count = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.total_ms = 0.0
+        self.response_bytes = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, metrics):
+        self.count += 1
+        self.queries += metrics.queries
+        self.max_queries = max(self.max_queries, metrics.queries)
+        self.sql_ms += metrics.sql_ms
+        self.template_ms += metrics.template_ms
+        self.total_ms += metrics.total_ms
+        self.response_bytes += metrics.response_bytes or 0
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if metrics.total_ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+class PerformanceRegistry:
+    """ビューごとの計測値のプロセス内集計"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._last_dump = time.monotonic()
+
+    def record(self, view_name, metrics):
+        with self._lock:
+            self._stats.setdefault(view_name, _ViewStats()).add(metrics)
+        if time.monotonic() - self._last_dump >= settings.PERF_SNAPSHOT_INTERVAL:
+            self.dump()
+
+    def snapshot(self):
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def dump(self):
+        """このプロセスの集計を PERF_REPORT_DIR/<pid>.json に書き出す"""
+        self._last_dump = time.monotonic()
+        if not settings.PERF_REPORT_DIR:
+            return
+        snapshot = self.snapshot()
+        if not snapshot:
+            return
+        directory = Path(settings.PERF_REPORT_DIR)
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f'{os.getpid()}.json'
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(snapshot))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning('パフォーマンス計測値を書き出せませんでした: %s', e)
+
+
+registry = PerformanceRegistry()
+atexit.register(registry.dump)
+
+
+def load_snapshots():
+    """
+    全プロセスの書き出し結果をビューごとに合算
+
+    PERF_SNAPSHOT_MAX_AGE 秒以上更新されていないファイル（終了したプロセスの分）は削除し、合算しない。
+    """
+    merged = {}
+    if not settings.PERF_REPORT_DIR:
+        return merged
+    expire_before = time.time() - settings.PERF_SNAPSHOT_MAX_AGE
+    for path in sorted(Path(settings.PERF_REPORT_DIR).glob('*.json')):
+        try:
+            if path.stat().st_mtime < expire_before:
+                path.unlink(missing_ok=True)
+                continue
+            snapshot = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        for name, stats in snapshot.items():
+            total = merged.setdefault(name, _ViewStats().to_dict())
+            for key, value in stats.items():
+                if key == 'buckets':
+                    total[key] = [a + b for a, b in zip(total[key], value)]
+                elif key == 'max_queries':
+                    total[key] = max(total[key], value)
+                else:
+                    total[key] += value
+    return merged
+
+
+def percentile(buckets, fraction):
+    """ヒストグラムからおおよそのパーセンタイル(ms)を求める（バケットの上限値）"""
+    total = sum(buckets)
+    if not total:
+        return None
+    threshold = total * fraction
+    running = 0
+    for i, count in enumerate(buckets):
+        running += count
+        if running >= threshold:
+            return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else float('inf')
+    return float('inf')
+
+
+def check_budget(view_name, queries):
+    budget = settings.PERF_QUERY_BUDGETS.get(view_name)
+    if budget is None or queries <= budget:
+        return
+    message = f'{view_name} のSQL発行回数が予算を超えました: {queries}回（予算 {budget}回）'
+    if settings.PERF_ENFORCE_BUDGETS:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
@@ -0,0 +1,234 @@
+"""
+重み付きの保育園ランキング
+
+保育園ごとの評価（5項目の平均）・月額費用・自分でつけた優先順位・自宅からの距離を
+0〜1（良いほど大きい）に正規化した特徴量の行列を作っておき、
+ユーザーが設定した重み（RankingWeights）の加重平均をスコアにして並べる。
+
+- 評価は 1〜5 の尺度のまま 0〜1 にする。費用・優先順位・距離はそのユーザーの
+  保育園の中での最小〜最大で正規化し、小さいほど良いとする。
+- 値のない項目（見学していない・費用未記入・自宅未登録など）は、その項目の平均値で補う。
+  その項目でそのユーザーのどの保育園にも値がない場合は、重みを0として扱う。
+
+特徴量の行列はユーザーのデータのバージョン（ホーム画面と同じ）ごとに、
+並べ替えの結果は重みの組ごとにキャッシュする。
+"""
+from dataclasses import dataclass
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Min
+
+from .caching import data_version
+from .models import Nursery, RankingWeights, VisitImpression
+
+
+@dataclass(frozen=True)
+class Criterion:
+    # RankingWeights のフィールド名
+    name: str
+    label: str
+    higher_is_better: bool = True
+    # 固定の尺度（最小, 最大）。None ならその時点の値の最小〜最大
+    scale: tuple = None
+    unit: str = ''
+
+    def format(self, value):
+        if np.isnan(value):
+            return '-'
+        if self.scale is not None:
+            return f'{value:.1f}'
+        if self.name == 'distance':
+            return f'{value:.1f}{self.unit}'
+        return f'{value:,.0f}{self.unit}'
+
+
+RATING_SCALE = (1, 5)
+CRITERIA = [
+    Criterion('overall', '総合評価', scale=RATING_SCALE),
+    Criterion('facility', '施設・設備', scale=RATING_SCALE),
+    Criterion('staff', 'スタッフ・先生', scale=RATING_SCALE),
+    Criterion('education', '教育方針', scale=RATING_SCALE),
+    Criterion('access', 'アクセス', scale=RATING_SCALE),
+    Criterion('monthly_fee', '月額費用', higher_is_better=False, unit='円'),
+    Criterion('priority', '優先順位', higher_is_better=False, unit='位'),
+    Criterion('distance', '自宅からの距離', higher_is_better=False, unit='km'),
+]
+WEIGHT_FIELDS = [criterion.name for criterion in CRITERIA]
+
+# Nursery の列から読む項目
+NURSERY_COLUMNS = {
+    'overall': 'rating_avg',
+    'facility': 'facility_rating_avg',
+    'staff': 'staff_rating_avg',
+    'education': 'education_rating_avg',
+    'access': 'access_rating_avg',
+    'distance': 'distance_from_home',
+}
+
+
+@dataclass
+class FeatureTable:
+    ids: np.ndarray
+    names: list
+    types: list
+    # 元の値（値がなければ nan）
+    raw: np.ndarray
+    # 0〜1 に正規化し、値のない項目を補ったもの
+    normalized: np.ndarray
+    # 項目ごとに値のある保育園が1件でもあるか
+    available: np.ndarray
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def normalize(raw):
+    """
+    特徴量の行列（保育園 × CRITERIA）を 0〜1（良いほど大きい）に正規化する
+
+    値のない要素はその項目の平均で補い、項目ごとの値の有無も返す。
+    """
+    normalized = np.empty_like(raw)
+    for column, criterion in enumerate(CRITERIA):
+        values = raw[:, column]
+        if criterion.scale is not None:
+            low, high = criterion.scale
+        else:
+            present = values[~np.isnan(values)]
+            low, high = (present.min(), present.max()) if present.size else (0.0, 0.0)
+        if high > low:
+            scaled = np.clip((values - low) / (high - low), 0.0, 1.0)
+            normalized[:, column] = scaled if criterion.higher_is_better else 1.0 - scaled
+        else:
+            # すべて同じ値なら差をつけない（小さいほど良い項目でも 1 にする）
+            normalized[:, column] = np.where(np.isnan(values), np.nan, 1.0)
+
+    available = ~np.isnan(normalized).all(axis=0)
+    means = np.zeros(len(CRITERIA))
+    if len(normalized):
+        means[available] = np.nanmean(normalized[:, available], axis=0)
+    missing = np.isnan(normalized)
+    normalized[missing] = np.take(means, np.nonzero(missing)[1])
+    return normalized, available
+
+
+def build_features(user):
+    """ユーザーの保育園の特徴量の行列"""
+    columns = [NURSERY_COLUMNS.get(criterion.name) for criterion in CRITERIA]
+    rows = list(
+        Nursery.objects.filter(owner=user)
+        .order_by('pk')
+        .values_list('pk', 'name', 'nursery_type', *[column for column in columns if column])
+    )
+    # 費用は感想の平均、優先順位は感想の中で最も高い順位
+    from_impressions = {
+        row['nursery']: row
+        for row in VisitImpression.objects.filter(owner=user)
+        .order_by()
+        .values('nursery')
+        .annotate(monthly_fee=Avg('estimated_monthly_fee'), priority=Min('priority_rank'))
+    }
+
+    raw = np.full((len(rows), len(CRITERIA)), np.nan)
+    for i, row in enumerate(rows):
+        nursery_values = iter(row[3:])
+        impression = from_impressions.get(row[0], {})
+        for column, (criterion, field) in enumerate(zip(CRITERIA, columns)):
+            value = next(nursery_values) if field else impression.get(criterion.name)
+            if value is not None:
+                raw[i, column] = float(value)
+
+    normalized, available = normalize(raw)
+    return FeatureTable(
+        ids=np.array([row[0] for row in rows], dtype=np.int64),
+        names=[row[1] for row in rows],
+        types=[row[2] for row in rows],
+        raw=raw,
+        normalized=normalized,
+        available=available,
+    )
+
+
+def _version(user):
+    return data_version(user.pk)
+
+
+def get_features(user, version=None):
+    """キャッシュ済みの特徴量の行列（なければ作成してキャッシュ）"""
+    if version is None:
+        version = _version(user)
+    key = f'hoikunavi:ranking_features:{user.pk}:{version}'
+    table = cache.get(key)
+    if table is None:
+        table = build_features(user)
+        cache.set(key, table, settings.RANKING_CACHE_TIMEOUT)
+    return table
+
+
+def score(table, weights):
+    """重みの加重平均のスコア（0〜100）"""
+    vector = np.asarray(weights, dtype=float) * table.available
+    if not len(table) or vector.sum() == 0:
+        return np.zeros(len(table))
+    return table.normalized @ vector / vector.sum() * 100
+
+
+@dataclass
+class RankedNursery:
+    rank: int
+    id: int
+    name: str
+    nursery_type: str
+    score: float
+    # CRITERIA の順の (項目, 表示用の値)
+    values: list
+
+
+@dataclass
+class Ranking:
+    entries: list
+    total: int
+    weights: dict
+
+
+def weights_of(instance):
+    return [getattr(instance, name) for name in WEIGHT_FIELDS]
+
+
+def saved_weights(user):
+    """ユーザーが保存した重み（未保存なら既定値の未保存のインスタンス）"""
+    return RankingWeights.objects.filter(user=user).first() or RankingWeights(user=user)
+
+
+def rank(user, weights, limit=None):
+    """
+    重み（WEIGHT_FIELDS の順のリスト）でユーザーの保育園を並べる
+
+    並び順とスコアは重みの組ごとにキャッシュする。
+    """
+    version = _version(user)
+    table = get_features(user, version)
+    key = f"hoikunavi:ranking:{user.pk}:{version}:{','.join(str(int(weight)) for weight in weights)}"
+    cached = cache.get(key)
+    if cached is None:
+        scores = score(table, weights)
+        # スコアの高い順、同点は登録の古い順
+        order = np.lexsort((table.ids, -scores))
+        cached = (order, scores[order])
+        cache.set(key, cached, settings.RANKING_CACHE_TIMEOUT)
+    order, scores = cached
+
+    entries = []
+    for position, (index, value) in enumerate(zip(order[:limit], scores[:limit]), start=1):
+        entries.append(RankedNursery(
+            rank=position,
+            id=int(table.ids[index]),
+            name=table.names[index],
+            nursery_type=table.types[index],
+            score=float(value),
+            values=[(criterion, criterion.format(table.raw[index, column]))
+                    for column, criterion in enumerate(CRITERIA)],
+        ))
+    return Ranking(entries, total=len(table), weights=dict(zip(WEIGHT_FIELDS, weights)))
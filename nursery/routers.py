@@ -0,0 +1,41 @@
+"""
+読み取り専用レプリカへの振り分け
+
+ReplicaRoutingMiddleware が表示専用のビュー（settings.REPLICA_READ_VIEWS）の
+GET / HEAD のリクエストの間だけ read_from_replica() を有効にし、その間の
+保育園・見学データ（nursery アプリのモデル）の読み取りを 'replica' に送る。
+書き込みと、それ以外のリクエスト・ジョブ・管理コマンドの読み取りは常に 'default'。
+更新直後のユーザーは一定時間 'default' から読む（ミドルウェアのCookie）。
+"""
+from contextvars import ContextVar
+
+REPLICA = 'replica'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def read_from_replica():
+    """以降の読み取りをレプリカに送る（戻り値を reset_replica に渡して元に戻す）"""
+    return _use_replica.set(True)
+
+
+def reset_replica(token):
+    _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # ログイン状態（セッション・ユーザー）は遅延の影響を受けないよう常に default から読む
+        if _use_replica.get() and model._meta.app_label == 'nursery':
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # レプリカは default の複製なので、どちらから読んだオブジェクトも関連付けてよい
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
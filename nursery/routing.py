@@ -0,0 +1,327 @@
+"""
+1日の見学の訪問順（ルート）の計画
+
+同じ日に予定している見学を、自宅から出発して自宅に戻るまでの移動時間が
+短くなる順に並べる。時刻はすべてその日の0時からの分で扱う。
+
+- 見学時刻（visit_time）がある見学はその時刻に始める（早く着いたら待つ）。
+  ない見学は開園時間〜閉園時間（見学時間を含めて閉園までに終わる範囲）のいつでもよい。
+- 間に合わない分（遅刻）を最も重く見て、次に移動時間の合計が短い順を選ぶ。
+- 移動時間は距離の一括計算と同じく直線距離からの見積もり（distances.travel_minutes）。
+  地点数が少ないので距離行列は毎回 NumPy でまとめて計算する。
+
+見学が EXACT_MAX_STOPS 件以下なら全順序を分枝限定法で調べて最適な順を求め、
+それより多い場合は最近傍法で作った順を 2-opt で改善する。
+"""
+from dataclasses import dataclass, field
+from datetime import time
+from urllib.parse import urlencode
+
+import numpy as np
+
+from .distances import travel_minutes
+from .geo import haversine_km_array
+from .models import HomeLocation, VisitSchedule
+from .utils import VISIT_DURATION
+
+# これ以下の件数なら全順序を調べる
+EXACT_MAX_STOPS = 7
+# 見学時刻も開園時間もない見学の時間帯
+DAY_START = 9 * 60
+DAY_END = 18 * 60
+VISIT_MINUTES = int(VISIT_DURATION.total_seconds() // 60)
+# 2-opt の改善を繰り返す上限
+MAX_IMPROVEMENT_PASSES = 20
+# Google Maps の経路のURLに指定できる経由地の数
+GOOGLE_MAPS_MAX_WAYPOINTS = 9
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _to_time(minutes):
+    minutes = max(0, min(int(round(minutes)), 24 * 60 - 1))
+    return time(minutes // 60, minutes % 60)
+
+
+@dataclass
+class Stop:
+    """訪問先（earliest〜latest は見学を始めてよい時刻）"""
+    lat: float
+    lng: float
+    earliest: int
+    latest: int
+    schedule: object = None
+
+    @classmethod
+    def from_schedule(cls, schedule, duration=VISIT_MINUTES):
+        nursery = schedule.nursery
+        opening = _minutes(nursery.opening_time) if nursery.opening_time else DAY_START
+        closing = _minutes(nursery.closing_time) if nursery.closing_time else DAY_END
+        if schedule.visit_time:
+            earliest = latest = _minutes(schedule.visit_time)
+        else:
+            earliest, latest = opening, closing - duration
+        return cls(float(nursery.latitude), float(nursery.longitude), earliest, latest, schedule)
+
+
+@dataclass
+class PlannedStop:
+    stop: Stop
+    travel_minutes: int
+    arrival: float
+    start: float
+    late_minutes: float
+
+    @property
+    def schedule(self):
+        return self.stop.schedule
+
+    @property
+    def wait_minutes(self):
+        return max(0, self.start - self.arrival)
+
+    @property
+    def arrival_time(self):
+        return _to_time(self.arrival)
+
+    @property
+    def start_time(self):
+        return _to_time(self.start)
+
+    @property
+    def end_time(self):
+        return _to_time(self.start + VISIT_MINUTES)
+
+
+@dataclass
+class RoutePlan:
+    stops: list
+    travel_minutes: int = 0
+    late_minutes: float = 0
+    return_minutes: int = 0
+    exact: bool = True
+    # 自宅の (緯度, 経度)。未登録なら None
+    home: tuple = None
+    # 位置情報がなく、順番に含められなかった見学
+    unplaced: list = field(default_factory=list)
+
+    @property
+    def departure_time(self):
+        if not self.stops:
+            return None
+        return _to_time(self.stops[0].arrival - self.stops[0].travel_minutes)
+
+    @property
+    def return_time(self):
+        if not self.stops:
+            return None
+        return _to_time(self.stops[-1].start + VISIT_MINUTES + self.return_minutes)
+
+    @property
+    def google_maps_url(self):
+        """この順に回る Google Maps の経路（経由地が多すぎる場合は None）"""
+        points = [f'{planned.stop.lat},{planned.stop.lng}' for planned in self.stops]
+        if not points:
+            return None
+        if self.home is not None:
+            origin = destination = f'{self.home[0]},{self.home[1]}'
+            waypoints = points
+        else:
+            origin, destination, waypoints = points[0], points[-1], points[1:-1]
+        if len(waypoints) > GOOGLE_MAPS_MAX_WAYPOINTS:
+            return None
+        params = {'api': 1, 'origin': origin, 'destination': destination, 'travelmode': 'walking'}
+        if waypoints:
+            params['waypoints'] = '|'.join(waypoints)
+        return f'https://www.google.com/maps/dir/?{urlencode(params)}'
+
+
+def travel_matrix(stops, home=None):
+    """
+    地点間の移動時間(分)の行列（0番目は自宅、以降は stops の順）
+
+    自宅がない場合は0番目との移動時間を0にする（最初の見学先から始まり、戻りは数えない）。
+    """
+    lats = np.array([stop.lat for stop in stops])
+    lngs = np.array([stop.lng for stop in stops])
+    size = len(stops) + 1
+    matrix = np.zeros((size, size), dtype=int)
+    for i, stop in enumerate(stops, start=1):
+        matrix[i, 1:] = travel_minutes(haversine_km_array(stop.lat, stop.lng, lats, lngs))
+    if home is not None:
+        matrix[0, 1:] = matrix[1:, 0] = travel_minutes(haversine_km_array(home[0], home[1], lats, lngs))
+    # ループの中では NumPy の要素アクセスより list の方が速い
+    return matrix.tolist()
+
+
+class _Solver:
+    def __init__(self, stops, travel, duration):
+        self.earliest = [None] + [stop.earliest for stop in stops]
+        self.latest = [None] + [stop.latest for stop in stops]
+        self.travel = travel
+        self.duration = duration
+
+    def cost(self, order, bound=None, start_at=0, state=None):
+        """
+        訪問順の (遅刻の合計, 移動時間の合計)
+
+        最初の見学先には見学開始時刻ちょうどに着くよう出発する。
+        bound 以上になることが分かった時点で打ち切って None を返す。
+        start_at と state（prefix_states() の値）を渡すと、その位置から先だけを計算する。
+        """
+        travel, earliest, latest, duration = self.travel, self.earliest, self.latest, self.duration
+        position, clock, late, moved = state or (0, None, 0, 0)
+        for index in order[start_at:]:
+            leg = travel[position][index]
+            moved += leg
+            start = earliest[index] if clock is None else max(clock + leg, earliest[index])
+            if start > latest[index]:
+                late += start - latest[index]
+            if bound is not None and (late, moved) >= bound:
+                return None
+            clock = start + duration
+            position = index
+        moved += travel[position][0]
+        cost = (late, moved)
+        if bound is not None and cost >= bound:
+            return None
+        return cost
+
+    def prefix_states(self, order):
+        """訪問順の先頭から i 件を回った時点の (位置, 時刻, 遅刻, 移動時間) のリスト"""
+        travel, earliest, latest, duration = self.travel, self.earliest, self.latest, self.duration
+        state = (0, None, 0, 0)
+        states = [state]
+        for index in order:
+            position, clock, late, moved = state
+            leg = travel[position][index]
+            start = earliest[index] if clock is None else max(clock + leg, earliest[index])
+            state = (index, start + duration, late + max(0, start - latest[index]), moved + leg)
+            states.append(state)
+        return states
+
+    def nearest_neighbour(self):
+        """遅刻しない・早く始められる・近い見学先を順に選ぶ"""
+        travel, earliest, latest, duration = self.travel, self.earliest, self.latest, self.duration
+        remaining = set(range(1, len(travel)))
+        order = []
+        position, clock = 0, None
+        while remaining:
+            def key(index):
+                leg = travel[position][index]
+                start = earliest[index] if clock is None else max(clock + leg, earliest[index])
+                return max(0, start - latest[index]), start, leg, index
+
+            index = min(remaining, key=key)
+            leg = travel[position][index]
+            clock = (earliest[index] if clock is None else max(clock + leg, earliest[index])) + duration
+            order.append(index)
+            remaining.remove(index)
+            position = index
+        return order
+
+    def two_opt(self, order):
+        """区間を反転して良くなる限り繰り返す"""
+        best = self.cost(order)
+        for _ in range(MAX_IMPROVEMENT_PASSES):
+            improved = False
+            states = self.prefix_states(order)
+            for i in range(len(order) - 1):
+                for j in range(i + 1, len(order)):
+                    # 反転する区間より前は変わらないので、その位置から計算する
+                    candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                    cost = self.cost(candidate, bound=best, start_at=i, state=states[i])
+                    if cost is not None:
+                        order, best = candidate, cost
+                        states = self.prefix_states(order)
+                        improved = True
+            if not improved:
+                break
+        return order
+
+    def exact(self, initial):
+        """分枝限定法で最適な訪問順（initial の値を上限にして探索を始める）"""
+        best_order, best = initial, self.cost(initial)
+        travel, earliest, latest, duration = self.travel, self.earliest, self.latest, self.duration
+        # まだ回っていない地点に入るには、少なくともその地点へ最も近い地点からの移動時間がかかる
+        size = len(travel)
+        nearest_in = [min(travel[i][j] for i in range(size) if i != j) for j in range(size)]
+
+        def search(order, remaining, position, clock, late, moved, rest):
+            nonlocal best_order, best
+            if not remaining:
+                cost = (late, moved + travel[position][0])
+                if cost < best:
+                    best_order, best = list(order), cost
+                return
+            for index in list(remaining):
+                leg = travel[position][index]
+                start = earliest[index] if clock is None else max(clock + leg, earliest[index])
+                next_late = late + max(0, start - latest[index])
+                next_rest = rest - nearest_in[index]
+                if (next_late, moved + leg + next_rest) >= best:
+                    continue
+                order.append(index)
+                remaining.remove(index)
+                search(order, remaining, index, start + duration, next_late, moved + leg, next_rest)
+                remaining.add(index)
+                order.pop()
+
+        # 自宅に戻る分も含める
+        search([], set(range(1, size)), 0, None, 0, 0, sum(nearest_in))
+        return best_order
+
+
+def plan_route(stops, home=None, duration=VISIT_MINUTES):
+    """
+    見学先の訪問順を決める
+
+    stops は Stop のリスト、home は自宅の (緯度, 経度)。
+    """
+    if not stops:
+        return RoutePlan([], home=home)
+    travel = travel_matrix(stops, home)
+    solver = _Solver(stops, travel, duration)
+    order = solver.two_opt(solver.nearest_neighbour())
+    exact = len(stops) <= EXACT_MAX_STOPS
+    if exact:
+        order = solver.exact(order)
+
+    planned = []
+    position, clock = 0, None
+    for index in order:
+        stop = stops[index - 1]
+        leg = travel[position][index]
+        arrival = stop.earliest if clock is None else clock + leg
+        start = max(arrival, stop.earliest)
+        planned.append(PlannedStop(stop, leg, arrival, start, max(0, start - stop.latest)))
+        clock = start + duration
+        position = index
+    late, moved = solver.cost(order)
+    return RoutePlan(
+        planned,
+        travel_minutes=moved,
+        late_minutes=late,
+        return_minutes=travel[position][0],
+        exact=exact,
+        home=home,
+    )
+
+
+def plan_day(user, visit_date):
+    """ユーザーのその日の予定の見学（ステータスが「予定」）の訪問順"""
+    schedules = list(
+        VisitSchedule.objects.filter(owner=user, visit_date=visit_date, status='予定')
+        .select_related('nursery')
+        .order_by('visit_time', 'id')
+    )
+    home = HomeLocation.objects.filter(user=user).first()
+    home_point = (float(home.latitude), float(home.longitude)) if home and home.has_location else None
+
+    located = [schedule for schedule in schedules if schedule.nursery.latitude is not None
+               and schedule.nursery.longitude is not None]
+    plan = plan_route([Stop.from_schedule(schedule) for schedule in located], home_point)
+    plan.unplaced = [schedule for schedule in schedules if schedule not in located]
+    return plan
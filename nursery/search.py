@@ -0,0 +1,98 @@
+"""
+保育園のキーワード検索
+
+日本語は単語の区切りがないため、保育園名・住所・施設番号を正規化して
+2文字ずつに区切った「バイグラム」を search_bigrams 列に保存しておく。
+PostgreSQL ではこの列から作った tsvector の GIN インデックスで
+検索語のバイグラムをすべて含む行を引き、そのうち実際に部分一致する行だけを
+一致箇所に応じて並べ替える（バイグラムが別々の項目や離れた位置にある行は除く）。
+部分一致の判定も項目と検索語の両方をバイグラムと同じ規則で正規化して行う
+（SQLの normalize() を使うため PostgreSQL 13 以上が必要）。
+それ以外のDB（開発・テスト用のSQLite）では従来どおり部分一致で検索する。
+"""
+import unicodedata
+
+from django.db import connection
+from django.db.models import BooleanField, Case, CharField, FloatField, Func, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+SEARCH_FIELDS = ['name', 'address', 'facility_number']
+
+
+def normalize_text(text):
+    """全角・半角と大文字・小文字をそろえ、空白を除く"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return ''.join(text.split())
+
+
+def bigrams(text):
+    """正規化した文字列のバイグラム（1文字の場合はその文字）"""
+    text = normalize_text(text)
+    if len(text) < 2:
+        return [text] if text else []
+    return [text[i:i + 2] for i in range(len(text) - 1)]
+
+
+def build_search_bigrams(nursery):
+    """search_bigrams 列に保存する、重複を除いたバイグラムの空白区切り文字列"""
+    tokens = []
+    seen = set()
+    for name in SEARCH_FIELDS:
+        for token in bigrams(getattr(nursery, name)):
+            if token not in seen:
+                seen.add(token)
+                tokens.append(token)
+    return ' '.join(tokens)
+
+
+class NormalizedText(Func):
+    """normalize_text と同じ正規化（NFKC・小文字・空白の除去）をSQLで行う"""
+    template = "regexp_replace(lower(normalize(%(expressions)s, NFKC)), '\\s+', '', 'g')"
+    output_field = CharField()
+
+
+def _tsquery(tokens):
+    """バイグラムをすべて含むことを表す tsquery 文字列（パーサを通さずそのまま照合する）"""
+    quoted = ("'" + token.replace('\\', '\\\\').replace("'", "''") + "'" for token in tokens)
+    return ' & '.join(quoted)
+
+
+def uses_index():
+    return connection.vendor == 'postgresql'
+
+
+def search_nurseries(queryset, query):
+    """キーワードで絞り込み、関連度の高い順に並べる"""
+    tokens = sorted(set(bigrams(query)))
+    if not uses_index() or len(normalize_text(query)) < 2:
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(address__icontains=query) |
+            Q(facility_number__icontains=query)
+        )
+
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    vector = f"array_to_tsvector(string_to_array({table}.search_bigrams, ' '))"
+    tsquery = _tsquery(tokens)
+    text = normalize_text(query)
+    return queryset.filter(
+        RawSQL(f'{vector} @@ %s::tsquery', (tsquery,), output_field=BooleanField())
+    ).alias(
+        search_name=NormalizedText('name'),
+        search_address=NormalizedText('address'),
+        search_facility_number=NormalizedText('facility_number'),
+    ).annotate(
+        # 一致した項目（名前の前方一致 > 名前 > 施設番号 > 住所）で関連度を付ける
+        search_field_rank=Case(
+            When(search_name__startswith=text, then=Value(4)),
+            When(search_name__contains=text, then=Value(3)),
+            When(search_facility_number__contains=text, then=Value(2)),
+            When(search_address__contains=text, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+        search_rank=RawSQL(f'ts_rank({vector}, %s::tsquery)', (tsquery,), output_field=FloatField()),
+    ).exclude(
+        # バイグラムはそろっていても、どの項目にも部分一致しない行
+        search_field_rank=0,
+    ).order_by('-search_field_rank', '-search_rank', 'name')
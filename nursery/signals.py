@@ -0,0 +1,58 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .aggregates import refresh_aggregates
+from .caching import bump_data_version
+from .detail import invalidate_nursery_detail
+from .images import VARIANTS_JOB, refresh_photo_digests
+from .jobs import enqueue
+from .models import Nursery, VisitImpression, VisitSchedule
+
+
+@receiver(post_init, sender=VisitSchedule)
+@receiver(post_init, sender=VisitImpression)
+def remember_nursery(sender, instance, **kwargs):
+    # 保育園が付け替えられた場合に元の保育園の集計も更新するため
+    instance._loaded_nursery_id = instance.__dict__.get('nursery_id')
+
+
+@receiver(post_save, sender=VisitSchedule)
+@receiver(post_save, sender=VisitImpression)
+def update_nursery_aggregates(sender, instance, **kwargs):
+    nursery_ids = {instance.nursery_id, getattr(instance, '_loaded_nursery_id', None)}
+    refresh_aggregates(nursery_ids)
+    invalidate_nursery_detail(nursery_ids)
+    instance._loaded_nursery_id = instance.nursery_id
+
+
+@receiver(post_delete, sender=VisitSchedule)
+@receiver(post_delete, sender=VisitImpression)
+def update_nursery_aggregates_on_delete(sender, instance, **kwargs):
+    refresh_aggregates([instance.nursery_id])
+    invalidate_nursery_detail([instance.nursery_id])
+
+
+@receiver(post_save, sender=VisitImpression)
+def queue_photo_variants(sender, instance, raw=False, **kwargs):
+    # 差し替えられた写真の縮小版を先に作っておく（間に合わなければ表示時に作る）
+    if raw:
+        return
+    changed = refresh_photo_digests(instance)
+    if changed:
+        enqueue(VARIANTS_JOB, {'impression_id': instance.pk, 'fields': changed})
+
+
+@receiver(post_save, sender=Nursery)
+@receiver(post_delete, sender=Nursery)
+def invalidate_nursery_detail_cache(sender, instance, **kwargs):
+    invalidate_nursery_detail([instance.pk])
+
+
+@receiver(post_save, sender=Nursery)
+@receiver(post_delete, sender=Nursery)
+@receiver(post_save, sender=VisitSchedule)
+@receiver(post_delete, sender=VisitSchedule)
+@receiver(post_save, sender=VisitImpression)
+@receiver(post_delete, sender=VisitImpression)
+def bump_owner_data_version(sender, instance, **kwargs):
+    bump_data_version(instance.owner_id)
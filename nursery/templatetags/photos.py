@@ -0,0 +1,42 @@
+"""
+見学感想の写真の縮小版を表示するテンプレートタグ
+
+    {% load photos %}
+    {% for field in impression|photo_fields %}
+        {% photo_picture impression field 'thumb' %}
+        <a href="{% photo_url impression field 'medium' %}">拡大</a>
+    {% endfor %}
+"""
+from django import template
+from django.urls import reverse
+
+from ..images import PHOTO_FIELDS, photo_digest
+
+register = template.Library()
+
+
+@register.filter
+def photo_fields(impression):
+    """写真が登録されている項目名のリスト"""
+    return [field for field in PHOTO_FIELDS if getattr(impression, field)]
+
+
+@register.simple_tag
+def photo_url(impression, field, size='medium', fmt='jpeg'):
+    """縮小版のURL（ハッシュが未計算なら、計算してからリダイレクトするURL）"""
+    kwargs = {'pk': impression.pk, 'field': field, 'size': size, 'fmt': fmt}
+    digest = photo_digest(impression, field)
+    if digest:
+        kwargs['digest'] = digest
+    return reverse('nursery:impression_photo', kwargs=kwargs)
+
+
+@register.inclusion_tag('nursery/includes/photo_picture.html')
+def photo_picture(impression, field, size='thumb', alt='', css_class='img-fluid rounded'):
+    """WebP に対応したブラウザには WebP、それ以外には JPEG を返す <picture>"""
+    return {
+        'webp_url': photo_url(impression, field, size, 'webp'),
+        'jpeg_url': photo_url(impression, field, size, 'jpeg'),
+        'alt': alt or getattr(impression, field).field.verbose_name,
+        'css_class': css_class,
+    }
@@ -0,0 +1,91 @@
+import datetime
+import io
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from nursery.aggregates import find_drift
+from nursery.models import Nursery, VisitImpression, VisitSchedule
+
+
+class AggregateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='p')
+        self.nursery = self.create_nursery('1')
+
+    def create_nursery(self, number):
+        return Nursery.objects.create(
+            owner=self.user, facility_number=number, name=f'保育園{number}', nursery_type='認可保育園',
+            address='東京都', phone_number='03-0000-0000',
+        )
+
+    def create_impression(self, overall, nursery=None, **ratings):
+        values = {axis: overall for axis in ['facility_rating', 'staff_rating', 'education_rating', 'access_rating']}
+        return VisitImpression.objects.create(
+            owner=self.user, nursery=nursery or self.nursery, overall_rating=overall, **{**values, **ratings},
+        )
+
+    def aggregates(self, nursery=None):
+        return Nursery.objects.values(
+            'visit_count', 'impression_count', 'rating_sum', 'rating_avg', 'staff_rating_avg',
+        ).get(pk=(nursery or self.nursery).pk)
+
+    def test_impression_create_update_delete(self):
+        self.assertEqual(self.aggregates(), {
+            'visit_count': 0, 'impression_count': 0, 'rating_sum': 0, 'rating_avg': None, 'staff_rating_avg': None,
+        })
+
+        first = self.create_impression(4, staff_rating=5)
+        self.create_impression(2)
+        self.assertEqual(self.aggregates(), {
+            'visit_count': 0, 'impression_count': 2, 'rating_sum': 6, 'rating_avg': 3.0, 'staff_rating_avg': 3.5,
+        })
+
+        first.overall_rating = 5
+        first.save()
+        self.assertEqual(self.aggregates()['rating_avg'], 3.5)
+
+        first.delete()
+        self.assertEqual(self.aggregates(), {
+            'visit_count': 0, 'impression_count': 1, 'rating_sum': 2, 'rating_avg': 2.0, 'staff_rating_avg': 2.0,
+        })
+        self.assertEqual(find_drift(), [])
+
+    def test_moving_impression_updates_both_nurseries(self):
+        other = self.create_nursery('2')
+        impression = self.create_impression(4)
+
+        impression = VisitImpression.objects.get(pk=impression.pk)
+        impression.nursery = other
+        impression.save()
+
+        self.assertEqual(self.aggregates()['impression_count'], 0)
+        self.assertIsNone(self.aggregates()['rating_avg'])
+        self.assertEqual(self.aggregates(other)['rating_avg'], 4.0)
+
+    def test_schedule_count(self):
+        schedule = VisitSchedule.objects.create(
+            owner=self.user, nursery=self.nursery, visit_date=datetime.date(2026, 11, 2),
+        )
+        self.assertEqual(self.aggregates()['visit_count'], 1)
+
+        schedule.delete()
+        self.assertEqual(self.aggregates()['visit_count'], 0)
+
+    def test_rebuild_aggregates_check(self):
+        self.create_impression(4)
+        out = io.StringIO()
+        call_command('rebuild_aggregates', '--check', stdout=out)
+        self.assertIn('食い違いはありません', out.getvalue())
+
+        # UPDATE 文ではシグナルが送られず、評価の合計と平均がずれる
+        VisitImpression.objects.update(overall_rating=2)
+        with self.assertRaisesMessage(CommandError, '2件の食い違い'):
+            call_command('rebuild_aggregates', '--check', stdout=io.StringIO())
+        # --check では直さない
+        self.assertEqual(self.aggregates()['rating_avg'], 4.0)
+
+        call_command('rebuild_aggregates', stdout=io.StringIO())
+        self.assertEqual(self.aggregates()['rating_avg'], 2.0)
+        self.assertEqual(find_drift(), [])
@@ -0,0 +1,169 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from nursery.api import api_token
+from nursery.models import Nursery
+
+
+def nursery_data(number, **values):
+    return {
+        'facility_number': number, 'name': f'保育園{number}', 'nursery_type': '認可保育園',
+        'address': f'東京都港区芝{number}', 'phone_number': '03-0000-0000', **values,
+    }
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner', password='p')
+        self.other = User.objects.create_user('other', password='p')
+        self.client.force_login(self.user)
+        self.collection_url = reverse('nursery:api_collection', args=['nurseries'])
+
+    def create_nursery(self, number, owner=None):
+        return Nursery.objects.create(owner=owner or self.user, **nursery_data(number))
+
+    def item_url(self, nursery):
+        return reverse('nursery:api_item', args=['nurseries', nursery.pk])
+
+    def send(self, method, url, data, **extra):
+        return getattr(self.client, method)(url, json.dumps(data), content_type='application/json', **extra)
+
+    def test_pagination_follows_cursors(self):
+        for number in ['1', '2', '3', '4', '5']:
+            self.create_nursery(number)
+        self.create_nursery('9', owner=self.other)
+
+        names = []
+        url = f'{self.collection_url}?limit=2&fields=id,name'
+        pages = []
+        while url:
+            page = self.client.get(url).json()
+            pages.append(page)
+            names += [row['name'] for row in page['results']]
+            self.assertEqual({key for row in page['results'] for key in row}, {'id', 'name'})
+            url = page['next']
+
+        self.assertEqual(names, [f'保育園{number}' for number in '12345'])
+        self.assertEqual(len(pages), 3)
+        previous = self.client.get(pages[1]['previous']).json()
+        self.assertEqual([row['name'] for row in previous['results']], ['保育園1', '保育園2'])
+
+    def test_invalid_cursor_and_fields(self):
+        self.assertEqual(self.client.get(f'{self.collection_url}?cursor=xxx').status_code, 400)
+        response = self.client.get(f'{self.collection_url}?fields=id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_validation_errors(self):
+        response = self.send('post', self.collection_url, nursery_data('1', phone_number='03(0000)0000'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('phone_number', response.json()['errors'])
+        self.assertFalse(Nursery.objects.exists())
+
+    def test_create_and_patch(self):
+        response = self.send('post', self.collection_url, nursery_data('1'))
+        self.assertEqual(response.status_code, 201)
+        nursery = Nursery.objects.get(pk=response.json()['id'])
+        self.assertEqual(nursery.owner, self.user)
+
+        response = self.send('patch', self.item_url(nursery), {'capacity': 40})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['capacity'], 40)
+        self.assertEqual(Nursery.objects.get(pk=nursery.pk).name, '保育園1')
+
+    def test_other_users_objects_are_not_found(self):
+        nursery = self.create_nursery('1', owner=self.other)
+        url = self.item_url(nursery)
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.send('patch', url, {'capacity': 40}).status_code, 404)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+        self.assertTrue(Nursery.objects.filter(pk=nursery.pk).exists())
+
+    def test_if_match_conflict(self):
+        nursery = self.create_nursery('1')
+        etag = self.client.get(self.item_url(nursery))['ETag']
+        Nursery.objects.filter(pk=nursery.pk).update(capacity=10)
+
+        response = self.send('patch', self.item_url(nursery), {'capacity': 40}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+
+    def test_collection_not_modified_without_listing_query(self):
+        self.create_nursery('1')
+        etag = self.client.get(self.collection_url)['ETag']
+
+        # ユーザーの読み込みだけで（セッションはキャッシュから）、一覧のクエリは発行しない
+        with self.assertNumQueries(1):
+            response = self.client.get(self.collection_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # データが変わると ETag も変わる
+        self.create_nursery('2')
+        response = self.client.get(self.collection_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+        # URL（絞り込み条件）が違えば別の ETag
+        self.assertNotEqual(self.client.get(f'{self.collection_url}?limit=1')['ETag'], response['ETag'])
+
+    def test_item_not_modified(self):
+        nursery = self.create_nursery('1')
+        etag = self.client.get(self.item_url(nursery))['ETag']
+
+        response = self.client.get(self.item_url(nursery), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_requires_login(self):
+        self.assertEqual(Client().get(self.collection_url).status_code, 401)
+
+
+class ApiTokenTests(TestCase):
+    """画面を使わない端末向けのトークン認証（CSRF トークンなしで書き込める）"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='secret')
+        self.client = Client(enforce_csrf_checks=True)
+        self.collection_url = reverse('nursery:api_collection', args=['nurseries'])
+
+    def post(self, url, data, **extra):
+        return self.client.post(url, json.dumps(data), content_type='application/json', **extra)
+
+    def test_token_from_credentials(self):
+        response = self.post(reverse('nursery:api_token'), {'username': 'owner', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        token = response.json()['token']
+
+        response = self.post(self.collection_url, nursery_data('1'), HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Nursery.objects.get().owner, self.user)
+
+    def test_wrong_password(self):
+        response = self.post(reverse('nursery:api_token'), {'username': 'owner', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_invalid_token(self):
+        token = api_token(self.user)
+        response = self.client.get(self.collection_url, HTTP_AUTHORIZATION=f'Bearer {token}x')
+        self.assertEqual(response.status_code, 401)
+
+    def test_token_is_revoked_by_password_change(self):
+        token = api_token(self.user)
+        self.user.set_password('changed')
+        self.user.save()
+
+        response = self.client.get(self.collection_url, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 401)
+
+    def test_session_writes_still_need_csrf_token(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.collection_url).status_code, 200)
+
+        response = self.post(self.collection_url, nursery_data('1'))
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Nursery.objects.exists())
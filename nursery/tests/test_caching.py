@@ -0,0 +1,79 @@
+import io
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.cached_db import KEY_PREFIX, SessionStore
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from hoiku_navi.cache_config import build_caches
+from nursery.caching import bump_version, get_version
+from nursery.dashboard import get_dashboard
+from nursery.detail import detail_version
+from nursery.models import Nursery, VisitImpression, VisitSchedule
+
+
+@override_settings(
+    CACHES=build_caches('fakeredis'),
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+)
+class RedisCacheTests(TestCase):
+    """CACHE_BACKEND=fakeredis（Redis バックエンド）での無効化とセッション"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner', password='p')
+        self.nursery = Nursery.objects.create(
+            owner=self.user, facility_number='1', name='ひまわり保育園', nursery_type='認可保育園',
+            address='東京都', phone_number='03-0000-0000',
+        )
+        schedule = VisitSchedule.objects.create(
+            owner=self.user, nursery=self.nursery, visit_date=date(2025, 4, 1), status='完了',
+        )
+        VisitImpression.objects.create(owner=self.user, nursery=self.nursery, visit_schedule=schedule, overall_rating=4)
+
+    def test_uses_redis_backend(self):
+        self.assertIsInstance(caches['default'], RedisCache)
+
+    def test_bump_version(self):
+        self.assertEqual(get_version('test'), 1)
+        self.assertEqual(bump_version('test'), 2)
+        self.assertEqual(get_version('test'), 2)
+
+        # バージョンが消えていても（期限切れ・キャッシュの消去）上げられる
+        cache.clear()
+        self.assertEqual(bump_version('test'), 2)
+
+    def test_dashboard_is_invalidated_by_save(self):
+        get_dashboard(self.user)
+        with self.assertNumQueries(0):
+            get_dashboard(self.user)
+
+        VisitSchedule.objects.create(owner=self.user, nursery=self.nursery, visit_date=date(2025, 5, 1))
+        with self.assertNumQueries(3):
+            context = get_dashboard(self.user)
+        self.assertEqual(context['scheduled_visits'], 1)
+
+    def test_warm_cache_fills_detail_fragments(self):
+        call_command('warm_cache', stdout=io.StringIO())
+
+        version = detail_version(self.nursery.pk)
+        for name in ('nursery_detail_schedules', 'nursery_detail_impressions'):
+            self.assertIsNotNone(cache.get(make_template_fragment_key(name, [self.nursery.pk, version])), name)
+
+        # 感想を保存すると詳細ページのバージョンが上がり、古い断片は使われない
+        VisitImpression.objects.get().save()
+        self.assertNotEqual(detail_version(self.nursery.pk), version)
+
+    def test_session_is_read_from_cache(self):
+        self.client.force_login(self.user)
+        session_key = self.client.session.session_key
+        self.assertIsNotNone(cache.get(KEY_PREFIX + session_key))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(session_key).load()['_auth_user_id'], str(self.user.pk))
+        self.assertEqual(self.client.get(reverse('nursery:nursery_list')).status_code, 200)
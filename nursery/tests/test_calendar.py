@@ -0,0 +1,149 @@
+import datetime
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from nursery.models import Nursery, VisitSchedule
+from nursery.utils import (
+    calendar_feed_token, create_google_calendar_url, ics_escape, ics_fold, iter_ics_calendar, user_from_feed_token,
+)
+
+
+def unfold(text):
+    """折り返した行を元の論理行に戻す"""
+    return text.replace('\r\n ', '').split('\r\n')
+
+
+class IcsFormatTests(SimpleTestCase):
+    def test_escape(self):
+        self.assertEqual(ics_escape('a\\b;c,d\r\ne\rf\ng'), 'a\\\\b\\;c\\,d\\ne\\nf\\ng')
+        self.assertEqual(ics_escape(None), '')
+
+    def test_fold_ascii(self):
+        line = 'DESCRIPTION:' + 'x' * 200
+
+        folded = ics_fold(line)
+
+        physical = folded.split('\r\n')[:-1]
+        self.assertTrue(folded.endswith('\r\n'))
+        self.assertTrue(all(len(part.encode()) <= 75 for part in physical))
+        self.assertTrue(all(part.startswith(' ') for part in physical[1:]))
+        self.assertEqual(unfold(folded), [line, ''])
+
+    def test_fold_does_not_split_multibyte_characters(self):
+        line = 'SUMMARY:' + 'ひまわり保育園' * 10
+
+        folded = ics_fold(line)
+
+        for part in folded.split('\r\n')[:-1]:
+            self.assertLessEqual(len(part.encode('utf-8')), 75)
+            part.encode('utf-8').decode('utf-8')
+        self.assertEqual(unfold(folded)[0], line)
+
+    def test_short_line_is_not_folded(self):
+        self.assertEqual(ics_fold('BEGIN:VEVENT'), 'BEGIN:VEVENT\r\n')
+
+
+class IcsCalendarTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='secret')
+        self.nursery = Nursery.objects.create(
+            owner=self.user, facility_number='1', name='ひまわり保育園', nursery_type='認可保育園',
+            address='東京都港区芝1-2-3, 2階', phone_number='03-0000-0000',
+        )
+
+    def create_schedule(self, **values):
+        return VisitSchedule.objects.create(
+            owner=self.user, nursery=self.nursery, visit_date=datetime.date(2026, 11, 2), **values,
+        )
+
+    def event(self, schedule):
+        lines = unfold(''.join(iter_ics_calendar([schedule])))
+        begin, end = lines.index('BEGIN:VEVENT'), lines.index('END:VEVENT')
+        return dict(line.split(':', 1) for line in lines[begin + 1:end])
+
+    def test_timed_event_is_written_in_utc(self):
+        schedule = self.create_schedule(
+            visit_time=datetime.time(10), contact_person='山田; 主任', notes='持ち物: 上履き, 靴下\n駐輪場なし',
+        )
+
+        event = self.event(schedule)
+
+        self.assertEqual(event['DTSTART'], '20261102T010000Z')
+        self.assertEqual(event['DTEND'], '20261102T020000Z')
+        self.assertEqual(event['UID'], f'visit-schedule-{schedule.pk}@hoikunavi')
+        self.assertEqual(event['STATUS'], 'CONFIRMED')
+        self.assertEqual(event['LOCATION'], '東京都港区芝1-2-3\\, 2階')
+        self.assertIn('担当者: 山田\\; 主任', event['DESCRIPTION'])
+        self.assertIn('メモ: 持ち物: 上履き\\, 靴下\\n駐輪場なし', event['DESCRIPTION'])
+
+    def test_all_day_and_cancelled_event(self):
+        event = self.event(self.create_schedule(status='キャンセル'))
+
+        self.assertEqual(event['DTSTART;VALUE=DATE'], '20261102')
+        self.assertEqual(event['DTEND;VALUE=DATE'], '20261103')
+        self.assertEqual(event['STATUS'], 'CANCELLED')
+
+    def test_every_physical_line_is_folded(self):
+        self.create_schedule(visit_time=datetime.time(10), notes='とても長いメモ' * 30)
+
+        content = ''.join(iter_ics_calendar(VisitSchedule.objects.select_related('nursery')))
+
+        for line in content.split('\r\n')[:-1]:
+            self.assertLessEqual(len(line.encode('utf-8')), 75)
+
+    def test_google_calendar_details_use_real_newlines(self):
+        schedule = self.create_schedule(visit_time=datetime.time(10), contact_person='山田', notes='上履き')
+
+        params = parse_qs(urlparse(create_google_calendar_url(schedule)).query)
+
+        details = params['details'][0]
+        self.assertEqual(details.split('\n'), [
+            '保育園名: ひまわり保育園', '施設タイプ: 認可保育園', '電話番号: 03-0000-0000', '担当者: 山田', '', 'メモ: 上履き',
+        ])
+        self.assertNotIn('\\n', details)
+        self.assertEqual(params['dates'], ['20261102T100000/20261102T110000'])
+
+
+class CalendarFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='secret')
+        nursery = Nursery.objects.create(
+            owner=self.user, facility_number='1', name='ひまわり保育園', nursery_type='認可保育園',
+            address='東京都', phone_number='03-0000-0000',
+        )
+        VisitSchedule.objects.create(owner=self.user, nursery=nursery, visit_date=datetime.date(2026, 11, 2))
+
+    def feed_url(self, token=None):
+        return reverse('nursery:calendar_feed', args=[token or calendar_feed_token(self.user)])
+
+    def test_feed_and_not_modified(self):
+        response = self.client.get(self.feed_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('【保育園見学】ひまわり保育園', b''.join(response.streaming_content).decode())
+
+        response = self.client.get(self.feed_url(), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_token_is_revoked_by_password_change(self):
+        token = calendar_feed_token(self.user)
+        self.assertEqual(user_from_feed_token(token), self.user)
+
+        self.user.set_password('changed')
+        self.user.save()
+
+        self.assertIsNone(user_from_feed_token(token))
+        self.assertEqual(self.client.get(self.feed_url(token)).status_code, 404)
+        self.assertEqual(self.client.get(self.feed_url()).status_code, 200)
+
+    def test_invalid_tokens(self):
+        token = calendar_feed_token(self.user)
+        for value in [token + 'x', f'999:{token.partition(":")[2]}', 'abc', ':']:
+            with self.subTest(token=value):
+                self.assertIsNone(user_from_feed_token(value))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(user_from_feed_token(token))
@@ -0,0 +1,108 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from nursery.comparison import (
+    IMPRESSIONS_PER_NURSERY, MAX_NURSERIES, SCHEDULES_PER_NURSERY, build_comparison, parse_ids,
+)
+from nursery.models import Nursery, VisitImpression, VisitSchedule
+
+
+class ComparisonTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='p')
+
+    def create_nursery(self, i, **values):
+        nursery = Nursery.objects.create(
+            owner=self.user, facility_number=str(i), name=f'保育園{i}', nursery_type='認可保育園',
+            address='東京都', phone_number='03-0000-0000', **values,
+        )
+        for day in range(SCHEDULES_PER_NURSERY + 1):
+            VisitSchedule.objects.create(
+                owner=self.user, nursery=nursery, visit_date=datetime.date(2026, 11, 1 + day),
+                visit_time=datetime.time(10),
+            )
+        for rating in range(1, IMPRESSIONS_PER_NURSERY + 2):
+            VisitImpression.objects.create(
+                owner=self.user, nursery=nursery, overall_rating=rating, facility_rating=rating,
+                staff_rating=rating, education_rating=rating, access_rating=rating,
+                estimated_monthly_fee=30000 + i * 1000,
+            )
+        return nursery
+
+    def compare(self, ids):
+        """比較表を作り、表示に使うものを読み切る"""
+        comparison = build_comparison(self.user, ids)
+        for nursery in comparison.nurseries:
+            list(nursery.recent_schedules)
+            list(nursery.recent_impressions)
+        comparison.facility_rows
+        comparison.rating_rows
+        return comparison
+
+    def test_query_count_does_not_depend_on_nurseries(self):
+        ids = [self.create_nursery(i).pk for i in range(MAX_NURSERIES)]
+        for count in [2, MAX_NURSERIES]:
+            with self.subTest(count=count), self.assertNumQueries(4):
+                comparison = self.compare(ids[:count])
+            self.assertEqual(len(comparison.nurseries), count)
+
+    def test_view_query_count_does_not_depend_on_nurseries(self):
+        ids = [str(self.create_nursery(i).pk) for i in range(MAX_NURSERIES)]
+        self.client.force_login(self.user)
+        url = reverse('nursery:nursery_compare')
+
+        counts = []
+        for count in [2, MAX_NURSERIES]:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {'ids': ','.join(ids[:count])})
+            self.assertEqual(len(response.context['comparison'].nurseries), count)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_recent_schedules_and_impressions_per_nursery(self):
+        nurseries = [self.create_nursery(i) for i in range(2)]
+
+        comparison = self.compare([nursery.pk for nursery in nurseries])
+
+        for nursery in comparison.nurseries:
+            self.assertEqual(len(nursery.recent_schedules), SCHEDULES_PER_NURSERY)
+            self.assertEqual(nursery.recent_schedules[0].visit_date, datetime.date(2026, 11, 1 + SCHEDULES_PER_NURSERY))
+            self.assertEqual(len(nursery.recent_impressions), IMPRESSIONS_PER_NURSERY)
+            self.assertTrue(all(impression.nursery_id == nursery.pk for impression in nursery.recent_impressions))
+
+    def test_order_missing_and_truncated_ids(self):
+        ids = [self.create_nursery(i).pk for i in range(MAX_NURSERIES + 1)]
+        other = Nursery.objects.create(
+            owner=User.objects.create_user('other'), facility_number='x', name='他人の保育園',
+            nursery_type='認可保育園', address='東京都', phone_number='03-0000-0000',
+        )
+
+        comparison = build_comparison(self.user, [ids[3], other.pk, ids[1], *ids[4:], ids[0]])
+
+        self.assertEqual([nursery.pk for nursery in comparison.nurseries][:2], [ids[3], ids[1]])
+        self.assertEqual(comparison.missing_ids, [other.pk])
+        self.assertTrue(comparison.truncated)
+        self.assertEqual(len(comparison.nurseries), MAX_NURSERIES - 1)
+
+    def test_best_values(self):
+        cheap = self.create_nursery(1, capacity=40)
+        expensive = self.create_nursery(5, capacity=60)
+
+        comparison = self.compare([cheap.pk, expensive.pk])
+
+        rows = {row.label: row for row in comparison.facility_rows + comparison.rating_rows}
+        self.assertEqual(rows['定員'].best, {1})
+        self.assertEqual(rows['想定月額費用（平均）'].cells, ['31,000円', '35,000円'])
+        self.assertEqual(rows['想定月額費用（平均）'].best, {0})
+        # 同じ値なら両方
+        self.assertEqual(rows['総合評価'].best, {0, 1})
+        # 値がない（2件未満の）行は比べない
+        self.assertEqual(rows['自宅からの距離'].best, set())
+
+    def test_parse_ids(self):
+        self.assertEqual(parse_ids(['3,1', '2', '1', 'x', ' 4 ', '-5']), [3, 1, 2, 4])
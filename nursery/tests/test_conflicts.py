@@ -0,0 +1,143 @@
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from nursery.conflicts import OUTSIDE_HOURS, OVERLAP, TRAVEL, calendar_report, conflicts_for, travel_buffer
+from nursery.forms import VisitScheduleForm
+from nursery.models import Nursery, VisitSchedule
+
+DAY = datetime.date(2026, 11, 2)
+
+
+# 移動時間は直線距離そのまま・分速80m、最低15分で見積もる
+@override_settings(TRAVEL_DETOUR_FACTOR=1.0, TRAVEL_METERS_PER_MINUTE=80, SCHEDULE_MIN_TRAVEL_BUFFER=15)
+class ConflictTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='p')
+        self.north = self.create_nursery('北保育園', latitude=Decimal('35.700000'), longitude=Decimal('139.700000'))
+        # 北保育園から南へ 0.03 度（約3.34km、徒歩42分）
+        self.south = self.create_nursery('南保育園', latitude=Decimal('35.670000'), longitude=Decimal('139.700000'))
+        self.unlocated = self.create_nursery('位置なし保育園')
+
+    def create_nursery(self, name, **values):
+        return Nursery.objects.create(
+            owner=self.user, facility_number=name, name=name, nursery_type='認可保育園',
+            address='東京都', phone_number='03-0000-0000', **values,
+        )
+
+    def create_visit(self, nursery, hour, minute=0, day=DAY, status='予定'):
+        return VisitSchedule.objects.create(
+            owner=self.user, nursery=nursery, visit_date=day, visit_time=datetime.time(hour, minute), status=status,
+        )
+
+    def report(self):
+        return [(c.kind, c.schedule.pk, c.other and c.other.pk, c.minutes) for c in calendar_report(self.user, DAY)]
+
+    def test_overlap(self):
+        first = self.create_visit(self.north, 10)
+        second = self.create_visit(self.north, 10, 30)
+
+        self.assertEqual(self.report(), [(OVERLAP, second.pk, first.pk, 30)])
+        self.assertEqual(calendar_report(self.user, DAY)[0].message, '北保育園（10:00〜）の見学と30分重なっています')
+
+    def test_overlap_with_every_active_visit(self):
+        first = self.create_visit(self.north, 10)
+        second = self.create_visit(self.south, 10, 20)
+        third = self.create_visit(self.unlocated, 10, 40)
+
+        overlaps = [row for row in self.report() if row[0] == OVERLAP]
+        self.assertEqual(overlaps, [
+            (OVERLAP, second.pk, first.pk, 40), (OVERLAP, third.pk, first.pk, 20), (OVERLAP, third.pk, second.pk, 40),
+        ])
+
+    def test_travel_buffer_from_distance(self):
+        self.assertEqual(travel_buffer(self.north, self.south), 42)
+        # 位置が分からない・同じ保育園なら最低限の時間
+        self.assertEqual(travel_buffer(self.north, self.unlocated), 15)
+        self.assertEqual(travel_buffer(self.north, self.north), 15)
+
+    def test_travel_shortage(self):
+        first = self.create_visit(self.north, 10)
+        # 11:00 に終わってから30分後（移動に42分かかる）
+        second = self.create_visit(self.south, 11, 30)
+
+        self.assertEqual(self.report(), [(TRAVEL, second.pk, first.pk, 12)])
+        self.assertEqual(calendar_report(self.user, DAY)[0].message, '北保育園（10:00〜）の見学の後、移動の時間が約12分足りません')
+
+    def test_enough_travel_time(self):
+        self.create_visit(self.north, 10)
+        self.create_visit(self.south, 11, 45)
+        self.create_visit(self.unlocated, 13)
+
+        self.assertEqual(self.report(), [])
+
+    def test_visits_on_other_days_or_cancelled_are_ignored(self):
+        self.create_visit(self.north, 10)
+        self.create_visit(self.south, 11, day=DAY + datetime.timedelta(days=1))
+        self.create_visit(self.south, 10, 30, status='キャンセル')
+
+        self.assertEqual(self.report(), [])
+
+    def test_opening_hours(self):
+        nursery = self.create_nursery(
+            'ひまわり保育園', opening_time=datetime.time(8), closing_time=datetime.time(18),
+        )
+        early = self.create_visit(nursery, 7, 30)
+        self.create_visit(nursery, 12)
+        self.create_visit(nursery, 17)
+        late = self.create_visit(nursery, 17, 30)
+
+        self.assertEqual([row for row in self.report() if row[0] == OUTSIDE_HOURS], [
+            (OUTSIDE_HOURS, early.pk, None, 0), (OUTSIDE_HOURS, late.pk, None, 0),
+        ])
+        self.assertEqual(
+            calendar_report(self.user, DAY)[0].message, 'ひまわり保育園の開園時間（08:00〜18:00）外です',
+        )
+
+    def test_visit_crossing_midnight_is_after_closing(self):
+        nursery = self.create_nursery('夜間保育園', closing_time=datetime.time(23, 59))
+        visit = self.create_visit(nursery, 23, 30)
+
+        self.assertEqual(self.report(), [(OUTSIDE_HOURS, visit.pk, None, 0)])
+
+    def test_candidate_before_existing_visit_reports_later_visit(self):
+        later = self.create_visit(self.south, 11, 30)
+        candidate = VisitSchedule(
+            owner=self.user, nursery=self.north, visit_date=DAY, visit_time=datetime.time(10), status='予定',
+        )
+
+        [conflict] = conflicts_for(candidate)
+
+        self.assertEqual((conflict.kind, conflict.schedule, conflict.other, conflict.minutes), (TRAVEL, candidate, later, 12))
+        self.assertTrue(conflict.other_is_later)
+        self.assertEqual(conflict.message, '南保育園（11:30〜）の見学までの移動の時間が約12分足りません')
+
+    def test_candidate_overlapping_later_visit(self):
+        later = self.create_visit(self.north, 10, 30)
+        candidate = VisitSchedule(
+            owner=self.user, nursery=self.north, visit_date=DAY, visit_time=datetime.time(10), status='予定',
+        )
+
+        [conflict] = conflicts_for(candidate)
+
+        self.assertEqual((conflict.kind, conflict.other, conflict.minutes), (OVERLAP, later, 30))
+        self.assertEqual(conflict.message, '北保育園（10:30〜）の見学と30分重なっています')
+
+    def test_edited_visit_does_not_conflict_with_itself(self):
+        visit = self.create_visit(self.north, 10)
+        visit.visit_time = datetime.time(10, 15)
+
+        self.assertEqual(conflicts_for(visit), [])
+
+    def test_form_requires_confirmation(self):
+        self.create_visit(self.north, 10)
+        data = {'nursery': self.north.pk, 'visit_date': DAY, 'visit_time': '10:30', 'status': '予定'}
+
+        form = VisitScheduleForm(data, user=self.user)
+        self.assertFalse(form.is_valid())
+        self.assertIn('北保育園（10:00〜）の見学と30分重なっています', form.non_field_errors())
+
+        form = VisitScheduleForm({**data, 'allow_conflicts': 'on'}, user=self.user)
+        self.assertTrue(form.is_valid(), form.errors)
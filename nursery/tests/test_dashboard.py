@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from nursery.dashboard import build_dashboard, dashboard_counts, get_dashboard
+from nursery.models import Nursery, VisitImpression, VisitSchedule
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner', password='p')
+        other = User.objects.create_user('other', password='p')
+        for owner in (self.user, other):
+            nursery = Nursery.objects.create(
+                owner=owner, facility_number='1', name='ひまわり保育園',
+                nursery_type='認可保育園', address='東京都', phone_number='03-0000-0000',
+            )
+            done = VisitSchedule.objects.create(
+                owner=owner, nursery=nursery, visit_date=timezone.localdate() - timedelta(days=1), status='完了',
+            )
+            VisitSchedule.objects.create(owner=owner, nursery=nursery, visit_date=timezone.localdate(), status='予定')
+            VisitSchedule.objects.create(owner=owner, nursery=nursery, visit_date=timezone.localdate(), status='予定')
+            VisitImpression.objects.create(owner=owner, nursery=nursery, visit_schedule=done, overall_rating=4)
+
+    def test_counts_are_scoped_to_owner(self):
+        self.assertEqual(dashboard_counts(self.user), {
+            'total_nurseries': 1,
+            'scheduled_visits': 2,
+            'completed_visits': 1,
+            'total_impressions': 1,
+        })
+
+    def test_counts_are_one_query(self):
+        with self.assertNumQueries(1):
+            dashboard_counts(self.user)
+
+    def test_query_count(self):
+        # 件数（1回）、今後の予定、評価の高い感想
+        with self.assertNumQueries(3):
+            context = build_dashboard(self.user)
+        self.assertEqual(len(context['recent_schedules']), 2)
+        with self.assertNumQueries(0):
+            for schedule in context['recent_schedules']:
+                schedule.nursery.name
+
+    def test_cached_until_data_changes(self):
+        get_dashboard(self.user)
+        with self.assertNumQueries(0):
+            get_dashboard(self.user)
+
+        VisitSchedule.objects.filter(owner=self.user, status='予定').first().save()
+        with self.assertNumQueries(3):
+            get_dashboard(self.user)
@@ -0,0 +1,78 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from nursery.models import Nursery, VisitImpression, VisitSchedule
+
+
+class DetailETagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner', password='p')
+        self.client.force_login(self.user)
+        self.nursery = Nursery.objects.create(
+            owner=self.user, facility_number='1', name='ひまわり保育園', nursery_type='認可保育園',
+            address='東京都', phone_number='03-0000-0000',
+        )
+        self.url = reverse('nursery:nursery_detail', args=[self.nursery.pk])
+
+    def etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def create_schedule(self, notes=''):
+        return VisitSchedule.objects.create(
+            owner=self.user, nursery=self.nursery, visit_date=datetime.date(2026, 11, 2), notes=notes,
+        )
+
+    def test_not_modified_without_rendering(self):
+        etag = self.etag()
+
+        # ユーザーと保育園の行（ETag の元の値を含む）の読み込みだけ
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    def test_etag_changes_with_related_rows(self):
+        etags = [self.etag()]
+
+        schedule = self.create_schedule()
+        etags.append(self.etag())
+
+        impression = VisitImpression.objects.create(
+            owner=self.user, nursery=self.nursery, overall_rating=4, facility_rating=4, staff_rating=4,
+            education_rating=4, access_rating=4,
+        )
+        etags.append(self.etag())
+
+        impression.good_points = '広い園庭'
+        impression.save()
+        etags.append(self.etag())
+
+        schedule.delete()
+        etags.append(self.etag())
+
+        self.nursery.name = 'ひまわり第二保育園'
+        self.nursery.save()
+        etags.append(self.etag())
+
+        # シグナルの送られない UPDATE 文で書き換える値も含める
+        Nursery.objects.filter(pk=self.nursery.pk).update(distance_from_home=1.2)
+        etags.append(self.etag())
+
+        self.assertEqual(len(set(etags)), len(etags))
+
+    def test_stale_etag_gets_fresh_page(self):
+        etag = self.etag()
+        self.create_schedule(notes='上履きを持参')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '上履きを持参')
@@ -0,0 +1,65 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from nursery import distances
+from nursery.models import HomeLocation, Nursery
+
+
+class RecomputeDistancesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='p')
+        self.home = HomeLocation.objects.create(
+            user=self.user, address='東京都千代田区丸の内1-9-1',
+            latitude=Decimal('35.681236'), longitude=Decimal('139.767125'),
+        )
+
+    def create_nursery(self, number, latitude=None, longitude=None):
+        return Nursery.objects.create(
+            owner=self.user, facility_number=number, name=f'保育園{number}',
+            nursery_type='認可保育園', address='東京都', phone_number='03-0000-0000',
+            latitude=latitude, longitude=longitude,
+        )
+
+    def test_recompute_clears_stale_flag(self):
+        near = self.create_nursery('1', Decimal('35.690921'), Decimal('139.700258'))
+        unlocated = self.create_nursery('2')
+
+        self.assertEqual(distances.recompute_distances(self.home, batch_size=1), 2)
+
+        near.refresh_from_db()
+        self.assertAlmostEqual(near.distance_from_home, 6.13, places=1)
+        self.assertGreater(near.travel_time, 0)
+        self.assertFalse(near.distance_stale)
+        unlocated.refresh_from_db()
+        self.assertIsNone(unlocated.distance_from_home)
+        self.assertFalse(unlocated.distance_stale)
+
+    def test_rows_moved_during_recompute_stay_stale(self):
+        moved = self.create_nursery('1', Decimal('35.690921'), Decimal('139.700258'))
+        kept = self.create_nursery('2', Decimal('35.690921'), Decimal('139.700258'))
+        haversine = distances.haversine_km_array
+
+        def geocoded_meanwhile(*args):
+            # 距離の計算中に再ジオコーディングで座標が変わった
+            Nursery.objects.filter(pk=moved.pk).update(
+                latitude=Decimal('34.702485'), longitude=Decimal('135.495951'), distance_stale=True,
+            )
+            return haversine(*args)
+
+        with mock.patch.object(distances, 'haversine_km_array', side_effect=geocoded_meanwhile):
+            self.assertEqual(distances.recompute_distances(self.home), 1)
+
+        moved.refresh_from_db()
+        self.assertTrue(moved.distance_stale)
+        self.assertIsNone(moved.distance_from_home)
+        kept.refresh_from_db()
+        self.assertFalse(kept.distance_stale)
+
+        # 次の再計算で新しい座標の距離になる
+        self.assertEqual(distances.recompute_distances(self.home), 1)
+        moved.refresh_from_db()
+        self.assertFalse(moved.distance_stale)
+        self.assertGreater(moved.distance_from_home, 300)
@@ -0,0 +1,55 @@
+import csv
+import io
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from openpyxl import load_workbook
+
+from nursery.exports import EXPORTS, iter_csv, write_xlsx
+from nursery.importers import NurseryImporter, iter_rows
+from nursery.models import Nursery
+
+FORMULAS = ['=HYPERLINK("http://example.com","開く")', '+81-3-0000', '-1+1', '@SUM(A1)']
+
+
+class FormulaEscapeTests(TestCase):
+    """数式として解釈される文字列は先頭に ' を付けて書き出す"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='p')
+        for i, value in enumerate(FORMULAS):
+            Nursery.objects.create(
+                owner=self.user, facility_number=f'{i}', name=f'保育園{i}', nursery_type='認可保育園',
+                address='東京都', phone_number='03-0000-0000', notes=value,
+            )
+
+    def csv_rows(self, name='nurseries'):
+        return list(csv.DictReader(io.StringIO(''.join(iter_csv(EXPORTS[name], self.user)).lstrip('\ufeff'))))
+
+    def test_csv_cells_are_escaped(self):
+        notes = [row['備考'] for row in self.csv_rows()]
+        self.assertEqual(sorted(notes), sorted(f"'{value}" for value in FORMULAS))
+
+    def test_xlsx_cells_are_escaped(self):
+        fp = io.BytesIO()
+        write_xlsx(EXPORTS['nurseries'], self.user, fp)
+        sheet = load_workbook(fp).active
+        headers = [cell.value for cell in sheet[1]]
+        column = headers.index('備考')
+        notes = [row[column] for row in sheet.iter_rows(min_row=2, values_only=True)]
+        self.assertEqual(sorted(notes), sorted(f"'{value}" for value in FORMULAS))
+
+    def test_plain_values_are_not_escaped(self):
+        row = self.csv_rows()[0]
+        self.assertEqual(row['電話番号'], '03-0000-0000')
+        self.assertEqual(row['保育園名'], '保育園0')
+
+    def test_reimport_keeps_cell_values(self):
+        # 取り込みは値を書き換えないので、付けた ' はそのまま残る
+        exported = ''.join(iter_csv(EXPORTS['nurseries'], self.user)).lstrip('\ufeff')
+
+        NurseryImporter(self.user).run(iter_rows(io.StringIO(exported), 'csv'))
+
+        self.assertEqual(
+            sorted(Nursery.objects.values_list('notes', flat=True)), sorted(f"'{value}" for value in FORMULAS),
+        )
@@ -0,0 +1,108 @@
+import math
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+
+from nursery.geo import (
+    EARTH_RADIUS_KM, KM_PER_DEGREE, bounding_box, haversine_km, haversine_km_array, parse_point, within_radius,
+)
+from nursery.models import Nursery
+
+TOKYO = (35.681236, 139.767125)
+
+
+def destination(lat, lng, bearing, km):
+    """(lat, lng) から方位 bearing（度）に km 進んだ地点"""
+    delta = km / EARTH_RADIUS_KM
+    theta = math.radians(bearing)
+    phi1, lambda1 = math.radians(lat), math.radians(lng)
+    phi2 = math.asin(math.sin(phi1) * math.cos(delta) + math.cos(phi1) * math.sin(delta) * math.cos(theta))
+    lambda2 = lambda1 + math.atan2(
+        math.sin(theta) * math.sin(delta) * math.cos(phi1), math.cos(delta) - math.sin(phi1) * math.sin(phi2),
+    )
+    return math.degrees(phi2), (math.degrees(lambda2) + 540) % 360 - 180
+
+
+class HaversineTests(SimpleTestCase):
+    def test_known_distances(self):
+        for (lat1, lng1, lat2, lng2), km in [
+            # パリ〜ロンドン
+            ((48.8566, 2.3522, 51.5074, -0.1278), 343.56),
+            # 赤道上の経度1度・子午線の緯度1度
+            ((0, 0, 0, 1), KM_PER_DEGREE),
+            ((35, 139, 36, 139), KM_PER_DEGREE),
+            # 赤道〜北極・地球の反対側
+            ((0, 0, 90, 0), math.pi * EARTH_RADIUS_KM / 2),
+            ((0, 0, 0, 180), math.pi * EARTH_RADIUS_KM),
+        ]:
+            with self.subTest(points=(lat1, lng1, lat2, lng2)):
+                self.assertAlmostEqual(haversine_km(lat1, lng1, lat2, lng2), km, delta=0.01)
+                self.assertAlmostEqual(haversine_km(lat2, lng2, lat1, lng1), km, delta=0.01)
+
+    def test_same_point(self):
+        self.assertEqual(haversine_km(*TOKYO, *TOKYO), 0.0)
+
+    def test_array_matches_scalar(self):
+        lats = np.array([34.733165, 35.0, 36.5])
+        lngs = np.array([135.500214, 139.767125, 140.0])
+
+        np.testing.assert_allclose(
+            haversine_km_array(*TOKYO, lats, lngs),
+            [haversine_km(*TOKYO, lat, lng) for lat, lng in zip(lats, lngs)],
+        )
+
+
+class BoundingBoxTests(SimpleTestCase):
+    def test_box_contains_circle(self):
+        for lat in [0.0, 35.681236, -60.0, 80.0]:
+            min_lat, max_lat, min_lng, max_lng = bounding_box(lat, 139.0, 5)
+            for bearing in range(0, 360, 15):
+                point_lat, point_lng = destination(lat, 139.0, bearing, 5)
+                with self.subTest(lat=lat, bearing=bearing):
+                    self.assertTrue(min_lat - 1e-9 <= point_lat <= max_lat + 1e-9)
+                    self.assertTrue(min_lng - 1e-9 <= point_lng <= max_lng + 1e-9)
+
+    def test_box_size(self):
+        min_lat, max_lat, min_lng, max_lng = bounding_box(60.0, 0.0, KM_PER_DEGREE)
+
+        self.assertAlmostEqual(max_lat - min_lat, 2.0)
+        # 緯度60度では経度1度の距離が半分になる
+        self.assertAlmostEqual(max_lng - min_lng, 4.0)
+
+    def test_pole(self):
+        _, _, min_lng, max_lng = bounding_box(90.0, 10.0, 1)
+
+        self.assertEqual((min_lng, max_lng), (-170.0, 190.0))
+
+    def test_parse_point(self):
+        self.assertEqual(parse_point('35.68,139.76'), (35.68, 139.76))
+        for text in ['', '35.68', 'a,b', '91,0', '0,181', None]:
+            with self.subTest(text=text):
+                self.assertIsNone(parse_point(text))
+
+
+class WithinRadiusTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='p')
+
+    def create_nursery(self, name, lat, lng):
+        return Nursery.objects.create(
+            owner=self.user, facility_number=name, name=name, nursery_type='認可保育園',
+            address='東京都', phone_number='03-0000-0000',
+            latitude=Decimal(f'{lat:.6f}'), longitude=Decimal(f'{lng:.6f}'),
+        )
+
+    def test_nearby_nurseries_in_distance_order(self):
+        # 真東・真北など、矩形の辺の近くにある地点も含める
+        for name, bearing, km in [('東', 90, 4.9), ('北', 0, 2.0), ('南西', 225, 4.0), ('遠い東', 90, 5.2)]:
+            self.create_nursery(name, *destination(*TOKYO, bearing, km))
+        self.create_nursery('大阪', 34.733165, 135.500214)
+
+        nurseries = list(within_radius(Nursery.objects.all(), *TOKYO, 5))
+
+        self.assertEqual([nursery.name for nursery in nurseries], ['北', '南西', '東'])
+        for nursery in nurseries:
+            expected = haversine_km(*TOKYO, float(nursery.latitude), float(nursery.longitude))
+            self.assertAlmostEqual(nursery.distance, expected, places=6)
@@ -0,0 +1,200 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from nursery.geocoding import (
+    GEOCODE_JOB, FakeGeocoder, _LRUCache, cache_stats, get_geocoder, persistent_cache_stats, purge_expired,
+    queue_geocoding, queue_geocoding_bulk, reset_memory_cache,
+)
+from nursery.jobs import backoff_seconds, run_pending
+from nursery.models import BackgroundJob, GeocodeCache, Nursery
+
+ADDRESS = '東京都千代田区丸の内一丁目9番1号'
+LOCATION = (35.681236, 139.767125)
+
+
+@override_settings(GEOCODER_CLASS='nursery.geocoding.FakeGeocoder', GEOCODE_CACHE_ENABLED=True)
+class GeocodingJobTests(TestCase):
+    def setUp(self):
+        FakeGeocoder.reset({ADDRESS: LOCATION})
+        reset_memory_cache()
+        self.user = User.objects.create_user('owner', password='p')
+
+    def create_nursery(self, address=ADDRESS):
+        return Nursery.objects.create(
+            owner=self.user, facility_number=str(Nursery.objects.count() + 1), name='ひまわり保育園',
+            nursery_type='認可保育園', address=address, phone_number='03-0000-0000',
+        )
+
+    def geocode_job(self):
+        return BackgroundJob.objects.get(kind=GEOCODE_JOB)
+
+    def test_run_job_saves_location(self):
+        nursery = self.create_nursery()
+        self.assertTrue(queue_geocoding(nursery))
+        self.assertEqual(Nursery.objects.get(pk=nursery.pk).geocode_status, '処理待ち')
+
+        run_pending()
+
+        nursery.refresh_from_db()
+        self.assertEqual(nursery.geocode_status, '取得済み')
+        self.assertAlmostEqual(float(nursery.latitude), LOCATION[0])
+        self.assertAlmostEqual(float(nursery.longitude), LOCATION[1])
+        self.assertTrue(nursery.distance_stale)
+        self.assertEqual(self.geocode_job().status, '完了')
+
+    def test_temporary_error_is_retried_with_backoff(self):
+        FakeGeocoder.failures = 1
+        nursery = self.create_nursery()
+        queue_geocoding(nursery)
+
+        before = timezone.now()
+        run_pending()
+
+        job = self.geocode_job()
+        self.assertEqual(job.status, '待機')
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('ConnectionError', job.last_error)
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=backoff_seconds(1)))
+        # 再試行の時刻になるまでは取り出さない
+        self.assertEqual(run_pending(), 0)
+
+        BackgroundJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, '完了')
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(Nursery.objects.get(pk=nursery.pk).geocode_status, '取得済み')
+
+    def test_unknown_address_fails_permanently(self):
+        nursery = self.create_nursery('存在しない住所')
+        queue_geocoding(nursery)
+
+        run_pending()
+
+        job = self.geocode_job()
+        self.assertEqual(job.status, '失敗')
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('PermanentJobError', job.last_error)
+        nursery.refresh_from_db()
+        self.assertEqual(nursery.geocode_status, '失敗')
+        self.assertIsNone(nursery.latitude)
+
+    def test_queue_geocoding_uses_cached_location(self):
+        queue_geocoding(self.create_nursery())
+        run_pending()
+        self.assertEqual(GeocodeCache.objects.count(), 1)
+
+        # 表記の違う同じ住所はキャッシュから反映し、ジョブを積まない
+        other = self.create_nursery('東京都千代田区丸の内1-9-1')
+        self.assertFalse(queue_geocoding(other))
+        self.assertEqual(other.geocode_status, '取得済み')
+
+        other.refresh_from_db()
+        self.assertAlmostEqual(float(other.latitude), LOCATION[0])
+        self.assertEqual(BackgroundJob.objects.filter(kind=GEOCODE_JOB).count(), 1)
+        self.assertEqual(FakeGeocoder.calls, [ADDRESS])
+
+    def test_database_cache_hit_after_memory_cache_is_cleared(self):
+        queue_geocoding(self.create_nursery())
+        run_pending()
+        reset_memory_cache()
+
+        self.assertFalse(queue_geocoding(self.create_nursery()))
+        self.assertEqual(GeocodeCache.objects.get().hit_count, 1)
+        self.assertEqual(len(FakeGeocoder.calls), 1)
+
+    def test_bulk_skips_nurseries_with_open_jobs(self):
+        nurseries = [self.create_nursery(f'東京都港区芝{i}') for i in range(3)]
+        ids = [nursery.pk for nursery in nurseries]
+
+        self.assertEqual(queue_geocoding_bulk(ids), 3)
+        BackgroundJob.objects.filter(payload__nursery_id=ids[0]).update(status='実行中')
+        self.assertEqual(queue_geocoding_bulk(ids), 0)
+        queue_geocoding(nurseries[1])
+        self.assertEqual(BackgroundJob.objects.filter(kind=GEOCODE_JOB).count(), 3)
+
+        # 完了したジョブの保育園には積み直す
+        BackgroundJob.objects.filter(payload__nursery_id=ids[2]).update(status='完了')
+        self.assertEqual(queue_geocoding_bulk(ids), 1)
+
+    def test_job_for_old_address_is_skipped(self):
+        nursery = self.create_nursery('東京都港区芝1')
+        queue_geocoding(nursery)
+        Nursery.objects.filter(pk=nursery.pk).update(address=ADDRESS)
+        nursery.address = ADDRESS
+        queue_geocoding(nursery)
+        self.assertEqual(BackgroundJob.objects.filter(kind=GEOCODE_JOB).count(), 2)
+
+        run_pending()
+
+        # 古い住所のジョブは何もせずに終わり、新しい住所だけを問い合わせる
+        self.assertEqual(FakeGeocoder.calls, [ADDRESS])
+        self.assertEqual(set(BackgroundJob.objects.values_list('status', flat=True)), {'完了'})
+        self.assertEqual(Nursery.objects.get(pk=nursery.pk).geocode_status, '取得済み')
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        lru = _LRUCache(2)
+        expires_at = timezone.now() + timedelta(days=1)
+        lru.set('a', 1, expires_at)
+        lru.set('b', 2, expires_at)
+        # 読んだ a は新しくなり、追加で押し出されるのは b
+        self.assertEqual(lru.get('a'), 1)
+        lru.set('c', 3, expires_at)
+
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+
+    def test_expired_entry_is_dropped(self):
+        lru = _LRUCache(2)
+        lru.set('old', 1, timezone.now() - timedelta(seconds=1))
+        lru.set('new', 2, timezone.now() + timedelta(days=1))
+
+        self.assertIsNone(lru.get('old'))
+        self.assertEqual(list(lru._data), ['new'])
+
+
+@override_settings(GEOCODER_CLASS='nursery.geocoding.FakeGeocoder', GEOCODE_CACHE_ENABLED=True, GEOCODE_CACHE_TTL_DAYS=90)
+class GeocodeCacheTests(TestCase):
+    def setUp(self):
+        FakeGeocoder.reset({ADDRESS: LOCATION})
+        reset_memory_cache()
+
+    def test_entry_expires_after_ttl(self):
+        geocoder = get_geocoder()
+        self.assertEqual(geocoder.geocode(ADDRESS), LOCATION)
+        entry = GeocodeCache.objects.get()
+        self.assertAlmostEqual(
+            (entry.expires_at - timezone.now()).total_seconds(), timedelta(days=90).total_seconds(), delta=60,
+        )
+
+        # 期限切れの行はメモリにも DB にもないものとして取得し直し、期限を延ばす
+        GeocodeCache.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        reset_memory_cache()
+        self.assertIsNone(geocoder.lookup(ADDRESS))
+        self.assertEqual(geocoder.geocode(ADDRESS), LOCATION)
+
+        self.assertEqual(len(FakeGeocoder.calls), 2)
+        self.assertGreater(GeocodeCache.objects.get().expires_at, timezone.now())
+
+    def test_memory_hit_does_not_query(self):
+        geocoder = get_geocoder()
+        geocoder.geocode(ADDRESS)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(geocoder.geocode('東京都千代田区丸の内1-9-1'), LOCATION)
+        self.assertEqual(cache_stats()['memory_hits'], 1)
+
+    def test_purge_expired(self):
+        now = timezone.now()
+        GeocodeCache.objects.create(normalized_address='old', latitude=0, longitude=0, expires_at=now - timedelta(days=1))
+        GeocodeCache.objects.create(normalized_address='new', latitude=0, longitude=0, expires_at=now + timedelta(days=1))
+        self.assertEqual(persistent_cache_stats()['expired'], 1)
+
+        self.assertEqual(purge_expired(), 1)
+
+        self.assertEqual(list(GeocodeCache.objects.values_list('normalized_address', flat=True)), ['new'])
@@ -0,0 +1,82 @@
+import io
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from nursery.images import VARIANT_FORMATS, VARIANT_SIZES, render_variant
+from nursery.models import Nursery, VisitImpression
+
+ORIENTATION = 0x0112
+MAKE = 0x010F
+GPS_IFD = 0x8825
+
+
+def camera_jpeg(size=(800, 400)):
+    """横長で撮影され、EXIF の向き（90度回転）・機種・位置情報を持つ写真"""
+    exif = Image.Exif()
+    exif[ORIENTATION] = 6
+    exif[MAKE] = 'ExampleCamera'
+    exif[GPS_IFD] = {1: 'N', 2: (35.0, 40.0, 52.0), 3: 'E', 4: (139.0, 46.0, 1.0)}
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+class RenderVariantTests(SimpleTestCase):
+    def test_metadata_is_stripped(self):
+        source = camera_jpeg()
+        self.assertEqual(Image.open(io.BytesIO(source)).getexif()[MAKE], 'ExampleCamera')
+
+        for size in VARIANT_SIZES:
+            for fmt in VARIANT_FORMATS:
+                with self.subTest(size=size, fmt=fmt):
+                    variant = Image.open(io.BytesIO(render_variant(io.BytesIO(source), size, fmt)))
+                    self.assertEqual(variant.format, VARIANT_FORMATS[fmt][0])
+                    self.assertEqual(dict(variant.getexif()), {})
+                    self.assertNotIn('exif', variant.info)
+                    self.assertNotIn('xmp', variant.info)
+
+    def test_orientation_is_applied(self):
+        variant = Image.open(io.BytesIO(render_variant(io.BytesIO(camera_jpeg()), 'thumb', 'jpeg')))
+
+        # 縦向きにしてから長辺 320px に縮小する
+        self.assertEqual(variant.size, (160, 320))
+
+    def test_small_images_are_not_enlarged(self):
+        variant = Image.open(io.BytesIO(render_variant(io.BytesIO(camera_jpeg((100, 60))), 'medium', 'webp')))
+
+        self.assertEqual(variant.size, (60, 100))
+
+
+class PhotoVariantViewTests(TestCase):
+    def setUp(self):
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.user = User.objects.create_user('owner', password='p')
+        self.client.force_login(self.user)
+        nursery = Nursery.objects.create(
+            owner=self.user, facility_number='1', name='ひまわり保育園', nursery_type='認可保育園',
+            address='東京都', phone_number='03-0000-0000',
+        )
+        self.impression = VisitImpression(
+            owner=self.user, nursery=nursery, overall_rating=4, facility_rating=4, staff_rating=4,
+            education_rating=4, access_rating=4,
+        )
+        self.impression.photo1.save('photo.jpg', ContentFile(camera_jpeg()), save=False)
+        self.impression.save()
+
+    def test_served_variant_has_no_exif(self):
+        url = reverse('nursery:impression_photo', kwargs={
+            'pk': self.impression.pk, 'field': 'photo1', 'size': 'thumb', 'fmt': 'webp',
+        })
+        response = self.client.get(url, follow=True)
+
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        variant = Image.open(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(dict(variant.getexif()), {})
+        self.assertEqual(variant.size, (160, 320))
@@ -0,0 +1,130 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.core.management import call_command
+from django.test import TestCase
+
+from nursery.importers import NurseryImporter, iter_rows
+from nursery.models import Nursery
+
+
+def jsonl(*rows):
+    return io.StringIO('\n'.join(row if isinstance(row, str) else json.dumps(row, ensure_ascii=False) for row in rows))
+
+
+def nursery_row(number, **values):
+    return {
+        'facility_number': number, 'name': f'保育園{number}', 'nursery_type': '認可保育園',
+        'address': f'東京都港区芝{number}', 'phone_number': '03-0000-0000', **values,
+    }
+
+
+class NurseryImporterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='p')
+
+    def run_import(self, fp, fmt='jsonl', **kwargs):
+        kwargs.setdefault('batch_size', 1)
+        return NurseryImporter(self.user, **kwargs).run(iter_rows(fp, fmt))
+
+    def test_creates_then_updates_by_facility_number(self):
+        report = self.run_import(jsonl(nursery_row('1'), nursery_row('2')))
+        self.assertEqual((report.read, report.created, report.updated), (2, 2, 0))
+
+        report = self.run_import(jsonl(nursery_row('1', capacity=60), nursery_row('2')))
+        self.assertEqual((report.created, report.updated, report.unchanged), (0, 1, 1))
+        self.assertEqual(Nursery.objects.get(owner=self.user, facility_number='1').capacity, 60)
+        self.assertEqual(Nursery.objects.filter(owner=self.user).count(), 2)
+
+    def test_csv_with_japanese_headers(self):
+        fp = io.StringIO(
+            '施設番号,保育園名,施設タイプ,住所,電話番号,給食,定員\n'
+            '10,さくら保育園,認可保育園,東京都港区芝1,03-1111-1111,なし,40\n'
+        )
+        report = self.run_import(fp, fmt='csv')
+
+        self.assertEqual(report.created, 1)
+        nursery = Nursery.objects.get(owner=self.user, facility_number='10')
+        self.assertFalse(nursery.has_lunch)
+        self.assertEqual(nursery.capacity, 40)
+
+    def test_invalid_field_is_reported_with_line_number(self):
+        report = self.run_import(jsonl(nursery_row('1'), nursery_row('2', phone_number='03(0000)0000')))
+
+        self.assertEqual((report.created, report.invalid), (1, 1))
+        line_no, errors = report.errors[0]
+        self.assertEqual(line_no, 2)
+        self.assertIn('phone_number', errors)
+
+    def test_malformed_json_line_does_not_abort_import(self):
+        report = self.run_import(jsonl(nursery_row('1'), '{"facility_number": "2",', nursery_row('3')))
+
+        self.assertEqual((report.read, report.created, report.invalid), (3, 2, 1))
+        line_no, errors = report.errors[0]
+        self.assertEqual(line_no, 2)
+        self.assertIn('JSONとして読み込めません', errors[NON_FIELD_ERRORS][0])
+        self.assertEqual(
+            sorted(Nursery.objects.filter(owner=self.user).values_list('facility_number', flat=True)),
+            ['1', '3'],
+        )
+
+    def test_json_line_that_is_not_an_object_is_invalid(self):
+        report = self.run_import(jsonl(nursery_row('1'), '["2", "保育園2"]', '"3"', nursery_row('4')))
+
+        self.assertEqual((report.created, report.invalid), (2, 2))
+        self.assertEqual([line_no for line_no, _ in report.errors], [2, 3])
+
+    def test_new_row_requires_model_fields(self):
+        report = self.run_import(jsonl({'facility_number': '9'}, nursery_row('1')))
+
+        self.assertEqual((report.created, report.invalid), (1, 1))
+        line_no, errors = report.errors[0]
+        self.assertEqual(line_no, 1)
+        self.assertEqual(set(errors), {'name', 'nursery_type', 'address', 'phone_number'})
+        self.assertFalse(Nursery.objects.filter(facility_number='9').exists())
+
+    def test_existing_row_can_be_updated_partially(self):
+        self.run_import(jsonl(nursery_row('1')))
+
+        report = self.run_import(jsonl({'facility_number': '1', 'capacity': 30}))
+
+        self.assertEqual((report.updated, report.invalid), (1, 0))
+        nursery = Nursery.objects.get(facility_number='1')
+        self.assertEqual((nursery.name, nursery.capacity), ('保育園1', 30))
+
+    def test_only_moved_rows_are_marked_stale(self):
+        self.run_import(jsonl(
+            nursery_row('1', latitude='35.680000', longitude='139.760000'),
+            nursery_row('2', latitude='35.690000', longitude='139.770000'),
+        ))
+        Nursery.objects.update(distance_stale=False)
+
+        self.run_import(jsonl(
+            nursery_row('1', latitude='35.680000', longitude='139.760000', capacity=30),
+            nursery_row('2', latitude='35.700000', longitude='139.770000'),
+        ), batch_size=10)
+
+        self.assertEqual(
+            dict(Nursery.objects.values_list('facility_number', 'distance_stale')), {'1': False, '2': True},
+        )
+
+    def test_dry_run_writes_nothing(self):
+        report = self.run_import(jsonl(nursery_row('1')), dry_run=True)
+
+        self.assertEqual(report.created, 1)
+        self.assertFalse(Nursery.objects.exists())
+
+    def test_command_reports_invalid_lines(self):
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'nurseries.jsonl'
+        path.write_text('{"facility_number": \n' + json.dumps(nursery_row('1')), encoding='utf-8')
+        stdout, stderr = io.StringIO(), io.StringIO()
+
+        call_command('import_nurseries', str(path), owner='owner', stdout=stdout, stderr=stderr)
+
+        self.assertIn('1行目: JSONとして読み込めません', stderr.getvalue())
+        self.assertIn('新規 1件', stdout.getvalue())
+        self.assertIn('エラー 1件', stdout.getvalue())
@@ -0,0 +1,171 @@
+import contextlib
+import datetime
+import importlib
+import io
+import tempfile
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from nursery.models import BackgroundJob, HomeLocation, Nursery, VisitImpression, VisitSchedule
+from nursery.utils import calendar_feed_token
+
+backfill_migration = importlib.import_module('nursery.migrations.0014_backfill_owner')
+
+
+def jpeg_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), 'orange').save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def create_data(owner, number):
+    """保育園・見学スケジュール・見学感想を1件ずつ作る"""
+    nursery = Nursery.objects.create(
+        owner=owner, facility_number=number, name=f'保育園{number}', nursery_type='認可保育園',
+        address='東京都', phone_number='03-0000-0000',
+    )
+    schedule = VisitSchedule.objects.create(
+        owner=owner, nursery=nursery, visit_date=datetime.date(2026, 11, 1), visit_time=datetime.time(10),
+    )
+    impression = VisitImpression(
+        owner=owner, nursery=nursery, visit_schedule=schedule, overall_rating=4, facility_rating=4,
+        staff_rating=4, education_rating=4, access_rating=4, good_points='広い園庭',
+    )
+    impression.photo1.save('photo.jpg', ContentFile(jpeg_bytes()), save=False)
+    impression.save()
+    return nursery, schedule, impression
+
+
+class OwnershipTests(TestCase):
+    """他のユーザーのデータは画面・API・エクスポート・カレンダーのどこからも見えない"""
+
+    def setUp(self):
+        cache.clear()
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.user = User.objects.create_user('owner', password='p')
+        self.other = User.objects.create_user('other', password='p')
+        self.mine = create_data(self.user, '1')
+        self.theirs = create_data(self.other, '2')
+        self.client.force_login(self.user)
+
+    def scoped_urls(self, nursery, schedule, impression):
+        return [
+            reverse('nursery:nursery_detail', args=[nursery.pk]),
+            reverse('nursery:nursery_update', args=[nursery.pk]),
+            reverse('nursery:schedule_update', args=[schedule.pk]),
+            reverse('nursery:schedule_to_calendar', args=[schedule.pk]),
+            reverse('nursery:schedule_download_ics', args=[schedule.pk]),
+            reverse('nursery:impression_update', args=[impression.pk]),
+            reverse('nursery:impression_photo', kwargs={
+                'pk': impression.pk, 'field': 'photo1', 'size': 'thumb', 'fmt': 'jpeg',
+            }),
+            reverse('nursery:api_item', args=['nurseries', nursery.pk]),
+            reverse('nursery:api_item', args=['schedules', schedule.pk]),
+            reverse('nursery:api_item', args=['impressions', impression.pk]),
+        ]
+
+    def test_other_users_objects_are_not_found(self):
+        for mine, theirs in zip(self.scoped_urls(*self.mine), self.scoped_urls(*self.theirs)):
+            with self.subTest(url=theirs):
+                self.assertIn(self.client.get(mine).status_code, [200, 302])
+                self.assertEqual(self.client.get(theirs).status_code, 404)
+
+    def test_other_users_objects_cannot_be_changed(self):
+        nursery, schedule, _ = self.theirs
+        self.assertEqual(self.client.delete(reverse('nursery:api_item', args=['nurseries', nursery.pk])).status_code, 404)
+        response = self.client.post(reverse('nursery:schedule_update', args=[schedule.pk]), {'status': 'キャンセル'})
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Nursery.objects.filter(pk=nursery.pk).exists())
+        self.assertEqual(VisitSchedule.objects.get(pk=schedule.pk).status, '予定')
+
+    def test_lists_show_only_own_rows(self):
+        for name, key in [('nursery_list', 'nurseries'), ('schedule_list', 'schedules'), ('impression_list', 'impressions')]:
+            with self.subTest(name=name):
+                response = self.client.get(reverse(f'nursery:{name}'))
+                self.assertEqual([obj.owner_id for obj in response.context[key]], [self.user.pk])
+        for resource in ['nurseries', 'schedules', 'impressions']:
+            with self.subTest(resource=resource):
+                results = self.client.get(reverse('nursery:api_collection', args=[resource])).json()['results']
+                self.assertEqual(len(results), 1)
+
+    def test_comparison_ignores_other_users_nurseries(self):
+        ids = f'{self.mine[0].pk},{self.theirs[0].pk}'
+        response = self.client.get(reverse('nursery:nursery_compare'), {'ids': ids})
+        self.assertEqual([nursery.pk for nursery in response.context['comparison'].nurseries], [self.mine[0].pk])
+
+    def test_export_contains_only_own_rows(self):
+        response = self.client.get(reverse('nursery:export_data', args=['nurseries']))
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        self.assertIn('保育園1', content)
+        self.assertNotIn('保育園2', content)
+
+    def test_calendar_feed_contains_only_token_owners_schedules(self):
+        response = self.client.get(reverse('nursery:calendar_feed', args=[calendar_feed_token(self.other)]))
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('保育園2', content)
+        self.assertNotIn('保育園1', content)
+
+
+class BackfillOwnerTests(TestCase):
+    """所有者が未設定の既存データの割り当て（backfill_owner コマンドとマイグレーション）"""
+
+    def setUp(self):
+        cache.clear()
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.user = User.objects.create_user('owner', password='p')
+        HomeLocation.objects.create(user=self.user, address='東京都', latitude=35.68, longitude=139.76)
+        self.unowned = create_data(None, '1')
+        self.unowned[0].distance_stale = False
+        self.unowned[0].save()
+
+    def assertAssigned(self, user):
+        nursery, schedule, impression = self.unowned
+        nursery.refresh_from_db()
+        self.assertEqual(nursery.owner, user)
+        self.assertTrue(nursery.distance_stale)
+        self.assertEqual(VisitSchedule.objects.get(pk=schedule.pk).owner, user)
+        self.assertEqual(VisitImpression.objects.get(pk=impression.pk).owner, user)
+
+    def test_command_assigns_unowned_rows(self):
+        other = User.objects.create_user('other', password='p')
+        others = create_data(other, '2')
+
+        out = io.StringIO()
+        call_command('backfill_owner', 'owner', batch_size=1, stdout=out)
+
+        self.assertAssigned(self.user)
+        self.assertIn('保育園 1件 / 見学スケジュール 1件 / 見学感想 1件', out.getvalue())
+        # 所有者が設定済みの行はそのまま
+        self.assertEqual(VisitSchedule.objects.get(pk=others[1].pk).owner, other)
+        self.assertTrue(BackgroundJob.objects.filter(kind='recompute_distances', payload={'user_id': self.user.pk}).exists())
+
+    def test_command_requires_existing_user(self):
+        with self.assertRaises(CommandError):
+            call_command('backfill_owner', 'nobody', stdout=io.StringIO())
+        self.assertIsNone(Nursery.objects.get().owner)
+
+    def test_migration_assigns_rows_to_only_user(self):
+        backfill_migration.assign_existing_rows(apps, None)
+
+        self.assertAssigned(self.user)
+        self.assertTrue(BackgroundJob.objects.filter(kind='recompute_distances', payload={'user_id': self.user.pk}).exists())
+
+    def test_migration_leaves_rows_when_owner_is_ambiguous(self):
+        User.objects.create_user('other', password='p')
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            backfill_migration.assign_existing_rows(apps, None)
+
+        self.assertIn('backfill_owner', out.getvalue())
+
+        self.assertFalse(Nursery.objects.filter(owner__isnull=False).exists())
@@ -0,0 +1,138 @@
+import base64
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from nursery.models import Nursery
+from nursery.pagination import CursorPaginator, InvalidCursor, cached_count, encode_cursor
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', password='p')
+        # 同じ名前・同じ評価の保育園を含める（並び順の最後の id で区別する）
+        for i, (name, rating) in enumerate([
+            ('あおい保育園', 4.0), ('さくら保育園', None), ('さくら保育園', 3.0), ('さくら保育園', 4.0),
+            ('ひまわり保育園', None), ('ひまわり保育園', 4.0), ('もみじ保育園', 2.5),
+        ]):
+            Nursery.objects.create(
+                owner=cls.user, facility_number=str(i), name=name, nursery_type='認可保育園',
+                address='東京都', phone_number='03-0000-0000', rating_avg=rating,
+            )
+
+    def walk(self, ordering, page_size=2):
+        """先頭から next をたどった全ページ"""
+        paginator = CursorPaginator(Nursery.objects.all(), ordering, page_size)
+        pages = [paginator.page()]
+        while pages[-1].has_next:
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return paginator, pages
+
+    def ids(self, pages):
+        return [nursery.pk for page in pages for nursery in page]
+
+    def test_next_cursors_visit_every_row_once_with_ties(self):
+        _, pages = self.walk(['name', 'id'])
+
+        self.assertEqual(self.ids(pages), list(Nursery.objects.order_by('name', 'id').values_list('pk', flat=True)))
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertFalse(pages[0].has_previous)
+        self.assertFalse(pages[-1].has_next)
+
+    def test_nullable_descending_key(self):
+        # NULL は最も大きい値として扱う（降順では先頭）
+        _, pages = self.walk(['-rating_avg', 'id'], page_size=3)
+
+        expected = sorted(
+            Nursery.objects.values_list('pk', 'rating_avg'),
+            key=lambda row: (row[1] is not None, -(row[1] or 0), row[0]),
+        )
+        self.assertEqual(self.ids(pages), [pk for pk, _ in expected])
+
+    def test_previous_cursors_walk_back(self):
+        paginator, pages = self.walk(['name', 'id'])
+
+        page = pages[-1]
+        back = []
+        while page.has_previous:
+            page = paginator.page(page.previous_cursor)
+            back.insert(0, [nursery.pk for nursery in page])
+        self.assertEqual(back, [[nursery.pk for nursery in page] for page in pages[:-1]])
+
+    def test_values_queryset(self):
+        paginator = CursorPaginator(Nursery.objects.values('id', 'name'), ['name', 'id'], 3)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+
+        self.assertEqual(first.object_list[0], {'id': Nursery.objects.order_by('name', 'id')[0].pk, 'name': 'あおい保育園'})
+        self.assertEqual(len(second), 3)
+
+    def test_invalid_cursors(self):
+        paginator = CursorPaginator(Nursery.objects.all(), ['name', 'id'], 2)
+        raw = base64.urlsafe_b64encode(json.dumps({'v': ['x', 1], 'd': 'sideways'}).encode()).decode()
+        for cursor in [
+            'not-a-cursor!',
+            base64.urlsafe_b64encode(b'[1, 2]').decode(),
+            raw,
+            encode_cursor(['さくら保育園']),
+            encode_cursor(['さくら保育園', 'abc']),
+        ]:
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                paginator.page(cursor)
+
+
+@override_settings(LIST_PAGINATION='keyset')
+class KeysetPaginationViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner', password='p')
+        self.client.force_login(self.user)
+        for i in range(12):
+            self.create_nursery(i)
+
+    def create_nursery(self, i):
+        return Nursery.objects.create(
+            owner=self.user, facility_number=str(i), name=f'保育園{i % 3}', nursery_type='認可保育園',
+            address='東京都', phone_number='03-0000-0000',
+        )
+
+    def test_next_and_previous_links(self):
+        url = reverse('nursery:nursery_list')
+        first = self.client.get(url)
+        self.assertEqual(len(first.context['nurseries']), 10)
+        self.assertIsNone(first.context['previous_page_url'])
+        self.assertEqual(first.context['total_count'], 12)
+
+        second = self.client.get(url + first.context['next_page_url'])
+        self.assertEqual(len(second.context['nurseries']), 2)
+        self.assertIsNone(second.context['next_page_url'])
+        seen = [n.pk for n in first.context['nurseries']] + [n.pk for n in second.context['nurseries']]
+        self.assertEqual(seen, list(Nursery.objects.order_by('name', 'id').values_list('pk', flat=True)))
+
+        back = self.client.get(url + second.context['previous_page_url'])
+        self.assertEqual(list(back.context['nurseries']), list(first.context['nurseries']))
+
+    def test_tampered_cursor_is_not_found(self):
+        response = self.client.get(reverse('nursery:nursery_list'), {'cursor': encode_cursor(['保育園0'])})
+        self.assertEqual(response.status_code, 404)
+
+    def test_count_is_cached_until_data_version_changes(self):
+        url = reverse('nursery:nursery_list')
+        self.client.get(url)
+        queryset = Nursery.objects.filter(owner=self.user)
+        key = 'nursery:nursery_list?'
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_count(queryset, self.user, key), 12)
+
+        # 保存・削除でデータのバージョンが上がり、件数を数え直す
+        self.create_nursery(99)
+        with self.assertNumQueries(1):
+            self.assertEqual(cached_count(queryset, self.user, key), 13)
+        self.assertEqual(self.client.get(url).context['total_count'], 13)
+
+        Nursery.objects.filter(facility_number='99').get().delete()
+        self.assertEqual(self.client.get(url).context['total_count'], 12)
@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+import time
+from datetime import date, time as clock
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from nursery.models import Nursery, VisitImpression, VisitSchedule
+from nursery.perf import QueryBudgetExceeded, load_snapshots, registry
+
+
+@override_settings(PERF_METRICS_ENABLED=True, PERF_ENFORCE_BUDGETS=True)
+class QueryBudgetTests(TestCase):
+    """PERF_QUERY_BUDGETS を設定したビューが、キャッシュのない状態でも予算内に収まるか"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', password='p')
+        cls.nurseries = []
+        for i in range(12):
+            nursery = Nursery.objects.create(
+                owner=cls.user, facility_number=str(i), name=f'保育園{i:02d}', nursery_type='認可保育園',
+                address='東京都千代田区', phone_number='03-0000-0000',
+                latitude=35.68 + i * 0.001, longitude=139.76 + i * 0.001,
+            )
+            for day in (1, 2):
+                schedule = VisitSchedule.objects.create(
+                    owner=cls.user, nursery=nursery, visit_date=date(2025, 4, day), visit_time=clock(10), status='完了',
+                )
+                VisitImpression.objects.create(
+                    owner=cls.user, nursery=nursery, visit_schedule=schedule, overall_rating=1 + (i + day) % 5,
+                )
+            cls.nurseries.append(nursery)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.enterContext(override_settings(PERF_REPORT_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+
+    def assert_within_budget(self, view_name, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        queries = response.wsgi_request.perf_metrics.queries
+        self.assertLessEqual(queries, settings.PERF_QUERY_BUDGETS[view_name])
+        return queries
+
+    def test_budgeted_views(self):
+        nursery = self.nurseries[0]
+        ids = ','.join(str(nursery.pk) for nursery in self.nurseries[:10])
+        urls = {
+            'nursery:nursery_list': reverse('nursery:nursery_list'),
+            'nursery:nursery_detail': reverse('nursery:nursery_detail', args=[nursery.pk]),
+            'nursery:schedule_list': reverse('nursery:schedule_list'),
+            'nursery:impression_list': reverse('nursery:impression_list'),
+            'nursery:map_view': reverse('nursery:map_view'),
+            'nursery:map_tile': reverse('nursery:map_tile', args=[12, 3637, 1612]),
+            'nursery:ranking': reverse('nursery:ranking'),
+            'nursery:nursery_compare': f"{reverse('nursery:nursery_compare')}?ids={ids}",
+        }
+        self.assertEqual(set(urls), set(settings.PERF_QUERY_BUDGETS))
+        for view_name, url in urls.items():
+            with self.subTest(view_name):
+                self.assert_within_budget(view_name, url)
+
+    def test_compare_query_count_does_not_depend_on_nurseries(self):
+        url = reverse('nursery:nursery_compare')
+        two = self.assert_within_budget('nursery:nursery_compare', f'{url}?ids={self.nurseries[0].pk},{self.nurseries[1].pk}')
+        ten = self.assert_within_budget(
+            'nursery:nursery_compare', f"{url}?ids={','.join(str(nursery.pk) for nursery in self.nurseries[:10])}",
+        )
+        self.assertEqual(two, ten)
+
+    @override_settings(PERF_QUERY_BUDGETS={'nursery:nursery_list': 1})
+    def test_exceeding_budget_raises(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'nursery:nursery_list'):
+            self.client.get(reverse('nursery:nursery_list'))
+
+    @override_settings(PERF_QUERY_BUDGETS={'nursery:nursery_list': 1}, PERF_ENFORCE_BUDGETS=False)
+    def test_exceeding_budget_only_warns_when_not_enforced(self):
+        with self.assertLogs('nursery.perf', 'WARNING') as logs:
+            response = self.client.get(reverse('nursery:nursery_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('予算を超えました', logs.output[0])
+
+
+class TestRunnerTests(TestCase):
+    def test_budgets_are_enforced_under_test_runner(self):
+        self.assertTrue(settings.PERF_ENFORCE_BUDGETS)
+
+
+class LoadSnapshotsTests(TestCase):
+    def setUp(self):
+        self.directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(PERF_REPORT_DIR=str(self.directory), PERF_SNAPSHOT_MAX_AGE=3600))
+
+    def write_snapshot(self, pid, count, age=0):
+        path = self.directory / f'{pid}.json'
+        stats = {
+            'count': count, 'queries': count * 3, 'max_queries': 3, 'sql_ms': 1.0, 'template_ms': 1.0,
+            'total_ms': 10.0, 'response_bytes': 100, 'buckets': [count] + [0] * 10,
+        }
+        path.write_text(json.dumps({'nursery:nursery_list': stats}))
+        modified = time.time() - age
+        os.utime(path, (modified, modified))
+        return path
+
+    def test_merges_recent_snapshots(self):
+        self.write_snapshot(100, 2)
+        self.write_snapshot(101, 3)
+
+        stats = load_snapshots()['nursery:nursery_list']
+        self.assertEqual(stats['count'], 5)
+        self.assertEqual(stats['queries'], 15)
+        self.assertEqual(stats['max_queries'], 3)
+
+    def test_drops_snapshots_of_finished_processes(self):
+        self.write_snapshot(100, 2)
+        stale = self.write_snapshot(99, 50, age=2 * 3600)
+
+        self.assertEqual(load_snapshots()['nursery:nursery_list']['count'], 2)
+        self.assertFalse(stale.exists())
+
+    def test_nothing_is_written_without_report_dir(self):
+        with override_settings(PERF_REPORT_DIR=''):
+            registry.dump()
+            self.assertEqual(load_snapshots(), {})
+        self.assertEqual(list(self.directory.iterdir()), [])
@@ -0,0 +1,67 @@
+import random
+from datetime import date, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+
+from nursery.explain import assert_uses_index, hot_query_checks
+from nursery.models import Nursery, VisitImpression, VisitSchedule
+from nursery.search import build_search_bigrams
+
+NURSERIES = 3000
+
+
+class QueryPlanTests(TestCase):
+    """主要なクエリが想定したインデックスを使っているか（EXPLAIN）"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # 空の表では PostgreSQL がどのインデックスを選んでも同じ費用になるため、
+        # 確認対象の所有者（pk=1）にある程度のデータを入れて統計を取っておく
+        random.seed(0)
+        owners = [User.objects.create(pk=1, username='owner'), User.objects.create(pk=2, username='other')]
+        nurseries = []
+        for i in range(NURSERIES):
+            nursery = Nursery(
+                owner=owners[i % 10 == 0], facility_number=f'F{i:05d}', name=f'保育園{i:05d}',
+                nursery_type=random.choice(Nursery.NURSERY_TYPE_CHOICES)[0], address=f'東京都港区芝{i}',
+                phone_number='03-0000-0000',
+                latitude=round(random.uniform(35.5, 35.9), 6), longitude=round(random.uniform(139.5, 139.9), 6),
+                distance_from_home=random.uniform(0, 20), distance_stale=i % 50 == 0,
+                rating_avg=random.choice([None, 3.0, 4.0, 4.5]),
+            )
+            nursery.search_bigrams = build_search_bigrams(nursery)
+            nurseries.append(nursery)
+        nurseries = Nursery.objects.bulk_create(nurseries)
+
+        schedules = VisitSchedule.objects.bulk_create([
+            VisitSchedule(
+                owner_id=nursery.owner_id, nursery=nursery,
+                visit_date=date(2025, 1, 1) + timedelta(days=i % 365), visit_time=time(9 + i % 8),
+                status=random.choice(['予定', '完了', '完了', 'キャンセル']),
+            )
+            for i, nursery in enumerate(nurseries[:NURSERIES // 2])
+        ])
+        VisitImpression.objects.bulk_create([
+            VisitImpression(
+                owner_id=schedule.owner_id, nursery_id=schedule.nursery_id, visit_schedule=schedule,
+                overall_rating=random.randint(1, 5), application_intention=i % 5 == 0,
+            )
+            for i, schedule in enumerate(schedules) if schedule.status == '完了'
+        ])
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def test_hot_queries_use_expected_indexes(self):
+        checks = hot_query_checks()
+        self.assertTrue(checks)
+        for check in checks:
+            with self.subTest(check.label):
+                assert_uses_index(check.queryset, check.expected_index)
+
+    def test_missing_index_is_reported(self):
+        check = hot_query_checks()[0]
+        with self.assertRaisesMessage(AssertionError, 'no_such_idx'):
+            assert_uses_index(check.queryset, 'no_such_idx')
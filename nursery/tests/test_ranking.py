@@ -0,0 +1,136 @@
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from nursery.models import Nursery, VisitImpression
+from nursery.ranking import CRITERIA, WEIGHT_FIELDS, normalize, rank
+
+OVERALL = WEIGHT_FIELDS.index('overall')
+FEE = WEIGHT_FIELDS.index('monthly_fee')
+DISTANCE = WEIGHT_FIELDS.index('distance')
+
+
+def weights(**values):
+    return [values.get(name, 0) for name in WEIGHT_FIELDS]
+
+
+def raw_table(**columns):
+    """指定した項目の列だけ値を入れた特徴量の行列（他は値なし）"""
+    rows = len(next(iter(columns.values())))
+    raw = np.full((rows, len(CRITERIA)), np.nan)
+    for name, values in columns.items():
+        raw[:, WEIGHT_FIELDS.index(name)] = [np.nan if value is None else value for value in values]
+    return raw
+
+
+class NormalizeTests(TestCase):
+    def test_scales(self):
+        normalized, _ = normalize(raw_table(overall=[1, 3, 5], monthly_fee=[10000, 20000, 30000]))
+
+        np.testing.assert_allclose(normalized[:, OVERALL], [0.0, 0.5, 1.0])
+        # 費用は安いほど良い
+        np.testing.assert_allclose(normalized[:, FEE], [1.0, 0.5, 0.0])
+
+    def test_missing_values_are_filled_with_mean(self):
+        normalized, available = normalize(raw_table(overall=[5, None, 2], monthly_fee=[10000, None, 30000]))
+
+        np.testing.assert_allclose(normalized[:, OVERALL], [1.0, 0.625, 0.25])
+        np.testing.assert_allclose(normalized[:, FEE], [1.0, 0.5, 0.0])
+        self.assertTrue(available[OVERALL])
+
+    def test_column_without_values_is_unavailable(self):
+        normalized, available = normalize(raw_table(overall=[5, 3]))
+
+        self.assertFalse(available[DISTANCE])
+        self.assertFalse(np.isnan(normalized).any())
+
+    def test_all_equal_values_are_neutral(self):
+        normalized, _ = normalize(raw_table(monthly_fee=[20000, 20000, None]))
+
+        np.testing.assert_allclose(normalized[:, FEE], [1.0, 1.0, 1.0])
+
+    def test_empty_table(self):
+        normalized, available = normalize(np.empty((0, len(CRITERIA))))
+
+        self.assertEqual(normalized.shape, (0, len(CRITERIA)))
+        self.assertFalse(available.any())
+
+
+class RankTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner', password='p')
+        self.best = self.create_nursery('あおい保育園', rating_avg=5.0)
+        self.worst = self.create_nursery('さくら保育園', rating_avg=3.0)
+        self.unrated = self.create_nursery('ひまわり保育園')
+
+    def create_nursery(self, name, owner=None, **values):
+        return Nursery.objects.create(
+            owner=owner or self.user, facility_number=name, name=name, nursery_type='認可保育園',
+            address='東京都', phone_number='03-0000-0000', **values,
+        )
+
+    def scores(self, ranking):
+        return [(entry.name, round(entry.score, 1)) for entry in ranking.entries]
+
+    def test_unrated_nursery_gets_mean(self):
+        ranking = rank(self.user, weights(overall=1))
+
+        self.assertEqual(self.scores(ranking), [('あおい保育園', 100.0), ('ひまわり保育園', 75.0), ('さくら保育園', 50.0)])
+        self.assertEqual(ranking.total, 3)
+        self.assertEqual(ranking.entries[1].values[OVERALL][1], '-')
+
+    def test_criterion_without_values_has_no_weight(self):
+        # 自宅が未登録で距離はどの保育園にもない
+        self.assertEqual(
+            self.scores(rank(self.user, weights(overall=1, distance=5))),
+            self.scores(rank(self.user, weights(overall=1))),
+        )
+
+    def test_all_zero_weights(self):
+        ranking = rank(self.user, weights())
+
+        # 同点は登録の古い順
+        self.assertEqual([entry.id for entry in ranking.entries], [self.best.pk, self.worst.pk, self.unrated.pk])
+        self.assertEqual({entry.score for entry in ranking.entries}, {0.0})
+
+    def test_fee_from_impressions(self):
+        for nursery, fee in [(self.best, 60000), (self.worst, 30000)]:
+            VisitImpression.objects.create(
+                owner=self.user, nursery=nursery, overall_rating=3, facility_rating=3, staff_rating=3,
+                education_rating=3, access_rating=3, estimated_monthly_fee=fee,
+            )
+
+        ranking = rank(self.user, weights(monthly_fee=1))
+
+        self.assertEqual(self.scores(ranking), [('さくら保育園', 100.0), ('ひまわり保育園', 50.0), ('あおい保育園', 0.0)])
+        self.assertEqual(ranking.entries[0].values[FEE][1], '30,000円')
+
+    def test_other_users_nurseries_are_excluded(self):
+        self.create_nursery('他人の保育園', owner=User.objects.create_user('other'), rating_avg=5.0)
+
+        self.assertEqual(rank(self.user, weights(overall=1)).total, 3)
+
+    def test_limit(self):
+        ranking = rank(self.user, weights(overall=1), limit=2)
+
+        self.assertEqual([entry.rank for entry in ranking.entries], [1, 2])
+        self.assertEqual(ranking.total, 3)
+
+    def test_cache_keys(self):
+        rank(self.user, weights(overall=1))
+        # 特徴量も並び順もキャッシュから
+        with self.assertNumQueries(0):
+            rank(self.user, weights(overall=1))
+        # 重みが違えば並べ直すが、特徴量はキャッシュから
+        with self.assertNumQueries(0):
+            ranking = rank(self.user, weights(overall=1, facility=1))
+        self.assertEqual(ranking.weights['facility'], 1)
+
+        # 保育園を保存するとデータのバージョンが上がって作り直す
+        self.create_nursery('もみじ保育園', rating_avg=4.5)
+        with self.assertNumQueries(2):
+            ranking = rank(self.user, weights(overall=1))
+        self.assertEqual(ranking.total, 4)
+        self.assertEqual(ranking.entries[1].name, 'もみじ保育園')
@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from nursery.middleware import PRIMARY_COOKIE, ReplicaRoutingMiddleware
+from nursery.models import Nursery
+from nursery.routers import REPLICA, ReplicaRouter, read_from_replica, reset_replica
+
+
+def with_replica():
+    """レプリカを設定した状態にする（テストでは振り分けの判定だけを見る）"""
+    replica = {**settings.DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    return mock.patch.dict(settings.DATABASES, {REPLICA: replica})
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def test_reads_go_to_replica_only_while_enabled(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Nursery), 'default')
+
+        token = read_from_replica()
+        try:
+            self.assertEqual(router.db_for_read(Nursery), REPLICA)
+            # ログイン状態は常に default から
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_write(Nursery), 'default')
+        finally:
+            reset_replica(token)
+
+        self.assertEqual(router.db_for_read(Nursery), 'default')
+
+    def test_migrations_only_on_default(self):
+        router = ReplicaRouter()
+        self.assertTrue(router.allow_migrate('default', 'nursery'))
+        self.assertFalse(router.allow_migrate(REPLICA, 'nursery'))
+
+
+@override_settings(REPLICA_STICKY_SECONDS=15)
+class ReplicaStickinessTests(SimpleTestCase):
+    def setUp(self):
+        self.enterContext(with_replica())
+        self.factory = RequestFactory()
+
+    def run_request(self, method, url, cookies=None):
+        """ミドルウェアを通し、ビューの中で nursery のモデルがどちらから読まれるかを返す"""
+        request = getattr(self.factory, method)(url)
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = resolve(url)
+        seen = []
+
+        def view(request):
+            seen.append(ReplicaRouter().db_for_read(Nursery))
+            return HttpResponse()
+
+        def get_response(request):
+            # Django がビューを呼ぶ前に process_view を呼ぶのと同じ順
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        response = middleware(request)
+        return seen[0], response
+
+    def test_read_views_use_replica(self):
+        database, response = self.run_request('get', reverse('nursery:nursery_list'))
+
+        self.assertEqual(database, REPLICA)
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+        # リクエストが終われば元に戻る
+        self.assertEqual(ReplicaRouter().db_for_read(Nursery), 'default')
+
+    def test_other_views_use_default(self):
+        database, _ = self.run_request('get', reverse('nursery:schedule_conflicts'))
+
+        self.assertEqual(database, 'default')
+
+    def test_reads_stick_to_default_after_write(self):
+        database, response = self.run_request('post', reverse('nursery:nursery_create'))
+        self.assertEqual(database, 'default')
+        cookie = response.cookies[PRIMARY_COOKIE]
+        self.assertEqual(cookie['max-age'], 15)
+        self.assertTrue(cookie['httponly'])
+
+        database, _ = self.run_request('get', reverse('nursery:nursery_list'), {PRIMARY_COOKIE: cookie.value})
+        self.assertEqual(database, 'default')
+
+    def test_no_cookie_without_replica(self):
+        with mock.patch.dict(settings.DATABASES):
+            del settings.DATABASES[REPLICA]
+            database, response = self.run_request('post', reverse('nursery:nursery_create'))
+
+        self.assertEqual(database, 'default')
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+
+class ReplicaStickinessClientTests(TestCase):
+    def test_write_sets_sticky_cookie(self):
+        user = User.objects.create_user('owner', password='p')
+        self.client.force_login(user)
+
+        with with_replica():
+            response = self.client.post(reverse('nursery:nursery_create'), {})
+
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        self.assertIn(PRIMARY_COOKIE, self.client.cookies)
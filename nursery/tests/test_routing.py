@@ -0,0 +1,133 @@
+import datetime
+import itertools
+import random
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+
+from nursery.models import HomeLocation, Nursery, VisitSchedule
+from nursery.routing import (
+    DAY_END, DAY_START, EXACT_MAX_STOPS, VISIT_MINUTES, Stop, _Solver, plan_day, plan_route, travel_matrix,
+)
+
+HOME = (35.681236, 139.767125)
+
+
+def random_stops(rng, count, fixed=0):
+    """東京駅から数km以内の見学先（先頭の fixed 件は見学時刻が決まっている）"""
+    stops = []
+    for i in range(count):
+        lat = HOME[0] + rng.uniform(-0.03, 0.03)
+        lng = HOME[1] + rng.uniform(-0.03, 0.03)
+        if i < fixed:
+            start = rng.randrange(9 * 60, 16 * 60, 15)
+            stops.append(Stop(lat, lng, start, start))
+        else:
+            stops.append(Stop(lat, lng, DAY_START, DAY_END - VISIT_MINUTES))
+    return stops
+
+
+def brute_force(stops, home):
+    """全順序の中で最も良い (遅刻の合計, 移動時間の合計)"""
+    solver = _Solver(stops, travel_matrix(stops, home), VISIT_MINUTES)
+    return min(solver.cost(list(order)) for order in itertools.permutations(range(1, len(stops) + 1)))
+
+
+class PlanRouteTests(SimpleTestCase):
+    def test_exact_solver_matches_brute_force(self):
+        rng = random.Random(20261018)
+        for count in range(1, EXACT_MAX_STOPS + 1):
+            for fixed in sorted({0, count // 2, count}):
+                for home in [HOME, None]:
+                    stops = random_stops(rng, count, fixed)
+                    with self.subTest(count=count, fixed=fixed, home=home is not None):
+                        plan = plan_route(stops, home)
+                        self.assertTrue(plan.exact)
+                        self.assertEqual((plan.late_minutes, plan.travel_minutes), brute_force(stops, home))
+                        self.assertCountEqual([planned.stop for planned in plan.stops], stops)
+
+    def test_heuristic_for_many_stops_visits_each_once(self):
+        stops = random_stops(random.Random(1), EXACT_MAX_STOPS + 5, fixed=3)
+
+        plan = plan_route(stops, HOME)
+
+        self.assertFalse(plan.exact)
+        self.assertCountEqual([planned.stop for planned in plan.stops], stops)
+        self.assertEqual(plan.travel_minutes, sum(planned.travel_minutes for planned in plan.stops) + plan.return_minutes)
+
+    def test_fixed_visit_times_are_kept(self):
+        # 見学時刻の順は距離より優先し、早く着いたら待つ
+        afternoon = Stop(HOME[0] + 0.001, HOME[1], 14 * 60, 14 * 60)
+        morning = Stop(HOME[0] + 0.02, HOME[1] + 0.02, 10 * 60, 10 * 60)
+        flexible = Stop(HOME[0] + 0.002, HOME[1], DAY_START, DAY_END - VISIT_MINUTES)
+
+        plan = plan_route([afternoon, morning, flexible], HOME)
+
+        self.assertEqual(plan.late_minutes, 0)
+        self.assertEqual([planned.stop for planned in plan.stops][0], morning)
+        planned = {id(planned.stop): planned for planned in plan.stops}
+        self.assertEqual(planned[id(morning)].start_time, datetime.time(10))
+        self.assertEqual(planned[id(afternoon)].start_time, datetime.time(14))
+        # 前の見学から早く着いた分は待つ
+        self.assertGreater(planned[id(afternoon)].wait_minutes, 0)
+
+    def test_lateness_is_reported(self):
+        first = Stop(HOME[0], HOME[1], 10 * 60, 10 * 60)
+        # 10:00 からの見学が終わる 11:00 には始められない
+        second = Stop(HOME[0] + 0.02, HOME[1], 10 * 60 + 30, 10 * 60 + 30)
+
+        plan = plan_route([first, second], HOME)
+
+        travel = travel_matrix([first, second], HOME)[1][2]
+        expected = 10 * 60 + VISIT_MINUTES + travel - (10 * 60 + 30)
+        self.assertEqual([planned.stop for planned in plan.stops], [first, second])
+        self.assertEqual(plan.stops[1].late_minutes, expected)
+        self.assertEqual(plan.late_minutes, expected)
+        self.assertEqual(plan.stops[1].arrival_time, plan.stops[1].start_time)
+
+    def test_empty(self):
+        plan = plan_route([], HOME)
+
+        self.assertEqual(plan.stops, [])
+        self.assertIsNone(plan.departure_time)
+        self.assertIsNone(plan.google_maps_url)
+
+
+class PlanDayTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='p')
+        self.day = datetime.date(2026, 11, 2)
+
+    def create_visit(self, name, visit_time=None, status='予定', **location):
+        nursery = Nursery.objects.create(
+            owner=self.user, facility_number=name, name=name, nursery_type='認可保育園',
+            address='東京都', phone_number='03-0000-0000', **location,
+        )
+        return VisitSchedule.objects.create(
+            owner=self.user, nursery=nursery, visit_date=self.day, visit_time=visit_time, status=status,
+        )
+
+    def test_visits_without_coordinates_are_unplaced(self):
+        HomeLocation.objects.create(user=self.user, address='東京都', latitude=Decimal('35.681236'), longitude=Decimal('139.767125'))
+        located = self.create_visit('北保育園', datetime.time(10), latitude=Decimal('35.70'), longitude=Decimal('139.77'))
+        unlocated = self.create_visit('位置なし保育園', datetime.time(13))
+        self.create_visit('キャンセル保育園', datetime.time(11), status='キャンセル',
+                          latitude=Decimal('35.69'), longitude=Decimal('139.76'))
+
+        plan = plan_day(self.user, self.day)
+
+        self.assertEqual([planned.schedule for planned in plan.stops], [located])
+        self.assertEqual(plan.unplaced, [unlocated])
+        self.assertEqual(plan.home, HOME)
+        self.assertIn('origin=35.681236%2C139.767125', plan.google_maps_url)
+
+    def test_flexible_visit_uses_opening_hours(self):
+        schedule = self.create_visit(
+            '南保育園', latitude=Decimal('35.67'), longitude=Decimal('139.77'),
+            opening_time=datetime.time(7, 30), closing_time=datetime.time(12),
+        )
+
+        stop = Stop.from_schedule(schedule)
+
+        self.assertEqual((stop.earliest, stop.latest), (7 * 60 + 30, 12 * 60 - VISIT_MINUTES))
@@ -0,0 +1,56 @@
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+
+from nursery.models import Nursery
+from nursery.search import build_search_bigrams, search_nurseries
+
+
+class SearchNurseriesTests(TestCase):
+    """PostgreSQL ではバイグラムのインデックス、それ以外では部分一致の経路を通る"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='p')
+
+    def create_nursery(self, number, name, address='東京都港区芝1-1-1'):
+        nursery = Nursery(
+            owner=self.user, facility_number=number, name=name,
+            nursery_type='認可保育園', address=address, phone_number='03-0000-0000',
+        )
+        nursery.search_bigrams = build_search_bigrams(nursery)
+        nursery.save()
+        return nursery
+
+    def search(self, query):
+        return list(search_nurseries(Nursery.objects.filter(owner=self.user), query).values_list('name', flat=True))
+
+    def test_orders_name_prefix_before_address(self):
+        self.create_nursery('1', 'みなと保育園', address='東京都港区ひまわり町1')
+        self.create_nursery('2', 'ひまわり保育園')
+        self.create_nursery('3', 'さくら保育園')
+
+        self.assertEqual(self.search('ひまわり'), ['ひまわり保育園', 'みなと保育園'])
+
+    def test_bigrams_from_different_fields_do_not_match(self):
+        # 「あい」は名前、「いう」は住所にあるが、「あいう」はどこにも含まれない
+        self.create_nursery('1', 'あい保育園', address='東京都いう町1')
+        self.create_nursery('2', 'あいう保育園')
+
+        self.assertEqual(self.search('あいう'), ['あいう保育園'])
+
+    def test_bigrams_that_are_not_contiguous_do_not_match(self):
+        self.create_nursery('F0099', 'さくら保育園', address='東京都港区芝12')
+        self.create_nursery('F0012', 'すみれ保育園')
+
+        self.assertEqual(self.search('F0012'), ['すみれ保育園'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'バイグラムのインデックスを使うのは PostgreSQL のみ')
+    def test_query_is_normalized_like_bigrams(self):
+        self.create_nursery('F0012', 'ひまわり保育園')
+        self.create_nursery('2', 'ＡＢＣ保育園')
+
+        self.assertEqual(self.search('ひまわり 保育園'), ['ひまわり保育園'])
+        self.assertEqual(self.search('ｆ００１２'), ['ひまわり保育園'])
+        self.assertEqual(self.search('abc'), ['ＡＢＣ保育園'])
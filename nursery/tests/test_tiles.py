@@ -0,0 +1,143 @@
+import json
+import math
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from nursery.models import Nursery
+from nursery.tiles import CLUSTER_MAX_ZOOM, GRID_SIZE, InvalidTile, build_tile, get_tile, tile_bounds
+
+
+def tile_of(lat, lng, z):
+    """緯度経度を含むタイルの (x, y)"""
+    n = 2 ** z
+    y = (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n
+    return int((lng + 180) / 360 * n), int(y)
+
+
+# 東京駅を含むタイル
+Z = 10
+X, Y = tile_of(35.681236, 139.767125, Z)
+
+
+class TileBoundsTests(TestCase):
+    def test_world_tile(self):
+        min_lat, max_lat, min_lng, max_lng = tile_bounds(0, 0, 0)
+        self.assertAlmostEqual(min_lat, -85.051129, places=5)
+        self.assertAlmostEqual(max_lat, 85.051129, places=5)
+        self.assertEqual((min_lng, max_lng), (-180.0, 180.0))
+
+    def test_quadrant(self):
+        min_lat, max_lat, min_lng, max_lng = tile_bounds(1, 1, 1)
+        self.assertAlmostEqual(min_lat, -85.051129, places=5)
+        self.assertAlmostEqual(max_lat, 0.0)
+        self.assertEqual((min_lng, max_lng), (0.0, 180.0))
+
+    def test_tokyo_tile_contains_tokyo_station(self):
+        min_lat, max_lat, min_lng, max_lng = tile_bounds(Z, X, Y)
+        self.assertTrue(min_lat <= 35.681236 < max_lat)
+        self.assertTrue(min_lng <= 139.767125 < max_lng)
+
+    def test_invalid_tiles(self):
+        for z, x, y in [(-1, 0, 0), (20, 0, 0), (1, 2, 0), (1, 0, 2), (2, -1, 0)]:
+            with self.subTest(tile=(z, x, y)), self.assertRaises(InvalidTile):
+                tile_bounds(z, x, y)
+
+
+class TileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner', password='p')
+        self.min_lat, self.max_lat, self.min_lng, self.max_lng = tile_bounds(Z, X, Y)
+
+    def cell_position(self, row, column, offset=0.5):
+        """タイルのマス目（row, column）の中の位置"""
+        lat = self.min_lat + (row + offset) * (self.max_lat - self.min_lat) / GRID_SIZE
+        lng = self.min_lng + (column + offset) * (self.max_lng - self.min_lng) / GRID_SIZE
+        return Decimal(f'{lat:.6f}'), Decimal(f'{lng:.6f}')
+
+    def create_nursery(self, name, position, owner=None):
+        latitude, longitude = position
+        return Nursery.objects.create(
+            owner=owner or self.user, facility_number=name, name=name, nursery_type='認可保育園',
+            address='東京都', phone_number='03-0000-0000', latitude=latitude, longitude=longitude,
+        )
+
+    def test_nearby_nurseries_are_clustered(self):
+        for i, offset in enumerate([0.3, 0.5, 0.7]):
+            self.create_nursery(f'まとめ{i}', self.cell_position(2, 3, offset))
+        single = self.create_nursery('ひとつ', self.cell_position(6, 1))
+
+        features = build_tile(self.user, Z, X, Y)['features']
+
+        self.assertEqual(len(features), 2)
+        cluster = next(f for f in features if f['properties'].get('cluster'))
+        self.assertEqual(cluster['properties']['count'], 3)
+        lat, lng = self.cell_position(2, 3)
+        self.assertAlmostEqual(cluster['geometry']['coordinates'][1], float(lat), places=5)
+        self.assertAlmostEqual(cluster['geometry']['coordinates'][0], float(lng), places=5)
+        point = next(f for f in features if not f['properties'].get('cluster'))
+        self.assertEqual(point['properties'], {'id': single.pk, 'name': 'ひとつ', 'type': '認可保育園'})
+
+    def test_zoomed_in_tiles_return_each_nursery(self):
+        # ズームを上げたときの、東京駅を含むタイル
+        z = CLUSTER_MAX_ZOOM + 1
+        x, y = tile_of(35.681236, 139.767125, z)
+        min_lat, max_lat, min_lng, max_lng = tile_bounds(z, x, y)
+        for i, fraction in enumerate([0.4, 0.5, 0.6]):
+            position = (
+                Decimal(f'{min_lat + (max_lat - min_lat) * fraction:.6f}'),
+                Decimal(f'{min_lng + (max_lng - min_lng) * fraction:.6f}'),
+            )
+            self.create_nursery(f'保育園{i}', position)
+
+        features = build_tile(self.user, z, x, y)['features']
+
+        self.assertEqual(sorted(f['properties']['name'] for f in features), ['保育園0', '保育園1', '保育園2'])
+        # 同じ保育園も、まとめるズームでは1つの点になる
+        self.assertEqual(
+            [f['properties'] for f in build_tile(self.user, Z, X, Y)['features']], [{'cluster': True, 'count': 3}],
+        )
+
+    def test_boundary_belongs_to_one_tile(self):
+        # 境界上の保育園は隣のタイルと重複しない（上限は含めない）
+        self.create_nursery('境界', (Decimal('10.000000'), Decimal('0.000000')))
+
+        west = build_tile(self.user, 1, 0, 0)['features']
+        east = build_tile(self.user, 1, 1, 0)['features']
+
+        self.assertEqual((len(west), len(east)), (0, 1))
+
+    def test_other_users_and_unlocated_nurseries_are_excluded(self):
+        self.create_nursery('自分', self.cell_position(1, 1))
+        self.create_nursery('他人', self.cell_position(1, 1), owner=User.objects.create_user('other'))
+        Nursery.objects.create(
+            owner=self.user, facility_number='x', name='位置なし', nursery_type='認可保育園',
+            address='東京都', phone_number='03-0000-0000',
+        )
+
+        features = build_tile(self.user, Z, X, Y)['features']
+
+        self.assertEqual([f['properties']['name'] for f in features], ['自分'])
+
+    def test_cached_tile_is_rebuilt_after_save(self):
+        self.create_nursery('保育園1', self.cell_position(1, 1))
+        get_tile(self.user, Z, X, Y)
+        with self.assertNumQueries(0):
+            get_tile(self.user, Z, X, Y)
+
+        self.create_nursery('保育園2', self.cell_position(5, 5))
+
+        self.assertEqual(len(json.loads(get_tile(self.user, Z, X, Y))['features']), 2)
+
+    def test_view_returns_geojson_and_404_for_invalid_tile(self):
+        self.client.force_login(self.user)
+        self.create_nursery('保育園1', self.cell_position(1, 1))
+
+        response = self.client.get(reverse('nursery:map_tile', args=[Z, X, Y]))
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        self.assertEqual(len(response.json()['features']), 1)
+        self.assertEqual(self.client.get(reverse('nursery:map_tile', args=[1, 5, 0])).status_code, 404)
@@ -0,0 +1,109 @@
+import io
+import struct
+import tempfile
+import zlib
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from nursery.forms import VisitImpressionForm
+from nursery.models import Nursery, PhotoUpload, VisitImpression
+from nursery.uploads import append_chunk, create_upload, temp_path
+
+
+def jpeg_bytes(size=(64, 48)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def png_header(width, height):
+    """縦横だけを大きく申告した PNG（画素データは持たない）"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IDAT', zlib.compress(b'\x00')) + chunk(b'IEND', b'')
+
+
+class PhotoUploadTests(TestCase):
+    def setUp(self):
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        upload_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root, PHOTO_UPLOAD_TEMP_DIR=upload_dir))
+        self.media_root = Path(media_root)
+        self.user = User.objects.create_user('owner', password='p')
+        self.client.force_login(self.user)
+        self.nursery = Nursery.objects.create(
+            owner=self.user, facility_number='1', name='ひまわり保育園', nursery_type='認可保育園',
+            address='東京都', phone_number='03-0000-0000',
+        )
+
+    def completed_upload(self, data):
+        upload = create_upload(self.user, 'photo.jpg', len(data))
+        return append_chunk(upload, io.BytesIO(data), 0, len(data) - 1, len(data))
+
+    def put(self, upload, data):
+        return self.client.generic(
+            'PUT', reverse('nursery:photo_upload_chunk', args=[upload.pk]), data,
+            content_type='application/octet-stream', HTTP_CONTENT_RANGE=f'bytes 0-{len(data) - 1}/{len(data)}',
+        )
+
+    def impression_form(self, upload):
+        return VisitImpressionForm(
+            {'nursery': self.nursery.pk, 'overall_rating': 4, 'good_points': '園庭が広い', 'photo1_upload': str(upload.pk)},
+            user=self.user,
+        )
+
+    def test_decompression_bomb_is_rejected(self):
+        data = png_header(20000, 20000)
+        upload = create_upload(self.user, 'bomb.png', len(data))
+
+        response = self.put(upload, data)
+
+        self.assertEqual(response.status_code, 413)
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, '失敗')
+        self.assertFalse(temp_path(upload).exists())
+
+    def test_completed_upload_is_attached_and_removed(self):
+        data = jpeg_bytes()
+        upload = self.completed_upload(data)
+        form = self.impression_form(upload)
+        self.assertTrue(form.is_valid(), form.errors)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            impression = form.save()
+
+        self.assertEqual(Path(impression.photo1.path).read_bytes(), data)
+        self.assertFalse(PhotoUpload.objects.filter(pk=upload.pk).exists())
+        self.assertFalse(temp_path(upload).exists())
+
+    def test_upload_survives_failed_impression_save(self):
+        data = jpeg_bytes()
+        upload = self.completed_upload(data)
+        form = self.impression_form(upload)
+        self.assertTrue(form.is_valid(), form.errors)
+
+        with mock.patch.object(VisitImpression, 'save', side_effect=DatabaseError('保存できません')):
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(DatabaseError):
+                    form.save()
+
+        # アップロードと一時ファイルは残り、保存先に写真は残らない
+        self.assertTrue(PhotoUpload.objects.filter(pk=upload.pk, status='完了').exists())
+        self.assertEqual(temp_path(upload).read_bytes(), data)
+        self.assertEqual([path for path in self.media_root.rglob('*') if path.is_file()], [])
+
+        # 同じアップロードIDで再送信できる
+        retry = self.impression_form(upload)
+        self.assertTrue(retry.is_valid(), retry.errors)
+        with self.captureOnCommitCallbacks(execute=True):
+            impression = retry.save()
+        self.assertEqual(Path(impression.photo1.path).read_bytes(), data)
+        self.assertFalse(PhotoUpload.objects.filter(pk=upload.pk).exists())
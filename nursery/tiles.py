@@ -0,0 +1,159 @@
+"""
+地図に表示する保育園の GeoJSON タイル
+
+地図はウェブメルカトルの XYZ タイル（z/x/y）単位で表示中の範囲だけを読み込む。
+タイルの範囲で緯度経度のインデックスを使って絞り込み、返すのは
+id・名前・施設タイプ・緯度経度だけ。
+
+ズームが CLUSTER_MAX_ZOOM 以下のときは、タイルを GRID_SIZE × GRID_SIZE のマス目に分け、
+同じマスの保育園を1つの点（件数と平均位置）にまとめる。まとめる処理は
+GROUP BY で DB 側で行うので、件数が多くてもマスの数の行しか読まない。
+1件だけのマスはまとめずにその保育園として返す。
+
+応答はユーザー・タイルごとにキャッシュし、キーにはホーム画面と同じデータのバージョンを含める
+（保育園の登録・更新・削除や位置情報の取得で作り直される）。
+"""
+import json
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, FloatField, Min
+from django.db.models.functions import Cast, Floor
+
+from .caching import data_version
+from .models import Nursery
+
+# これ以下のズームでは近くの保育園をまとめる
+CLUSTER_MAX_ZOOM = 13
+# まとめるときのタイル1辺あたりのマス目の数（256px のタイルなら 32px 四方）
+GRID_SIZE = 8
+MAX_ZOOM = 19
+# 1タイルで返す保育園の上限（まとめないズームで、同じ建物に大量に登録されている場合の保険）
+MAX_POINTS = 1000
+# 自宅の位置が未登録のときの地図の中心（東京駅）
+DEFAULT_CENTER = (35.681236, 139.767125)
+
+
+class InvalidTile(Exception):
+    """タイル座標が範囲外"""
+
+
+def tile_bounds(z, x, y):
+    """タイルの範囲 (最小緯度, 最大緯度, 最小経度, 最大経度)"""
+    if not 0 <= z <= MAX_ZOOM:
+        raise InvalidTile((z, x, y))
+    n = 2 ** z
+    if not (0 <= x < n and 0 <= y < n):
+        raise InvalidTile((z, x, y))
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y + 1), lat(y), x / n * 360.0 - 180.0, (x + 1) / n * 360.0 - 180.0
+
+
+def _in_tile(queryset, bounds):
+    # 隣のタイルと重複しないよう、上限は含めない
+    min_lat, max_lat, min_lng, max_lng = bounds
+    return queryset.filter(
+        latitude__gte=min_lat, latitude__lt=max_lat,
+        longitude__gte=min_lng, longitude__lt=max_lng,
+    )
+
+
+def _point(lat, lng, properties):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [round(float(lng), 6), round(float(lat), 6)]},
+        'properties': properties,
+    }
+
+
+def _nursery_feature(row):
+    return _point(row['latitude'], row['longitude'], {
+        'id': row['id'],
+        'name': row['name'],
+        'type': row['nursery_type'],
+    })
+
+
+def cluster_queryset(queryset, bounds):
+    """タイルをマス目に分け、マスごとの件数・平均位置を集計するクエリセット"""
+    min_lat, max_lat, min_lng, max_lng = bounds
+    lat_scale = GRID_SIZE / (max_lat - min_lat)
+    lng_scale = GRID_SIZE / (max_lng - min_lng)
+    return (
+        _in_tile(queryset, bounds)
+        .order_by()
+        .annotate(
+            cell_y=Floor((Cast('latitude', FloatField()) - min_lat) * lat_scale),
+            cell_x=Floor((Cast('longitude', FloatField()) - min_lng) * lng_scale),
+        )
+        .values('cell_y', 'cell_x')
+        .annotate(
+            count=Count('pk'),
+            lat=Avg(Cast('latitude', FloatField())),
+            lng=Avg(Cast('longitude', FloatField())),
+            # 1件だけのマスでは、これらがその保育園の値になる
+            id=Min('pk'),
+            name=Min('name'),
+            nursery_type=Min('nursery_type'),
+        )
+        .order_by('cell_y', 'cell_x')
+    )
+
+
+def points_queryset(queryset, bounds):
+    """タイル内の保育園（まとめない）"""
+    return (
+        _in_tile(queryset, bounds)
+        .order_by('latitude', 'longitude', 'id')
+        .values('id', 'name', 'nursery_type', 'latitude', 'longitude')[:MAX_POINTS]
+    )
+
+
+def clustered_features(queryset, bounds):
+    """マス目ごとにまとめた点（1件だけのマスはその保育園）"""
+    features = []
+    for row in cluster_queryset(queryset, bounds):
+        if row['count'] == 1:
+            features.append(_point(row['lat'], row['lng'], {
+                'id': row['id'],
+                'name': row['name'],
+                'type': row['nursery_type'],
+            }))
+        else:
+            features.append(_point(row['lat'], row['lng'], {'cluster': True, 'count': row['count']}))
+    return features
+
+
+def nursery_features(queryset, bounds):
+    """タイル内の保育園"""
+    return [_nursery_feature(row) for row in points_queryset(queryset, bounds)]
+
+
+def build_tile(user, z, x, y):
+    """タイルの GeoJSON（FeatureCollection）"""
+    bounds = tile_bounds(z, x, y)
+    queryset = Nursery.objects.filter(owner=user)
+    if z <= CLUSTER_MAX_ZOOM:
+        features = clustered_features(queryset, bounds)
+    else:
+        features = nursery_features(queryset, bounds)
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def tile_cache_key(user, z, x, y):
+    return f'hoikunavi:map_tile:{user.pk}:{data_version(user.pk)}:{z}/{x}/{y}'
+
+
+def get_tile(user, z, x, y):
+    """タイルの GeoJSON（シリアライズ済みのバイト列）。キャッシュにあればそれを返す"""
+    key = tile_cache_key(user, z, x, y)
+    body = cache.get(key)
+    if body is None:
+        data = build_tile(user, z, x, y)
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+        cache.set(key, body, settings.MAP_TILE_CACHE_TIMEOUT)
+    return body
@@ -0,0 +1,240 @@
+"""
+見学感想の写真の分割アップロード
+
+大きな写真を1回のPOSTで送ると、転送が終わるまでワーカーが占有され、
+モバイル回線では途中で失敗しやすい。そこで写真は次の手順で先に送っておき、
+フォームにはアップロードIDだけを載せる。
+
+1. ``POST /uploads/photos/`` にファイル名とサイズを送り、アップロードIDを受け取る
+2. ``PUT /uploads/photos/<ID>/`` に ``Content-Range: bytes 開始-終了/全体`` を付けて
+   分割したデータを順に送る。途中で切れたら ``GET`` で受信済みの位置を調べて再開する
+3. 全体を受け取ると画像として検証し、フォーム送信時に見学感想へ付ける
+
+データは少しずつ一時ファイルに書き込むので、写真の大きさにかかわらずメモリ使用量は一定。
+サイズは受信のたびに、縦横のピクセル数は画像のヘッダを受け取った時点で検証する。
+"""
+import logging
+import os
+import re
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .models import PhotoUpload
+
+READ_SIZE = 64 * 1024
+# これだけ受け取っても画像形式を判別できなければ画像ではないとみなす
+SNIFF_BYTES = 64 * 1024
+ALLOWED_FORMATS = {'JPEG', 'MPO', 'PNG', 'WEBP', 'GIF'}
+
+logger = logging.getLogger(__name__)
+
+_CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(Exception):
+    """アップロードを受け付けられない（status は返すHTTPステータス）"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def temp_path(upload):
+    return Path(settings.PHOTO_UPLOAD_TEMP_DIR) / f'{upload.pk}.part'
+
+
+def check_size(size):
+    if size > settings.PHOTO_UPLOAD_MAX_BYTES:
+        limit = settings.PHOTO_UPLOAD_MAX_BYTES // (1024 * 1024)
+        raise UploadError(f'写真のサイズは{limit}MBまでです', status=413)
+
+
+def check_dimensions(width, height):
+    if width * height > settings.PHOTO_UPLOAD_MAX_PIXELS:
+        raise UploadError(f'写真の画素数が大きすぎます（{width}×{height}）')
+
+
+def validate_photo(uploaded_file):
+    """フォームから直接送られた写真の検証（分割アップロードを使わない場合）"""
+    try:
+        check_size(uploaded_file.size)
+        image = getattr(uploaded_file, 'image', None)
+        if image is not None:
+            check_dimensions(*image.size)
+    except UploadError as e:
+        raise ValidationError(str(e))
+
+
+def parse_content_range(header):
+    """'bytes 開始-終了/全体' を (開始, 終了, 全体) に変換"""
+    match = _CONTENT_RANGE.match(header or '')
+    if not match:
+        raise UploadError('Content-Range ヘッダが不正です')
+    start, end, total = (int(value) for value in match.groups())
+    if end < start or end >= total:
+        raise UploadError('Content-Range ヘッダが不正です')
+    return start, end, total
+
+
+def create_upload(user, filename, total_size):
+    check_size(total_size)
+    if total_size <= 0:
+        raise UploadError('空のファイルはアップロードできません')
+    upload = PhotoUpload.objects.create(
+        user=user,
+        filename=os.path.basename(filename)[:255] or 'photo',
+        total_size=total_size,
+    )
+    path = temp_path(upload)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return upload
+
+
+def _sniff_dimensions(upload, path):
+    """受信済みの部分から画像のヘッダを読めれば縦横を記録する"""
+    try:
+        with Image.open(path) as image:
+            if image.format not in ALLOWED_FORMATS:
+                raise UploadError(f'対応していない画像形式です（{image.format}）', status=415)
+            width, height = image.size
+    except Image.DecompressionBombError:
+        # ヘッダの縦横が Pillow の上限の2倍を超えている（OSError ではないので別に扱う）
+        raise UploadError('写真の画素数が大きすぎます', status=413)
+    except UnidentifiedImageError:
+        if upload.received >= min(SNIFF_BYTES, upload.total_size):
+            raise UploadError('画像ファイルではありません', status=415)
+        return
+    except (OSError, SyntaxError, ValueError):
+        # ヘッダの途中までしか届いていない
+        return
+    check_dimensions(width, height)
+    upload.width, upload.height = width, height
+
+
+def _verify(path):
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except Exception:
+        raise UploadError('画像ファイルが壊れています', status=422)
+
+
+def append_chunk(upload, stream, start, end, total):
+    """
+    stream から受け取ったデータを一時ファイルの start の位置に書き込み、受信済みサイズを更新する
+
+    接続が途中で切れた場合も、届いた分までは受信済みとして扱う。
+    """
+    if upload.status != '受信中':
+        raise UploadError('このアップロードは終了しています', status=409)
+    if total != upload.total_size:
+        raise UploadError('ファイルサイズが最初の申告と異なります')
+    if start != upload.received:
+        raise UploadError('受信済みの位置と一致しません', status=409)
+    length = end - start + 1
+    if length > settings.PHOTO_UPLOAD_CHUNK_SIZE:
+        raise UploadError('分割サイズが大きすぎます', status=413)
+
+    path = temp_path(upload)
+    written = 0
+    try:
+        with open(path, 'r+b') as fp:
+            fp.seek(start)
+            while written < length:
+                data = stream.read(min(READ_SIZE, length - written))
+                if not data:
+                    break
+                fp.write(data)
+                written += len(data)
+            # 前回途中で切れたときの余分なデータを捨てる
+            fp.truncate()
+    except FileNotFoundError:
+        raise UploadError('アップロードの有効期限が切れました', status=410)
+
+    # 同時に同じ位置を書き込んだリクエストがあれば後から来た方を失敗させる
+    updated = PhotoUpload.objects.filter(pk=upload.pk, received=start).update(
+        received=start + written, updated_at=timezone.now()
+    )
+    if not updated:
+        raise UploadError('受信済みの位置と一致しません', status=409)
+    upload.received = start + written
+
+    try:
+        if upload.width is None:
+            _sniff_dimensions(upload, path)
+        if upload.received == upload.total_size:
+            if upload.width is None:
+                raise UploadError('画像ファイルではありません', status=415)
+            _verify(path)
+            upload.status = '完了'
+    except UploadError as e:
+        fail(upload, str(e))
+        raise
+    upload.save(update_fields=['width', 'height', 'status', 'updated_at'])
+    return upload
+
+
+def fail(upload, message):
+    upload.status = '失敗'
+    upload.error = message[:255]
+    upload.save(update_fields=['status', 'error', 'updated_at'])
+    temp_path(upload).unlink(missing_ok=True)
+
+
+class _AssembledFile(File):
+    # FileSystemStorage は temporary_file_path() があればコピーせずに移動する
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def attach(upload, impression, field):
+    """
+    完了したアップロードを見学感想の写真として保存する
+
+    impression.save() と、保存できた後の finish() は呼び出し側で行う。
+    保存できなかった場合は detach() で一時ファイルに戻す。
+    """
+    with open(temp_path(upload), 'rb') as fp:
+        getattr(impression, field).save(upload.filename, _AssembledFile(fp), save=False)
+
+
+def detach(upload, impression, field):
+    """attach() を取り消し、同じアップロードIDでもう一度送信できるようにする"""
+    photo = getattr(impression, field)
+    path = temp_path(upload)
+    try:
+        if path.exists():
+            # ストレージにはコピーされている
+            photo.storage.delete(photo.name)
+        else:
+            # 一時ファイルから移動されている
+            file_move_safe(photo.path, str(path))
+    except (NotImplementedError, OSError) as e:
+        logger.warning('写真のアップロード %s を元に戻せませんでした: %s', upload.pk, e)
+    setattr(impression, field, None)
+
+
+def finish(upload):
+    """見学感想を保存できたアップロードを片付ける"""
+    temp_path(upload).unlink(missing_ok=True)
+    upload.delete()
+
+
+def purge_stale(hours=None):
+    """完了しないまま放置されたアップロードと、その一時ファイルを削除"""
+    hours = settings.PHOTO_UPLOAD_EXPIRE_HOURS if hours is None else hours
+    stale = PhotoUpload.objects.filter(updated_at__lt=timezone.now() - timedelta(hours=hours))
+    count = 0
+    for upload in stale.iterator():
+        temp_path(upload).unlink(missing_ok=True)
+        count += 1
+    stale.delete()
+    return count
@@ -1,6 +1,7 @@
 from django.urls import path
 from . import views
 from . import auth_views
+from . import api
 
 app_name = 'nursery'
 
@@ -17,6 +18,7 @@ urlpatterns = [
     path('nursery/<int:pk>/', views.NurseryDetailView.as_view(), name='nursery_detail'),
     path('nursery/new/', views.NurseryCreateView.as_view(), name='nursery_create'),
     path('nursery/<int:pk>/edit/', views.NurseryUpdateView.as_view(), name='nursery_update'),
+    path('nurseries/compare/', views.nursery_compare, name='nursery_compare'),
     
     # 見学スケジュール
     path('schedules/', views.VisitScheduleListView.as_view(), name='schedule_list'),
@@ -24,12 +26,36 @@ urlpatterns = [
     path('schedule/<int:pk>/edit/', views.VisitScheduleUpdateView.as_view(), name='schedule_update'),
     path('schedule/<int:pk>/calendar/', views.schedule_to_calendar, name='schedule_to_calendar'),
     path('schedule/<int:pk>/ics/', views.schedule_download_ics, name='schedule_download_ics'),
+    path('schedules/route/', views.route_plan, name='route_plan'),
+    path('schedules/conflicts/', views.schedule_conflicts, name='schedule_conflicts'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
     
     # 見学感想
     path('impressions/', views.VisitImpressionListView.as_view(), name='impression_list'),
     path('impression/new/', views.VisitImpressionCreateView.as_view(), name='impression_create'),
     path('impression/<int:pk>/edit/', views.VisitImpressionUpdateView.as_view(), name='impression_update'),
+    path('impression/<int:pk>/photos/<slug:field>/<slug:size>.<slug:fmt>',
+         views.impression_photo, name='impression_photo'),
+    path('impression/<int:pk>/photos/<slug:field>/<slug:digest>/<slug:size>.<slug:fmt>',
+         views.impression_photo, name='impression_photo'),
+    path('uploads/photos/', views.photo_upload_create, name='photo_upload_create'),
+    path('uploads/photos/<uuid:upload_id>/', views.photo_upload_chunk, name='photo_upload_chunk'),
+    
+    # ランキング
+    path('ranking/', views.ranking, name='ranking'),
     
     # マップ
     path('map/', views.map_view, name='map_view'),
+    path('map/tiles/<int:z>/<int:x>/<int:y>.geojson', views.map_tile, name='map_tile'),
+    
+    # JSON API
+    path('api/token/', api.token, name='api_token'),
+    path('api/<slug:resource>/', api.collection, name='api_collection'),
+    path('api/<slug:resource>/<int:pk>/', api.item, name='api_item'),
+    
+    # エクスポート
+    path('export/<slug:kind>/', views.export_data, name='export_data'),
+    
+    # 設定
+    path('settings/home/', views.home_location, name='home_location'),
 ]
\ No newline at end of file
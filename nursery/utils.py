@@ -1,6 +1,9 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
 from urllib.parse import quote
 
+from django.core import signing
+from django.utils import timezone
+
 
 def create_google_calendar_url(schedule):
     """
@@ -33,9 +36,9 @@ def create_google_calendar_url(schedule):
         details_parts.append(f"担当者: {schedule.contact_person}")
     
     if schedule.notes:
-        details_parts.append(f"\\nメモ: {schedule.notes}")
+        details_parts.append(f"\nメモ: {schedule.notes}")
     
-    details = "\\n".join(details_parts)
+    details = "\n".join(details_parts)
     
     # 場所
     location = schedule.nursery.address
@@ -58,52 +61,138 @@ def create_google_calendar_url(schedule):
     return f"{base_url}?{'&'.join(param_strings)}"
 
 
-def create_ics_content(schedule):
+# 見学時間を1時間と仮定
+VISIT_DURATION = timedelta(hours=1)
+ICS_PRODID = '-//HoikuNavi//見学スケジュール//JP'
+ICS_STATUS = {
+    '予定': 'CONFIRMED',
+    '完了': 'CONFIRMED',
+    'キャンセル': 'CANCELLED',
+}
+
+
+def ics_escape(text):
+    """RFC 5545 の TEXT 値のエスケープ（\\ ; , と改行）"""
+    text = str(text or '')
+    text = text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+    return text.replace('\r\n', '\n').replace('\r', '\n').replace('\n', '\\n')
+
+
+def ics_fold(line):
     """
-    見学スケジュールからICSファイルの内容を生成
+    1行75オクテットごとに折り返し、CRLF 付きで返す
+
+    UTF-8 の文字の途中では区切らない。継続行は空白1文字で始まる。
     """
-    from datetime import datetime
-    import uuid
-    
-    # イベントタイトル
-    summary = f"【保育園見学】{schedule.nursery.name}"
-    
-    # 日時の設定
+    parts = []
+    current = ''
+    size = 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > 75:
+            parts.append(current)
+            current = ' '
+            size = 1
+        current += char
+        size += width
+    parts.append(current)
+    return '\r\n'.join(parts) + '\r\n'
+
+
+def _ics_utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def schedule_uid(schedule):
+    """スケジュールごとに変わらないUID（カレンダーアプリが同じ予定として扱える）"""
+    return f'visit-schedule-{schedule.pk}@hoikunavi'
+
+
+def ics_event_lines(schedule):
+    """見学スケジュール1件分の VEVENT の行"""
+    nursery = schedule.nursery
     if schedule.visit_time:
-        start_datetime = datetime.combine(schedule.visit_date, schedule.visit_time)
-        end_datetime = start_datetime + timedelta(hours=1)
-        dtstart = start_datetime.strftime('%Y%m%dT%H%M%S')
-        dtend = end_datetime.strftime('%Y%m%dT%H%M%S')
+        # 日本時間の日時をUTCで書き出す
+        start = timezone.make_aware(datetime.combine(schedule.visit_date, schedule.visit_time))
+        dtstart = f'DTSTART:{_ics_utc(start)}'
+        dtend = f'DTEND:{_ics_utc(start + VISIT_DURATION)}'
     else:
         # 終日イベント
-        dtstart = schedule.visit_date.strftime('%Y%m%d')
-        dtend = (schedule.visit_date + timedelta(days=1)).strftime('%Y%m%d')
+        dtstart = f"DTSTART;VALUE=DATE:{schedule.visit_date.strftime('%Y%m%d')}"
+        dtend = f"DTEND;VALUE=DATE:{(schedule.visit_date + timedelta(days=1)).strftime('%Y%m%d')}"
     
-    # 説明
-    description = f"保育園名: {schedule.nursery.name}\\n"
-    description += f"施設タイプ: {schedule.nursery.nursery_type}\\n"
-    description += f"電話番号: {schedule.nursery.phone_number}\\n"
+    description = [
+        f'保育園名: {nursery.name}',
+        f'施設タイプ: {nursery.nursery_type}',
+        f'電話番号: {nursery.phone_number}',
+    ]
     if schedule.contact_person:
-        description += f"担当者: {schedule.contact_person}\\n"
+        description.append(f'担当者: {schedule.contact_person}')
     if schedule.notes:
-        description += f"\\nメモ: {schedule.notes}"
-    
-    # UIDの生成
-    uid = str(uuid.uuid4())
+        description.append(f'\nメモ: {schedule.notes}')
     
-    # ICSファイルの内容
-    ics_content = f"""BEGIN:VCALENDAR
-VERSION:2.0
-PRODID:-//HoikuNavi//見学スケジュール//JP
-BEGIN:VEVENT
-UID:{uid}
-DTSTAMP:{datetime.now().strftime('%Y%m%dT%H%M%SZ')}
-DTSTART:{dtstart}
-DTEND:{dtend}
-SUMMARY:{summary}
-DESCRIPTION:{description}
-LOCATION:{schedule.nursery.address}
-END:VEVENT
-END:VCALENDAR"""
+    modified = _ics_utc(schedule.updated_at)
+    return [
+        'BEGIN:VEVENT',
+        f'UID:{schedule_uid(schedule)}',
+        f'DTSTAMP:{modified}',
+        f'LAST-MODIFIED:{modified}',
+        dtstart,
+        dtend,
+        f'SUMMARY:{ics_escape("【保育園見学】" + nursery.name)}',
+        f'DESCRIPTION:{ics_escape(chr(10).join(description))}',
+        f'LOCATION:{ics_escape(nursery.address)}',
+        f'STATUS:{ICS_STATUS.get(schedule.status, "CONFIRMED")}',
+        'END:VEVENT',
+    ]
+
+
+def iter_ics_calendar(schedules, name='保育園見学'):
+    """見学スケジュールの VCALENDAR を1行ずつ返す（StreamingHttpResponse にそのまま渡せる）"""
+    header = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{ICS_PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{ics_escape(name)}',
+        'X-WR-TIMEZONE:Asia/Tokyo',
+    ]
+    for line in header:
+        yield ics_fold(line)
+    for schedule in schedules:
+        for line in ics_event_lines(schedule):
+            yield ics_fold(line)
+    yield ics_fold('END:VCALENDAR')
+
+
+def create_ics_content(schedule):
+    """
+    見学スケジュールからICSファイルの内容を生成
+    """
+    return ''.join(iter_ics_calendar([schedule]))
+
+
+def _feed_signer(user):
+    # パスワードを変更すると以前のURLは使えなくなる
+    return signing.Signer(salt=f'nursery.calendar_feed:{user.password}')
+
+
+def calendar_feed_token(user):
+    """購読用カレンダーのURLに含めるトークン"""
+    return _feed_signer(user).sign(str(user.pk))
+
+
+def user_from_feed_token(token):
+    """トークンに対応するユーザー（不正なトークンなら None）"""
+    from django.contrib.auth.models import User
     
-    return ics_content
\ No newline at end of file
+    pk, _, _ = token.partition(':')
+    user = User.objects.filter(pk=pk, is_active=True).first() if pk.isdigit() else None
+    if user is None:
+        return None
+    try:
+        _feed_signer(user).unsign(token)
+    except signing.BadSignature:
+        return None
+    return user
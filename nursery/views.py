@@ -1,40 +1,74 @@
-from django.shortcuts import render, get_object_or_404, redirect
+import tempfile
+
+from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q, Count, Avg
+from django.db.models import Count, F, Max, Q
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-from django.urls import reverse_lazy
-from django.utils import timezone
-from django.http import HttpResponse
-from .models import Nursery, VisitSchedule, VisitImpression
-from .forms import NurseryForm, VisitScheduleForm, VisitImpressionForm
-from .utils import create_google_calendar_url, create_ics_content
-import googlemaps
 from django.conf import settings
+from django.urls import reverse, reverse_lazy
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date, quote_etag, urlencode
+from django.views.decorators.http import require_http_methods, require_POST
+from django.template.response import TemplateResponse
+from .models import Nursery, VisitSchedule, VisitImpression, HomeLocation, PhotoUpload, RankingWeights, RATING_SORT_KEY
+from .forms import NurseryForm, VisitScheduleForm, VisitImpressionForm, HomeLocationForm, RankingWeightsForm
+from .utils import (
+    calendar_feed_token, create_google_calendar_url, create_ics_content, iter_ics_calendar, user_from_feed_token,
+)
+from .geocoding import queue_geocoding
+from .geo import parse_point, within_radius
+from .pagination import KeysetPaginationMixin
+from .search import search_nurseries, uses_index
+from .dashboard import get_dashboard
+from .api import conditional_get
+from .comparison import MAX_NURSERIES as MAX_COMPARED_NURSERIES, build_comparison, parse_ids as parse_comparison_ids
+from .conflicts import calendar_report
+from .detail import DETAIL_TEMPLATE, detail_context, detail_etag, detail_state, nursery_impressions, nursery_schedules
+from .distances import GEOCODE_HOME_JOB, home_moved
+from .jobs import enqueue
+from .ranking import CRITERIA as RANKING_CRITERIA, WEIGHT_FIELDS as RANKING_WEIGHT_FIELDS, rank, saved_weights, weights_of
+from .routing import plan_day
+from .tiles import CLUSTER_MAX_ZOOM, DEFAULT_CENTER, InvalidTile, get_tile
+from .exports import (
+    CSV_CONTENT_TYPE, EXPORTS, FORMATS as EXPORT_FORMATS, XLSX_CONTENT_TYPE, export_filename, iter_csv, write_xlsx,
+)
+from .uploads import UploadError, append_chunk, create_upload, parse_content_range
+from .images import (
+    PHOTO_FIELDS, VARIANT_FORMATS, VARIANT_SIZES, ensure_variant, photo_digest, refresh_photo_digests,
+)
 
 
 @login_required
 def home(request):
-    context = {
-        'total_nurseries': Nursery.objects.count(),
-        'scheduled_visits': VisitSchedule.objects.filter(status='予定').count(),
-        'completed_visits': VisitSchedule.objects.filter(status='完了').count(),
-        'total_impressions': VisitImpression.objects.count(),
-        'recent_schedules': VisitSchedule.objects.filter(
-            status='予定',
-            visit_date__gte=timezone.now().date()
-        ).order_by('visit_date', 'visit_time')[:5],
-        'top_rated': VisitImpression.objects.select_related('nursery').order_by('-overall_rating', '-created_at')[:5],
-    }
-    return render(request, 'nursery/home.html', context)
+    context = get_dashboard(request.user)
+    return TemplateResponse(request, 'nursery/home.html', context)
+
+
+class OwnerScopedMixin:
+    """ログイン中のユーザーが所有するデータだけを表示・編集する（フォームには user を渡す）"""
+    
+    def get_queryset(self):
+        return super().get_queryset().filter(owner=self.request.user)
+    
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
 
 
-class NurseryListView(LoginRequiredMixin, ListView):
+class NurseryListView(LoginRequiredMixin, OwnerScopedMixin, KeysetPaginationMixin, ListView):
     model = Nursery
     template_name = 'nursery/nursery_list.html'
     context_object_name = 'nurseries'
     paginate_by = 10
+    default_radius = 3.0
+    max_radius = 50.0
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -42,82 +76,109 @@ class NurseryListView(LoginRequiredMixin, ListView):
         nursery_type = self.request.GET.get('type')
         
         if query:
-            queryset = queryset.filter(
-                Q(name__icontains=query) |
-                Q(address__icontains=query) |
-                Q(facility_number__icontains=query)
-            )
+            queryset = search_nurseries(queryset, query)
         
         if nursery_type:
             queryset = queryset.filter(nursery_type=nursery_type)
         
-        return queryset.annotate(
-            visit_count=Count('visit_schedules'),
-            avg_rating=Avg('impressions__overall_rating')
-        )
+        # 近隣検索（?near=緯度,経度&radius=km）
+        near = parse_point(self.request.GET.get('near'))
+        if near:
+            queryset = within_radius(queryset, near[0], near[1], self.get_radius())
+        elif self.request.GET.get('sort') == 'distance':
+            # 自宅からの距離は事前計算済みの列で並べ替える
+            queryset = queryset.order_by(F('distance_from_home').asc(nulls_last=True), 'name')
+        elif self.request.GET.get('sort') == 'rating':
+            queryset = queryset.order_by(RATING_SORT_KEY.desc(), 'name')
+        
+        # 見学回数・平均評価は Nursery に保存済みの集計値を使う
+        return queryset
+    
+    def get_radius(self):
+        try:
+            radius = float(self.request.GET.get('radius', self.default_radius))
+        except ValueError:
+            radius = self.default_radius
+        return min(max(radius, 0.1), self.max_radius)
+    
+    def get_keyset_ordering(self):
+        # 近隣検索・評価順・検索の関連度順は計算値で並べるため、従来のページ分割のまま
+        sort = self.request.GET.get('sort')
+        if self.request.GET.get('near') or sort == 'rating' or (self.request.GET.get('q') and uses_index()):
+            return None
+        if sort == 'distance':
+            return ['distance_from_home', 'name', 'id']
+        return ['name', 'id']
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['nursery_types'] = Nursery.NURSERY_TYPE_CHOICES
+        context['near'] = parse_point(self.request.GET.get('near'))
+        context['radius'] = self.get_radius()
+        context['max_compared'] = MAX_COMPARED_NURSERIES
         return context
 
 
-class NurseryDetailView(LoginRequiredMixin, DetailView):
+class NurseryDetailView(LoginRequiredMixin, OwnerScopedMixin, DetailView):
     model = Nursery
-    template_name = 'nursery/nursery_detail.html'
+    template_name = DETAIL_TEMPLATE
     context_object_name = 'nursery'
     
+    def get_queryset(self):
+        return super().get_queryset().annotate(**detail_state())
+    
+    def get(self, request, *args, **kwargs):
+        # 変更がなければ描画せずに 304 を返す
+        self.object = self.get_object()
+        etag = detail_etag(self.object)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self.render_to_response(self.get_context_data(object=self.object))
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        nursery = self.object
-        context['schedules'] = nursery.visit_schedules.all().order_by('-visit_date')
-        context['impressions'] = nursery.impressions.all().order_by('-created_at')
-        context['avg_rating'] = nursery.impressions.aggregate(Avg('overall_rating'))['overall_rating__avg']
+        context.update(detail_context(self.object))
         return context
 
 
-class NurseryCreateView(LoginRequiredMixin, CreateView):
+class NurseryCreateView(LoginRequiredMixin, OwnerScopedMixin, CreateView):
     model = Nursery
     form_class = NurseryForm
     template_name = 'nursery/nursery_form.html'
     success_url = reverse_lazy('nursery:nursery_list')
     
     def form_valid(self, form):
-        nursery = form.save(commit=False)
-        
-        # Google Maps APIを使用して緯度経度を取得
-        if settings.GOOGLE_MAPS_API_KEY and nursery.address:
-            try:
-                gmaps = googlemaps.Client(key=settings.GOOGLE_MAPS_API_KEY)
-                geocode_result = gmaps.geocode(nursery.address)
-                if geocode_result:
-                    location = geocode_result[0]['geometry']['location']
-                    nursery.latitude = location['lat']
-                    nursery.longitude = location['lng']
-            except Exception as e:
-                messages.warning(self.request, f'住所から位置情報を取得できませんでした: {e}')
-        
-        nursery.save()
+        response = super().form_valid(form)
         messages.success(self.request, '保育園を登録しました。')
-        return super().form_valid(form)
+        # 位置情報はバックグラウンドで取得する
+        if queue_geocoding(self.object):
+            messages.info(self.request, '住所から位置情報を取得しています。しばらくすると反映されます。')
+        return response
 
 
-class NurseryUpdateView(LoginRequiredMixin, UpdateView):
+class NurseryUpdateView(LoginRequiredMixin, OwnerScopedMixin, UpdateView):
     model = Nursery
     form_class = NurseryForm
     template_name = 'nursery/nursery_form.html'
     success_url = reverse_lazy('nursery:nursery_list')
     
     def form_valid(self, form):
+        response = super().form_valid(form)
         messages.success(self.request, '保育園情報を更新しました。')
-        return super().form_valid(form)
+        if 'address' in form.changed_data and queue_geocoding(self.object):
+            messages.info(self.request, '住所から位置情報を取得しています。しばらくすると反映されます。')
+        return response
 
 
-class VisitScheduleListView(LoginRequiredMixin, ListView):
+class VisitScheduleListView(LoginRequiredMixin, OwnerScopedMixin, KeysetPaginationMixin, ListView):
     model = VisitSchedule
     template_name = 'nursery/schedule_list.html'
     context_object_name = 'schedules'
     paginate_by = 20
+    keyset_ordering = ['visit_date', 'visit_time', 'id']
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -131,10 +192,13 @@ class VisitScheduleListView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['status_choices'] = VisitSchedule.STATUS_CHOICES
+        context['calendar_feed_url'] = self.request.build_absolute_uri(
+            reverse('nursery:calendar_feed', args=[calendar_feed_token(self.request.user)])
+        )
         return context
 
 
-class VisitScheduleCreateView(LoginRequiredMixin, CreateView):
+class VisitScheduleCreateView(LoginRequiredMixin, OwnerScopedMixin, CreateView):
     model = VisitSchedule
     form_class = VisitScheduleForm
     template_name = 'nursery/schedule_form.html'
@@ -145,7 +209,7 @@ class VisitScheduleCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class VisitScheduleUpdateView(LoginRequiredMixin, UpdateView):
+class VisitScheduleUpdateView(LoginRequiredMixin, OwnerScopedMixin, UpdateView):
     model = VisitSchedule
     form_class = VisitScheduleForm
     template_name = 'nursery/schedule_form.html'
@@ -156,11 +220,12 @@ class VisitScheduleUpdateView(LoginRequiredMixin, UpdateView):
         return super().form_valid(form)
 
 
-class VisitImpressionListView(LoginRequiredMixin, ListView):
+class VisitImpressionListView(LoginRequiredMixin, OwnerScopedMixin, KeysetPaginationMixin, ListView):
     model = VisitImpression
     template_name = 'nursery/impression_list.html'
     context_object_name = 'impressions'
     paginate_by = 10
+    keyset_ordering = ['-created_at', 'id']
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -176,7 +241,7 @@ class VisitImpressionListView(LoginRequiredMixin, ListView):
         return queryset.select_related('nursery', 'visit_schedule').order_by('-created_at')
 
 
-class VisitImpressionCreateView(LoginRequiredMixin, CreateView):
+class VisitImpressionCreateView(LoginRequiredMixin, OwnerScopedMixin, CreateView):
     model = VisitImpression
     form_class = VisitImpressionForm
     template_name = 'nursery/impression_form.html'
@@ -199,7 +264,7 @@ class VisitImpressionCreateView(LoginRequiredMixin, CreateView):
         return initial
 
 
-class VisitImpressionUpdateView(LoginRequiredMixin, UpdateView):
+class VisitImpressionUpdateView(LoginRequiredMixin, OwnerScopedMixin, UpdateView):
     model = VisitImpression
     form_class = VisitImpressionForm
     template_name = 'nursery/impression_form.html'
@@ -210,19 +275,222 @@ class VisitImpressionUpdateView(LoginRequiredMixin, UpdateView):
         return super().form_valid(form)
 
 
+@login_required
+def impression_photo(request, pk, field, size, fmt, digest=None):
+    """
+    見学感想の写真の縮小版を配信
+
+    URLに元画像のハッシュを含めるので、内容が変わらない限りブラウザにキャッシュさせる。
+    ハッシュが無い・古いURLは現在のURLへリダイレクトする。
+    """
+    if field not in PHOTO_FIELDS or size not in VARIANT_SIZES or fmt not in VARIANT_FORMATS:
+        raise Http404
+    impression = get_object_or_404(VisitImpression, pk=pk, owner=request.user)
+    field_file = getattr(impression, field)
+    if not field_file:
+        raise Http404
+    
+    current = photo_digest(impression, field)
+    if current is None:
+        refresh_photo_digests(impression)
+        current = photo_digest(impression, field)
+    if digest != current:
+        return redirect('nursery:impression_photo', pk=pk, field=field, digest=current, size=size, fmt=fmt)
+    
+    name = ensure_variant(field_file, current, size, fmt)
+    response = FileResponse(default_storage.open(name, 'rb'), content_type=VARIANT_FORMATS[fmt][1])
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+
+def _upload_state(upload):
+    return {
+        'id': str(upload.pk),
+        'url': reverse('nursery:photo_upload_chunk', args=[upload.pk]),
+        'offset': upload.received,
+        'size': upload.total_size,
+        'chunk_size': settings.PHOTO_UPLOAD_CHUNK_SIZE,
+        'status': upload.status,
+        'error': upload.error,
+    }
+
+
+@login_required
+@require_POST
+def photo_upload_create(request):
+    """写真の分割アップロードを開始（filename, size を受け取り、アップロードIDを返す）"""
+    try:
+        size = int(request.POST.get('size', ''))
+        upload = create_upload(request.user, request.POST.get('filename', ''), size)
+    except ValueError:
+        return JsonResponse({'error': 'ファイルサイズが不正です'}, status=400)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    return JsonResponse(_upload_state(upload), status=201)
+
+
+@login_required
+@require_http_methods(['GET', 'HEAD', 'PUT'])
+def photo_upload_chunk(request, upload_id):
+    """分割したデータの受信（PUT）と、受信済みの位置の確認（GET）"""
+    upload = get_object_or_404(PhotoUpload, pk=upload_id, user=request.user)
+    status = 200
+    if request.method == 'PUT':
+        try:
+            start, end, total = parse_content_range(request.headers.get('Content-Range'))
+            append_chunk(upload, request, start, end, total)
+        except UploadError as e:
+            upload.refresh_from_db()
+            upload.error = upload.error or str(e)
+            status = e.status
+    response = JsonResponse(_upload_state(upload), status=status)
+    response['Upload-Offset'] = upload.received
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@login_required
+def home_location(request):
+    """自宅の位置を設定"""
+    home, _ = HomeLocation.objects.get_or_create(user=request.user)
+    
+    if request.method == 'POST':
+        form = HomeLocationForm(request.POST, instance=home)
+        if form.is_valid():
+            home = form.save()
+            if {'latitude', 'longitude'} & set(form.changed_data) and home.has_location:
+                home_moved(home)
+                messages.success(request, '自宅の位置を保存しました。各保育園までの距離を再計算しています。')
+            elif 'address' in form.changed_data and home.address:
+                enqueue(GEOCODE_HOME_JOB, {'user_id': request.user.pk}, unique=True)
+                messages.success(request, '自宅の住所を保存しました。位置情報を取得後、距離を再計算します。')
+            else:
+                messages.success(request, '自宅の位置を保存しました。')
+            return redirect('nursery:nursery_list')
+    else:
+        form = HomeLocationForm(instance=home)
+    
+    return TemplateResponse(request, 'nursery/home_location.html', {'form': form, 'home': home})
+
+
+@login_required
+def nursery_compare(request):
+    """選んだ保育園の比較表（?ids=1,2,3）"""
+    ids = parse_comparison_ids(request.GET.getlist('ids'))
+    comparison = build_comparison(request.user, ids)
+    for nursery in comparison.nurseries:
+        others = [str(other.pk) for other in comparison.nurseries if other.pk != nursery.pk]
+        nursery.remove_query = urlencode({'ids': ','.join(others)})
+    context = {
+        'comparison': comparison,
+        'max_nurseries': MAX_COMPARED_NURSERIES,
+    }
+    return TemplateResponse(request, 'nursery/nursery_compare.html', context)
+
+
+@login_required
+def ranking(request):
+    """重み付きの保育園ランキング（重みは保存した値。?overall=... や保存しない送信で一時的に変更）"""
+    saved = saved_weights(request.user)
+    if request.method == 'POST' and 'save' in request.POST:
+        form = RankingWeightsForm(request.POST, instance=saved)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'ランキングの重みを保存しました。')
+            return redirect('nursery:ranking')
+    elif request.method == 'POST':
+        # 保存せずに並べ替えだけ行う
+        form = RankingWeightsForm(request.POST, instance=RankingWeights(user=request.user))
+    elif any(name in request.GET for name in RANKING_WEIGHT_FIELDS):
+        form = RankingWeightsForm(request.GET, instance=RankingWeights(user=request.user))
+    else:
+        form = RankingWeightsForm(instance=saved)
+    
+    weights = weights_of(form.instance if form.is_bound and form.is_valid() else saved)
+    result = rank(request.user, weights, limit=settings.RANKING_DISPLAY_LIMIT)
+    context = {
+        'form': form,
+        'ranking': result,
+        'criteria': RANKING_CRITERIA,
+        'compare_ids': ','.join(str(entry.id) for entry in result.entries[:MAX_COMPARED_NURSERIES]),
+        'max_compared': MAX_COMPARED_NURSERIES,
+    }
+    return TemplateResponse(request, 'nursery/ranking.html', context)
+
+
 @login_required
 def map_view(request):
-    nurseries = Nursery.objects.all().order_by('name')
+    """地図（保育園は表示中の範囲のタイルを map_tile から読み込む）"""
+    counts = Nursery.objects.filter(owner=request.user).aggregate(
+        total=Count('pk'),
+        located=Count('pk', filter=Q(latitude__isnull=False, longitude__isnull=False)),
+    )
+    home = HomeLocation.objects.filter(
+        user=request.user, latitude__isnull=False, longitude__isnull=False,
+    ).values('latitude', 'longitude').first()
+    center = (float(home['latitude']), float(home['longitude'])) if home else DEFAULT_CENTER
     context = {
-        'nurseries': nurseries,
+        'total_count': counts['total'],
+        'located_count': counts['located'],
+        'unlocated_count': counts['total'] - counts['located'],
+        'has_home': home is not None,
+        'center_lat': center[0],
+        'center_lng': center[1],
+        'cluster_max_zoom': CLUSTER_MAX_ZOOM,
     }
-    return render(request, 'nursery/map_view.html', context)
+    return TemplateResponse(request, 'nursery/map_view.html', context)
+
+
+@login_required
+@conditional_get
+@require_http_methods(['GET', 'HEAD'])
+def map_tile(request, z, x, y):
+    """地図のタイル範囲の保育園（GeoJSON）"""
+    try:
+        body = get_tile(request.user, z, x, y)
+    except InvalidTile:
+        raise Http404('タイルが見つかりません')
+    response = HttpResponse(body, content_type='application/geo+json')
+    # 内容はユーザーごとなので共有キャッシュには置かせず、ブラウザは ETag で確認する
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+def route_plan(request):
+    """1日の見学の訪問順"""
+    today = timezone.localdate()
+    try:
+        visit_date = parse_date(request.GET.get('date') or '') or today
+    except ValueError:
+        visit_date = today
+    plan = plan_day(request.user, visit_date)
+    # 予定のある日（今日以降）への切り替え用
+    upcoming_dates = (
+        VisitSchedule.objects.filter(owner=request.user, status='予定', visit_date__gte=today)
+        .values('visit_date')
+        .annotate(count=Count('pk'))
+        .order_by('visit_date')[:14]
+    )
+    context = {
+        'visit_date': visit_date,
+        'plan': plan,
+        'upcoming_dates': upcoming_dates,
+    }
+    return TemplateResponse(request, 'nursery/route_plan.html', context)
+
+
+@login_required
+def schedule_conflicts(request):
+    """今日以降の予定の見学の重なり・無理のある予定の一覧"""
+    conflicts = calendar_report(request.user, timezone.localdate())
+    return TemplateResponse(request, 'nursery/schedule_conflicts.html', {'conflicts': conflicts})
 
 
 @login_required
 def schedule_to_calendar(request, pk):
     """見学スケジュールをGoogleカレンダーに追加"""
-    schedule = get_object_or_404(VisitSchedule, pk=pk)
+    schedule = get_object_or_404(VisitSchedule, pk=pk, owner=request.user)
     calendar_url = create_google_calendar_url(schedule)
     return redirect(calendar_url)
 
@@ -230,9 +498,65 @@ def schedule_to_calendar(request, pk):
 @login_required
 def schedule_download_ics(request, pk):
     """見学スケジュールをICSファイルでダウンロード"""
-    schedule = get_object_or_404(VisitSchedule, pk=pk)
+    schedule = get_object_or_404(VisitSchedule, pk=pk, owner=request.user)
     ics_content = create_ics_content(schedule)
     
-    response = HttpResponse(ics_content, content_type='text/calendar')
+    response = HttpResponse(ics_content, content_type='text/calendar; charset=utf-8')
     response['Content-Disposition'] = f'attachment; filename="nursery_visit_{pk}.ics"'
     return response
+
+
+def calendar_feed(request, token):
+    """
+    ユーザーのすべての見学スケジュールの購読用カレンダー（.ics）
+
+    カレンダーアプリはログインできないため、URLに含めた署名付きトークンで認証する。
+    定期的に取得されるので、件数と最終更新日時から ETag / Last-Modified を作り、
+    変更がなければ 304 を返す。
+    """
+    user = user_from_feed_token(token)
+    if user is None:
+        raise Http404
+    
+    schedules = VisitSchedule.objects.filter(owner=user)
+    state = schedules.aggregate(
+        count=Count('id'),
+        schedule_updated=Max('updated_at'),
+        nursery_updated=Max('nursery__updated_at'),
+    )
+    updated = [value for value in (state['schedule_updated'], state['nursery_updated']) if value]
+    last_modified = int(max(updated).timestamp()) if updated else 0
+    etag = quote_etag(f"{state['count']}-{last_modified}")
+    
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        events = schedules.select_related('nursery').order_by('visit_date', 'visit_time', 'pk')
+        response = StreamingHttpResponse(
+            iter_ics_calendar(events.iterator(chunk_size=500)),
+            content_type='text/calendar; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'inline; filename="nursery_visits.ics"'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+def export_data(request, kind):
+    """保育園・見学スケジュール・見学感想・比較表を CSV / Excel でダウンロード"""
+    spec = EXPORTS.get(kind)
+    fmt = request.GET.get('format', 'csv')
+    if spec is None or fmt not in EXPORT_FORMATS:
+        raise Http404
+    
+    if fmt == 'csv':
+        response = StreamingHttpResponse(iter_csv(spec, request.user), content_type=CSV_CONTENT_TYPE)
+    else:
+        # xlsx は zip 形式のため最後まで書いてから返す（一時ファイルに書くのでメモリは使わない）
+        fp = tempfile.TemporaryFile()
+        write_xlsx(spec, request.user, fp)
+        fp.seek(0)
+        response = FileResponse(fp, content_type=XLSX_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(spec, fmt)}"'
+    return response